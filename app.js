@@ -14,6 +14,7 @@ const port = process.env.PORT || 3000;
 
 // 引入路由
 const indexRouter = require('./routes/index');
+const listings = require('./listings');
 
 // Swagger 配置
 const swaggerOptions = {
@@ -106,13 +107,18 @@ app.get('/api/health', (req, res) => {
  * /api/articles:
  *   get:
  *     summary: 获取文章列表
- *     description: 返回分页的文章列表
+ *     description: 返回按发布时间倒序、按游标分页的文章列表
  *     parameters:
  *       - in: query
- *         name: page
+ *         name: after
  *         schema:
- *           type: integer
- *         description: 页码（默认：1）
+ *           type: string
+ *         description: 下一页游标（上一次返回的 pagination.next）
+ *       - in: query
+ *         name: before
+ *         schema:
+ *           type: string
+ *         description: 上一页游标（上一次返回的 pagination.prev）
  *       - in: query
  *         name: limit
  *         schema:
@@ -140,41 +146,33 @@ app.get('/api/health', (req, res) => {
  *                 pagination:
  *                   type: object
  *                   properties:
- *                     current_page:
- *                       type: integer
  *                     per_page:
  *                       type: integer
  *                     total:
  *                       type: integer
+ *                     next:
+ *                       type: string
+ *                       nullable: true
+ *                     prev:
+ *                       type: string
+ *                       nullable: true
+ *       400:
+ *         description: 游标无效
  *       500:
  *         description: 服务器错误
  */
 app.get('/api/articles', async (req, res) => {
   try {
-    const page = parseInt(req.query.page) || 1;
-    const limit = parseInt(req.query.limit) || 10;
-    const offset = (page - 1) * limit;
-
-    const articles = await pool.query(
-      `SELECT a.*, j.name as journal_name 
-       FROM articles a 
-       LEFT JOIN journals j ON a.journal_id = j.id 
-       ORDER BY a.published_date DESC 
-       LIMIT $1 OFFSET $2`,
-      [limit, offset]
-    );
-
-    const total = await pool.query('SELECT COUNT(*) as count FROM articles');
-
-    res.json({
-      data: articles.rows,
-      pagination: {
-        current_page: page,
-        per_page: limit,
-        total: parseInt(total.rows[0].count)
-      }
+    const result = await listings.page(pool, {
+      after: req.query.after,
+      before: req.query.before,
+      limit: req.query.limit
     });
+    res.json(listingResponse(result, req.query.limit));
   } catch (error) {
+    if (error.status === 400) {
+      return res.status(400).json({ error: error.message });
+    }
     console.error('Error fetching articles:', error);
     res.status(500).json({ error: 'Internal server error' });
   }
@@ -245,10 +243,15 @@ app.get('/api/articles/:id', async (req, res) => {
  *           type: integer
  *         description: 期刊ID
  *       - in: query
- *         name: page
+ *         name: after
  *         schema:
- *           type: integer
- *         description: 页码（默认：1）
+ *           type: string
+ *         description: 下一页游标（上一次返回的 pagination.next）
+ *       - in: query
+ *         name: before
+ *         schema:
+ *           type: string
+ *         description: 上一页游标（上一次返回的 pagination.prev）
  *       - in: query
  *         name: limit
  *         schema:
@@ -256,45 +259,46 @@ app.get('/api/articles/:id', async (req, res) => {
  *         description: 每页数量（默认：10）
  *     responses:
  *       200:
- *         description: 成功返回期刊文章列表
+ *         description: 成功返回期刊文章列表（格式与 /api/articles 相同）
+ *       400:
+ *         description: 游标无效
  *       500:
  *         description: 服务器错误
  */
 app.get('/api/journals/:journalId/articles', async (req, res) => {
   try {
-    const page = parseInt(req.query.page) || 1;
-    const limit = parseInt(req.query.limit) || 10;
-    const offset = (page - 1) * limit;
-
-    const articles = await pool.query(
-      `SELECT a.*, j.name as journal_name 
-       FROM articles a 
-       LEFT JOIN journals j ON a.journal_id = j.id 
-       WHERE j.id = $1 
-       ORDER BY a.published_date DESC 
-       LIMIT $2 OFFSET $3`,
-      [req.params.journalId, limit, offset]
-    );
-
-    const total = await pool.query(
-      'SELECT COUNT(*) as count FROM articles WHERE journal_id = $1',
-      [req.params.journalId]
-    );
-
-    res.json({
-      data: articles.rows,
-      pagination: {
-        current_page: page,
-        per_page: limit,
-        total: parseInt(total.rows[0].count)
-      }
+    if (!/^\d+$/.test(req.params.journalId)) {
+      return res.status(400).json({ error: 'Invalid journal id' });
+    }
+    const result = await listings.page(pool, {
+      after: req.query.after,
+      before: req.query.before,
+      limit: req.query.limit,
+      journalId: req.params.journalId
     });
+    res.json(listingResponse(result, req.query.limit));
   } catch (error) {
+    if (error.status === 400) {
+      return res.status(400).json({ error: error.message });
+    }
     console.error('Error fetching journal articles:', error);
     res.status(500).json({ error: 'Internal server error' });
   }
 });
 
+// 列表接口的返回格式
+function listingResponse(result, limit) {
+  return {
+    data: result.articles,
+    pagination: {
+      per_page: listings.pageSize(limit),
+      total: result.total,
+      next: result.next,
+      prev: result.prev
+    }
+  };
+}
+
 async function testConnection() {
   let retries = 3;
   while (retries > 0) {
@@ -329,29 +333,26 @@ app.listen(port, async () => {
 // 添加前端路由
 app.get('/', async (req, res) => {
   try {
-    const page = parseInt(req.query.page) || 1;
-    const limit = parseInt(req.query.limit) || 12;
-    const offset = (page - 1) * limit;
-
-    const articles = await pool.query(
-      `SELECT a.*, j.name as journal_name 
-       FROM articles a 
-       LEFT JOIN journals j ON a.journal_id = j.id 
-       ORDER BY a.published_date DESC 
-       LIMIT $1 OFFSET $2`,
-      [limit, offset]
-    );
-
-    const total = await pool.query('SELECT COUNT(*) as count FROM articles');
+    const result = await listings.page(pool, {
+      after: req.query.after,
+      before: req.query.before,
+      limit: req.query.limit || 12
+    });
 
     res.render('home', {
-      articles: articles.rows,
+      articles: result.articles,
+      isEnglish: true,
       pagination: {
-        current: page,
-        pages: Math.ceil(total.rows[0].count / limit)
+        total: result.total,
+        next: result.next,
+        prev: result.prev,
+        journal: null
       }
     });
   } catch (error) {
+    if (error.status === 400) {
+      return res.status(400).render('error', { error: 'Invalid page cursor' });
+    }
     console.error('Error:', error);
     res.status(500).render('error', { error: 'Internal server error' });
   }
@@ -0,0 +1,321 @@
+"""规范化的作者表
+
+articles.authors 保存的是 feedparser 的作者列表 JSON，每篇文章都重复保存作者名，按作者查文章只能逐行解析。
+authors 表每个作者一行（按规范化的名字去重），article_authors 按顺序关联文章和作者，
+按作者查文章走 (author_id, article_id) 索引。入库时作者名到ID的映射缓存在进程内，
+新作者用 INSERT ... ON CONFLICT DO NOTHING 批量写入，并发入库同一个作者不会冲突。
+
+    python authors.py --rebuild              # 从 articles.authors 重建关联（分批读取）
+    python authors.py --author "Jane Smith"  # 该作者的文章
+"""
+import argparse
+import json
+import logging
+import re
+import time
+import unicodedata
+
+from sqlalchemy import bindparam, delete, event, insert, select
+from sqlalchemy.orm import Session
+
+from db_models import Article, Author, Journal, article_authors
+from db_session import get_engine, insert_ignore, session_scope
+
+# 进程内缓存的作者数，超过后清空重新缓存
+CACHE_SIZE = 200_000
+# 每条 IN 查询的名字数
+LOOKUP_BATCH_SIZE = 500
+REBUILD_BATCH_SIZE = 2000
+NAME_LENGTH = Author.__table__.c.name.type.length
+
+_SPACE_RE = re.compile(r'\s+')
+# MDPI 等出版商把所有作者放在一个 dc:creator 中："A B, C D and E F"
+_LIST_SPLIT_RE = re.compile(r'\s*,\s*(?:and\s+)?|\s+and\s+|\s*;\s*')
+
+
+def normalize_name(name):
+    """作者名 -> (显示的名字, 去重用的 key)，空名字返回 None"""
+    name = _SPACE_RE.sub(' ', unicodedata.normalize('NFKC', str(name))).strip(' ,;')
+    if not name:
+        return None
+    name = name[:NAME_LENGTH]
+    return name, name.casefold()
+
+
+def _split(name):
+    """拆分合在一起的作者列表；拆出来的每一段都像完整的名字（含空格）时才拆，"Smith, J." 保持不变"""
+    if ',' not in name and ' and ' not in name and ';' not in name:
+        return [name]
+    parts = [part for part in _LIST_SPLIT_RE.split(name) if part.strip()]
+    if len(parts) > 1 and all(' ' in part.strip() for part in parts):
+        return parts
+    return [name]
+
+
+def author_names(authors):
+    """articles.authors 的 JSON 或 feedparser 的作者列表 -> [(名字, key)]，按原顺序去重"""
+    if isinstance(authors, str):
+        try:
+            authors = json.loads(authors) if authors else []
+        except ValueError:
+            return []
+    if not isinstance(authors, list):
+        return []
+    names = []
+    seen = set()
+    for author in authors:
+        raw = author.get('name') if isinstance(author, dict) else author
+        if not raw:
+            continue
+        for part in _split(str(raw)):
+            normalized = normalize_name(part)
+            if normalized and normalized[1] not in seen:
+                seen.add(normalized[1])
+                names.append(normalized)
+    return names
+
+
+class AuthorCache:
+    """作者 key -> ID 的进程内缓存
+
+    本事务中查到或插入的作者先记在 session.info 中，提交后才放进缓存，
+    回滚时丢弃，缓存里不会有不存在的ID。
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._ids = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        author_id = self._ids.get(key)
+        if author_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return author_id
+
+    def update(self, ids):
+        if len(self._ids) + len(ids) > self.size:
+            self._ids.clear()
+        self._ids.update(ids)
+
+    def clear(self):
+        self._ids.clear()
+
+
+CACHE = AuthorCache()
+
+
+def _pending(session):
+    return session.info.setdefault('pending_author_ids', {})
+
+
+@event.listens_for(Session, 'after_commit')
+def _promote_pending(session):
+    pending = session.info.pop('pending_author_ids', None)
+    if pending:
+        CACHE.update(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('pending_author_ids', None)
+
+
+def _dialect_name(executor):
+    return executor.get_bind().dialect.name if isinstance(executor, Session) else executor.dialect.name
+
+
+def _lookup(executor, keys):
+    found = {}
+    keys = list(keys)
+    statement = select(Author.name_key, Author.id).where(Author.name_key.in_(bindparam('keys', expanding=True)))
+    for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        found.update(executor.execute(statement, {'keys': keys[i:i + LOOKUP_BATCH_SIZE]}).all())
+    return found
+
+
+def _resolve(executor, names, known):
+    """{key: 名字} -> {key: 作者ID}，known 中没有的先查库，库里也没有的批量插入后再查"""
+    ids = {key: known[key] for key in names if key in known}
+    missing = [key for key in names if key not in ids]
+    if not missing:
+        return ids
+    found = _lookup(executor, missing)
+    new = [key for key in missing if key not in found]
+    if new:
+        executor.execute(
+            insert_ignore(_dialect_name(executor), Author),
+            [{'name': names[key], 'name_key': key} for key in new]
+        )
+        found.update(_lookup(executor, new))
+    ids.update(found)
+    return ids
+
+
+def author_ids(session, names):
+    """{key: 名字} -> {key: 作者ID}（使用进程内缓存）"""
+    pending = _pending(session)
+    ids = {}
+    missing = {}
+    for key, name in names.items():
+        author_id = pending.get(key) or CACHE.get(key)
+        if author_id is None:
+            missing[key] = name
+        else:
+            ids[key] = author_id
+    if missing:
+        resolved = _resolve(session, missing, {})
+        pending.update(resolved)
+        ids.update(resolved)
+    return ids
+
+
+def _batch_names(per_article):
+    """{key: 名字}，同一个作者有多种写法时保留最先出现的（与已入库作者的名字一致，不随批次变化）"""
+    names = {}
+    for _, article_names in per_article:
+        for name, key in article_names:
+            names.setdefault(key, name)
+    return names
+
+
+def _link_rows(per_article, ids):
+    return [
+        {'article_id': article_id, 'position': position, 'author_id': ids[key]}
+        for article_id, names in per_article
+        for position, (_, key) in enumerate(names)
+    ]
+
+
+def link_articles(session, articles):
+    """把刚插入的 Article 对象（已 flush，有ID）的作者写入 authors / article_authors"""
+    per_article = [(article.id, author_names(article.authors)) for article in articles]
+    names = _batch_names(per_article)
+    if not names:
+        return 0
+    rows = _link_rows(per_article, author_ids(session, names))
+    session.execute(insert(article_authors), rows)
+    return len(rows)
+
+
+def populate(conn, batch_size=REBUILD_BATCH_SIZE):
+    """按ID分批读取 articles.authors 写入作者表（迁移和 --rebuild 使用），返回关联数
+
+    在调用方的事务中执行，不使用进程内缓存（事务回滚时缓存不会失效）。
+    """
+    known = {}
+    last_id = 0
+    total = 0
+    begin = time.monotonic()
+    while True:
+        rows = conn.execute(
+            select(Article.id, Article.authors)
+            .where(Article.id > last_id)
+            .order_by(Article.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        per_article = [(row.id, author_names(row.authors)) for row in rows]
+        names = _batch_names(per_article)
+        if len(known) + len(names) > CACHE_SIZE:
+            known.clear()
+        known.update(_resolve(conn, names, known))
+        links = _link_rows(per_article, known)
+        if links:
+            conn.execute(insert(article_authors), links)
+        total += len(links)
+        logging.info(f"Linked {total} article authors up to article {last_id} "
+                     f"({total / (time.monotonic() - begin):.0f}/s)")
+    return total
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """清空文章-作者关联并重建（作者表保留，ID不变）"""
+    with get_engine().begin() as conn:
+        conn.execute(delete(article_authors))
+        return populate(conn, batch_size)
+
+
+def find_author(name, session=None):
+    """按名字查找作者（大小写和空白不敏感），找不到返回 None"""
+    normalized = normalize_name(name)
+    if normalized is None:
+        return None
+    with session_scope(session) as scope:
+        return scope.execute(select(Author).where(Author.name_key == normalized[1])).scalar()
+
+
+def articles_by_author(name, limit=20, before_id=None, session=None):
+    """该作者的文章 [{id, title, title_zh, journal, published_date, position}]，按文章ID倒序
+
+    before_id 为上一页最后一篇的ID
+    """
+    with session_scope(session) as scope:
+        author = find_author(name, session=scope)
+        if author is None:
+            return []
+        statement = (
+            select(Article.id, Article.title, Article.title_zh, Article.published_date,
+                   Journal.name.label('journal'), article_authors.c.position)
+            .select_from(article_authors)
+            .join(Article, Article.id == article_authors.c.article_id)
+            .outerjoin(Journal, Journal.id == Article.journal_id)
+            .where(article_authors.c.author_id == author.id)
+            .order_by(article_authors.c.article_id.desc())
+            .limit(limit)
+        )
+        if before_id is not None:
+            statement = statement.where(article_authors.c.article_id < before_id)
+        return [dict(row._mapping) for row in scope.execute(statement)]
+
+
+def authors_of(article_ids, session=None):
+    """{文章ID: [作者名, ...]}（按原顺序）"""
+    article_ids = list(article_ids)
+    result = {article_id: [] for article_id in article_ids}
+    if not article_ids:
+        return result
+    with session_scope(session) as scope:
+        rows = scope.execute(
+            select(article_authors.c.article_id, Author.name)
+            .join(Author, Author.id == article_authors.c.author_id)
+            .where(article_authors.c.article_id.in_(article_ids))
+            .order_by(article_authors.c.article_id, article_authors.c.position)
+        )
+        for article_id, name in rows:
+            result[article_id].append(name)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规范化的作者表")
+    parser.add_argument('--rebuild', action='store_true', help="从 articles.authors 重建文章-作者关联")
+    parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help="重建时每批的文章数")
+    parser.add_argument('--author', help="输出该作者的文章")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.rebuild:
+        begin = time.monotonic()
+        total = rebuild(args.batch_size)
+        logging.info(f"Rebuilt article authors: {total} links in {time.monotonic() - begin:.1f}s")
+    if args.author:
+        begin = time.monotonic()
+        results = articles_by_author(args.author, limit=args.limit)
+        elapsed = (time.monotonic() - begin) * 1000
+        for row in results:
+            print(f"{row['id']:>8}  #{row['position'] + 1:<3} [{row['journal']}] {row['title'][:80]}")
+        print(f"{len(results)} articles in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""重新处理已入库的文章（流式读取 + 进程池 + 批量更新）
+
+改进 RSSManager.parse_title 这类派生字段的逻辑后，已入库的文章仍然是旧的 volume / pages / title。
+backfill 按ID顺序流式读取 articles 表：PostgreSQL 用服务端游标（yield_per）一次读完；SQLite 没有结束的
+SELECT 会一直持有共享锁，写入的连接无法提交，改为按ID分批的短查询。每批交给进程池中的转换函数，
+只把有变化的行按主键批量 UPDATE 回去，不加载 ORM 对象。
+
+每批的更新和进度（backfill_progress）在同一个事务中提交，中断后再次运行从上次提交的位置继续。
+在途的批数有上限，主进程的内存超过 --max-memory-mb 时先等在途的批写完、只保留一个在途批，
+仍然超过则停止（进度已保存，可以用更小的 --batch-size 继续）。
+
+    python backfill.py --list                               # 可用的转换
+    python backfill.py --transform parse_title --dry-run    # 只统计会变化的文章
+    python backfill.py --transform parse_title --workers 4
+    python backfill.py --transform parse_title --restart    # 忽略已保存的进度，从头处理
+"""
+import argparse
+import gc
+import html
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import case, select, update
+
+import listings
+import search_index
+from db_models import Article, BackfillProgress
+from db_session import ensure_schema, get_engine, session_scope
+
+BATCH_SIZE = 1000
+MAX_MEMORY_MB = 1024
+# 每个 worker 同时在途的批数（读取比转换快时，最多缓存这么多批）
+IN_FLIGHT_PER_WORKER = 2
+# worker 处理这么多批后重启，转换函数的缓存等不会一直增长
+MAX_TASKS_PER_CHILD = 200
+# 试运行时输出的变化示例数
+DRY_RUN_SAMPLES = 5
+
+
+class MemoryLimitError(Exception):
+    """等在途的批写完后内存仍然超过上限"""
+
+
+@dataclass
+class Transform:
+    """一个转换：读取的列、按行计算新值的函数（在 worker 进程中执行），以及写回后需要同步的派生数据"""
+    name: str
+    description: str
+    columns: list
+    fn: object
+    after_update: object = None
+
+
+TRANSFORMS = {}
+
+
+def transform(name, description, columns, after_update=None):
+    """注册一个转换：fn(row) 返回需要更新的 {列: 新值}，没有变化返回 None
+
+    row 为 {列名: 值}（包含 id），fn 必须是模块级函数（worker 进程按名字导入）
+    """
+    def register(fn):
+        TRANSFORMS[name] = Transform(name, description, columns, fn, after_update)
+        return fn
+    return register
+
+
+# MDPI 的摘要中保存了原始标题的前缀：<p>Remote Sensing, Vol. 10, Pages 2000: <a href=...>
+_SOURCE_RE = re.compile(r'<p>\s*([^<>]*?, Vol\.[^<>]*?, Pages[^<>:]*):')
+
+
+def recover_raw_title(title, summary):
+    """没有保存 raw_title 的旧文章：用摘要中的期刊、卷号和页码拼回原始标题，无法恢复时返回 None"""
+    if ', Vol.' in title and ', Pages' in title:
+        # 旧的解析没有去掉前缀，标题本身就是原始标题
+        return title
+    match = _SOURCE_RE.search(summary or '')
+    if match is None:
+        return None
+    return f"{html.unescape(match.group(1)).strip()}: {title}"
+
+
+def _sync_titles(session, changes):
+    """标题变化后更新全文检索索引、列表快照和订阅源"""
+    titles = {article_id: values['title'] for article_id, values in changes if 'title' in values}
+    if titles:
+        search_index.reindex_ids(session, titles)
+        listings.update_titles(session, titles)
+
+
+@transform(
+    'parse_title',
+    "用 RSSManager.parse_title 重新解析标题、卷号和页码",
+    # 只有没有 raw_title 的旧文章才需要摘要
+    [Article.raw_title, Article.title, Article.volume, Article.pages,
+     case((Article.raw_title.is_(None), Article.summary)).label('summary')],
+    after_update=_sync_titles,
+)
+def reparse_title(row):
+    from rss_scheduler import RSSManager
+
+    raw_title = row['raw_title'] or recover_raw_title(row['title'], row['summary'])
+    if raw_title is None:
+        return None
+    parsed = RSSManager.parse_title(raw_title)
+    values = {'title': parsed['actual_title'], 'volume': parsed['volume'], 'pages': parsed['pages']}
+    changes = {
+        column: value for column, value in values.items()
+        if value != (row[column] or '')
+    }
+    return changes or None
+
+
+def apply(name, names, rows):
+    """在 worker 进程中执行转换：[(id, ...)] -> [(id, {列: 新值})]，只返回有变化的行"""
+    fn = TRANSFORMS[name].fn
+    results = []
+    for values in rows:
+        changes = fn(dict(zip(names, values)))
+        if changes:
+            results.append((values[0], changes))
+    return results
+
+
+def _rss_mb():
+    """主进程当前的常驻内存（MB），没有 /proc 时使用峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1048576
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def iter_batches(columns, after_id, batch_size):
+    """按ID顺序读取 id 大于 after_id 的文章，每次产出一批 [(id, *columns)]"""
+    engine = get_engine()
+    statement = select(Article.id, *columns).order_by(Article.id)
+    if engine.dialect.name == 'sqlite':
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(statement.where(Article.id > after_id).limit(batch_size)).all()
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+            after_id = rows[-1][0]
+    else:
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=batch_size).execute(statement.where(Article.id > after_id))
+            for rows in result.partitions():
+                yield [tuple(row) for row in rows]
+
+
+def load_progress(name, restart=False):
+    """读取（或新建）转换的进度，restart 时清零"""
+    with session_scope() as session:
+        progress = session.get(BackfillProgress, name)
+        if progress is None:
+            progress = BackfillProgress(transform=name)
+            session.add(progress)
+            restart = True
+        if restart:
+            progress.last_id = progress.processed = progress.changed = 0
+            progress.started_at = progress.updated_at = datetime.utcnow()
+            progress.finished_at = None
+    return progress
+
+
+def _write(spec, last_id, count, changes, dry_run):
+    """按主键批量更新变化的文章，并在同一个事务中保存进度"""
+    if dry_run:
+        return
+    with session_scope() as session:
+        if changes:
+            session.execute(update(Article), [{'id': article_id, **values} for article_id, values in changes])
+            if spec.after_update is not None:
+                spec.after_update(session, changes)
+        session.execute(
+            update(BackfillProgress)
+            .where(BackfillProgress.transform == spec.name)
+            .values(last_id=last_id,
+                    processed=BackfillProgress.processed + count,
+                    changed=BackfillProgress.changed + len(changes),
+                    updated_at=datetime.utcnow())
+        )
+
+
+def run(name, workers=None, batch_size=BATCH_SIZE, max_memory_mb=MAX_MEMORY_MB, restart=False, dry_run=False):
+    """执行一个转换，返回 (本次处理的文章数, 有变化的文章数)
+
+    workers 为 0 时在当前进程中转换（不启动进程池）
+    """
+    spec = TRANSFORMS.get(name)
+    if spec is None:
+        raise ValueError(f"未知的转换: {name!r}，可用的转换: {', '.join(sorted(TRANSFORMS))}")
+    ensure_schema()
+    progress = load_progress(name, restart) if not dry_run else None
+    if progress is not None and progress.finished_at is not None:
+        logging.info(f"{name} 已在 {progress.finished_at:%Y-%m-%d %H:%M} 完成，使用 --restart 重新处理")
+        return 0, 0
+    after_id = progress.last_id if progress is not None else 0
+    if after_id:
+        logging.info(f"Resuming {name} after article {after_id} ({progress.processed} processed)")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    names = ['id'] + [column.key for column in spec.columns]
+    max_in_flight = max(1, workers * IN_FLIGHT_PER_WORKER)
+    pool = None
+    if workers > 0:
+        pool = multiprocessing.get_context('spawn').Pool(workers, maxtasksperchild=MAX_TASKS_PER_CHILD)
+
+    pending = deque()
+    processed = changed = 0
+    samples = 0
+    begin = time.monotonic()
+
+    def finish_oldest():
+        nonlocal processed, changed, samples
+        last_id, count, result = pending.popleft()
+        changes = result.get() if pool is not None else result
+        _write(spec, last_id, count, changes, dry_run)
+        processed += count
+        changed += len(changes)
+        if dry_run:
+            for article_id, values in changes[:DRY_RUN_SAMPLES - samples]:
+                logging.info(f"文章 ID {article_id}: {values}")
+                samples += 1
+        logging.info(f"Processed {processed} articles up to {last_id}, {changed} changed "
+                     f"({processed / (time.monotonic() - begin):.0f}/s, {_rss_mb():.0f} MB)")
+
+    try:
+        for rows in iter_batches(spec.columns, after_id, batch_size):
+            if pool is not None:
+                result = pool.apply_async(apply, (name, names, rows))
+            else:
+                result = apply(name, names, rows)
+            pending.append((rows[-1][0], len(rows), result))
+            del rows
+            while len(pending) >= max_in_flight:
+                finish_oldest()
+            if _rss_mb() > max_memory_mb:
+                while pending:
+                    finish_oldest()
+                gc.collect()
+                if _rss_mb() > max_memory_mb:
+                    raise MemoryLimitError(
+                        f"内存 {_rss_mb():.0f} MB 超过上限 {max_memory_mb} MB，进度已保存，请减小 --batch-size 后继续"
+                    )
+                if max_in_flight > 1:
+                    logging.warning(f"内存接近上限 {max_memory_mb} MB，只保留一个在途批")
+                    max_in_flight = 1
+        while pending:
+            finish_oldest()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if not dry_run:
+        with session_scope() as session:
+            session.execute(
+                update(BackfillProgress)
+                .where(BackfillProgress.transform == name)
+                .values(finished_at=datetime.utcnow())
+            )
+    return processed, changed
+
+
+def status():
+    """输出每个转换的进度"""
+    ensure_schema()
+    with session_scope() as session:
+        done = {row.transform: row for row in session.execute(select(BackfillProgress)).scalars()}
+    for name, spec in sorted(TRANSFORMS.items()):
+        progress = done.get(name)
+        if progress is None:
+            mark = 'never run'
+        elif progress.finished_at is not None:
+            mark = f"done {progress.finished_at:%Y-%m-%d %H:%M}"
+        else:
+            mark = f"at id {progress.last_id}"
+        counts = f"{progress.processed} / {progress.changed} changed" if progress else ''
+        print(f"{name:<16}  {mark:<22}  {counts:<24}  {spec.description}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重新处理已入库的文章")
+    parser.add_argument('--transform', help="要执行的转换")
+    parser.add_argument('--list', action='store_true', help="输出可用的转换和进度")
+    parser.add_argument('--workers', type=int, default=None, help="worker 进程数（默认 CPU 数，0 为不启动进程池）")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="每批的文章数")
+    parser.add_argument('--max-memory-mb', type=int, default=MAX_MEMORY_MB, help="主进程的内存上限")
+    parser.add_argument('--restart', action='store_true', help="忽略已保存的进度，从头处理")
+    parser.add_argument('--dry-run', action='store_true', help="只统计会变化的文章，不写入")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.list or not args.transform:
+        status()
+        return
+    begin = time.monotonic()
+    try:
+        processed, changed = run(args.transform, args.workers, args.batch_size, args.max_memory_mb,
+                                 restart=args.restart, dry_run=args.dry_run)
+    except MemoryLimitError as e:
+        logging.error(str(e))
+        raise SystemExit(1)
+    logging.info(f"{args.transform}: {processed} articles processed, {changed} changed "
+                 f"in {time.monotonic() - begin:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""索引前后的查询计划和耗时对比
+
+在一个专用的库中生成合成数据（默认 100 万篇文章），分别在没有索引和执行迁移之后
+运行网页端和抓取/翻译程序的典型查询，输出查询计划和耗时中位数。
+
+    python -m benchmarks.bench_indexes --rows 1000000 --output bench_indexes.json
+
+注意：会删除并重建目标库中的表，不要指向生产数据库。
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from db_models import Base, Article, Comment, Journal
+from migrations import upgrade
+
+QUERIES = {
+    'dedup_by_doi': (
+        "SELECT id FROM articles WHERE doi = :doi",
+        lambda rows: {'doi': f"10.3390/bench{random.randrange(rows)}"}
+    ),
+    'home_page': (
+        "SELECT a.id, a.title, j.name FROM articles a LEFT JOIN journals j ON a.journal_id = j.id "
+        "ORDER BY a.published_date DESC LIMIT 10 OFFSET 0",
+        lambda rows: {}
+    ),
+    'journal_page': (
+        "SELECT id, title FROM articles WHERE journal_id = :journal_id "
+        "ORDER BY published_date DESC LIMIT 10",
+        lambda rows: {'journal_id': random.randint(1, 20)}
+    ),
+    'untranslated_batch': (
+        "SELECT id FROM articles WHERE title_zh IS NULL ORDER BY id LIMIT 50",
+        lambda rows: {}
+    ),
+    'article_comments': (
+        "SELECT id, content FROM comments WHERE article_id = :article_id ORDER BY created_at DESC",
+        lambda rows: {'article_id': random.randint(1, rows)}
+    ),
+}
+
+
+def populate(engine, rows, untranslated_ratio=0.01, chunk_size=20000):
+    """生成期刊、文章和评论"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    # 先删除索引，得到“迁移前”的状态
+    with engine.begin() as conn:
+        for index in list(Article.__table__.indexes) + list(Comment.__table__.indexes):
+            index.drop(conn)
+        conn.execute(text("DELETE FROM schema_migrations"))
+
+    start = datetime(2015, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Journal.__table__.insert(), [
+            {'id': i, 'name': f"Journal{i}", 'rss_url': f"https://www.mdpi.com/rss/journal/j{i}"}
+            for i in range(1, 21)
+        ])
+        for offset in range(0, rows, chunk_size):
+            batch = []
+            for i in range(offset, min(rows, offset + chunk_size)):
+                translated = random.random() >= untranslated_ratio
+                batch.append({
+                    'id': i + 1,
+                    'title': f"Synthetic article {i}",
+                    'title_zh': f"合成文章 {i}" if translated else None,
+                    'doi': f"10.3390/bench{i}",
+                    'link': f"https://www.mdpi.com/bench/{i}",
+                    'summary': "Synthetic abstract.",
+                    'published_date': start + timedelta(minutes=random.randrange(5_000_000)),
+                    'journal_id': random.randint(1, 20),
+                })
+            conn.execute(Article.__table__.insert(), batch)
+        conn.execute(Comment.__table__.insert(), [
+            {'article_id': random.randint(1, rows), 'content': "comment",
+             'created_at': datetime(2024, 1, 1) + timedelta(minutes=i)}
+            for i in range(min(rows, 50000))
+        ])
+
+
+def query_plan(conn, sql, params):
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+        return [row[-1] for row in rows]
+    rows = conn.execute(text(f"EXPLAIN {sql}"), params).all()
+    return [row[0] for row in rows]
+
+
+def measure(engine, rows, repeat):
+    """返回每个查询的计划和耗时中位数（毫秒）"""
+    results = {}
+    with engine.connect() as conn:
+        for name, (sql, make_params) in QUERIES.items():
+            plan = query_plan(conn, sql, make_params(rows))
+            timings = []
+            for _ in range(repeat):
+                params = make_params(rows)
+                begin = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                timings.append((time.perf_counter() - begin) * 1000)
+            results[name] = {'plan': plan, 'median_ms': round(statistics.median(timings), 3)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引前后的查询计划对比")
+    parser.add_argument('--db-url', help="专用的测试数据库（默认使用临时 SQLite 文件）")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="文章数")
+    parser.add_argument('--repeat', type=int, default=5, help="每个查询执行次数")
+    parser.add_argument('--output', help="结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    random.seed(42)
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')}"
+    engine = create_engine(db_url)
+
+    print(f"Populating {args.rows} articles in {db_url} ...")
+    begin = time.perf_counter()
+    populate(engine, args.rows)
+    print(f"Populated in {time.perf_counter() - begin:.1f}s")
+
+    before = measure(engine, args.rows, args.repeat)
+    begin = time.perf_counter()
+    upgrade(engine)
+    migration_seconds = time.perf_counter() - begin
+    after = measure(engine, args.rows, args.repeat)
+
+    print(f"Migration applied in {migration_seconds:.1f}s\n")
+    print(f"{'query':<22}{'before ms':>12}{'after ms':>12}")
+    for name in QUERIES:
+        print(f"{name:<22}{before[name]['median_ms']:>12.3f}{after[name]['median_ms']:>12.3f}")
+        print(f"    before: {' | '.join(before[name]['plan'])}")
+        print(f"    after:  {' | '.join(after[name]['plan'])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'db': engine.dialect.name,
+                'rows': args.rows,
+                'migration_seconds': round(migration_seconds, 3),
+                'before': before,
+                'after': after,
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""抓取和翻译流程的离线基准测试
+
+使用合成的 MDPI 风格源（benchmarks.synthetic_feeds）和模拟的翻译客户端
+（benchmarks.stub_client），不访问网络和翻译接口。测量：
+
+- parse_title：标题解析
+- parse：feedparser 与流式解析（feed_stream）的解析速度
+- ingest：首次入库、重复入库（去重）和部分重叠的源，每条的平均耗时超过 --max-ingest-ms 时以状态码 1 退出
+- translation：逐篇翻译、批量翻译和命中数据库缓存时的翻译流程
+
+    python -m benchmarks.bench_pipeline --output bench_pipeline.json
+    python -m benchmarks.bench_pipeline --db-url postgresql://... --sections ingest translation
+    python -m benchmarks.bench_pipeline --sections ingest --max-ingest-ms 5
+
+结果写成 JSON，包含当前的 git 提交，便于比较不同提交之间的性能。
+注意：会删除并重建目标库中的表，不要指向生产数据库。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import feedparser
+import sqlalchemy
+from sqlalchemy import case, delete, func, select, update
+
+import db_session
+from benchmarks.stub_client import StubChatClient
+from benchmarks.synthetic_feeds import feed_url, generate_feed, make_entries
+from db_models import Base, Article, TranslationCacheEntry, TranslationState
+from feed_stream import iter_chunks, iter_entries
+
+SECTIONS = ['parse_title', 'parse', 'ingest', 'translation']
+# 入库每条的平均耗时上限（毫秒，包括解析、去重、插入和入库时的索引）；
+# 合成源在开发机上首次入库约 3.5 ms/条，其中 feedparser 解析约 2 ms
+INGEST_BUDGET_MS = 5.0
+
+
+def timed(fn, repeat):
+    """执行 repeat 次，返回每次耗时（秒）和最后一次的返回值"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - begin)
+    return timings, result
+
+
+def summarize(timings, items):
+    """耗时中位数和每秒处理的条目数"""
+    median = statistics.median(timings)
+    return {
+        'items': items,
+        'median_seconds': round(median, 6),
+        'min_seconds': round(min(timings), 6),
+        'items_per_second': round(items / median, 1) if median else None,
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD']).returncode != 0
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def bench_parse_title(manager, entries, repeat):
+    titles = [entry['title'] for entry in make_entries(entries, seed=1)]
+    timings, _ = timed(lambda: [manager.parse_title(title) for title in titles], repeat)
+    return summarize(timings, len(titles))
+
+
+def bench_parse(entries, repeat):
+    results = {}
+    for feed_format in ('rss1', 'atom'):
+        content = generate_feed(entries, feed_format=feed_format)
+        feedparser_timings, feed = timed(lambda: feedparser.parse(content), repeat)
+        stream_timings, parsed = timed(lambda: list(iter_entries(iter_chunks(content))), repeat)
+        results[feed_format] = {
+            'bytes': len(content),
+            'feedparser': summarize(feedparser_timings, len(feed.entries)),
+            'stream': summarize(stream_timings, len(parsed)),
+        }
+    return results
+
+
+def bench_ingest(manager, feeds, entries, overlap):
+    """feeds 个源各 entries 条：首次入库、全部重复、最新 overlap 条是新文章"""
+    urls = [feed_url(index) for index in range(feeds)]
+    journal_ids = manager.resolve_journals(urls)
+
+    def ingest(start, streaming):
+        contents = {url: generate_feed(entries, index, start=start) for index, url in enumerate(urls)}
+        manager.streaming = streaming
+        begin = time.perf_counter()
+        added = sum(manager.process_content(url, contents[url], journal_ids[url]) for url in urls)
+        seconds = time.perf_counter() - begin
+        return {
+            'entries': feeds * entries,
+            'added': added,
+            'seconds': round(seconds, 6),
+            'entries_per_second': round(feeds * entries / seconds, 1),
+            'ms_per_entry': round(seconds * 1000 / (feeds * entries), 3),
+        }
+
+    return {
+        'cold_insert': ingest(0, streaming=False),
+        'all_known': ingest(0, streaming=False),
+        'all_known_stream': ingest(0, streaming=True),
+        'partial_new': ingest(overlap, streaming=False),
+        'partial_new_stream': ingest(2 * overlap, streaming=True),
+    }
+
+
+def reset_translations(session_factory, articles, keep_cache):
+    """让前 articles 篇文章回到未翻译状态，其余文章视为已翻译"""
+    with session_factory() as session:
+        first_ids = select(Article.id).order_by(Article.id).limit(articles).subquery()
+        session.execute(update(Article).values(
+            title_zh=case((Article.id.in_(select(first_ids.c.id)), None), else_=Article.title),
+            summary_zh=None,
+        ))
+        session.execute(delete(TranslationState))
+        if not keep_cache:
+            session.execute(delete(TranslationCacheEntry))
+        session.commit()
+        return session.execute(
+            select(func.count()).select_from(Article).where(Article.title_zh.is_(None))
+        ).scalar()
+
+
+def over_budget(ingest_results, max_ms=INGEST_BUDGET_MS):
+    """每条的平均耗时超过 max_ms 的入库测试 {名称: 毫秒/条}"""
+    return {
+        name: result['ms_per_entry'] for name, result in ingest_results.items()
+        if result['ms_per_entry'] > max_ms
+    }
+
+
+def bench_translation(articles, latency):
+    from translate_articles import ArticleTranslator
+
+    session_factory = db_session.get_session_factory()
+    results = {}
+    modes = [('single', False, False), ('batched', True, False), ('batched_db_cache', True, True)]
+    for name, batched, keep_cache in modes:
+        pending = reset_translations(session_factory, articles, keep_cache)
+        client = StubChatClient(latency=latency)
+        # 配额设得足够大，测量的是流程本身而不是限流
+        translator = ArticleTranslator(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, client=client)
+        begin = time.perf_counter()
+        asyncio.run(translator.run(batched=batched))
+        seconds = time.perf_counter() - begin
+        with session_factory() as session:
+            remaining = session.execute(
+                select(func.count()).select_from(Article).where(Article.title_zh.is_(None))
+            ).scalar()
+        results[name] = {
+            'articles': pending,
+            'translated': pending - remaining,
+            'seconds': round(seconds, 6),
+            'articles_per_second': round((pending - remaining) / seconds, 1) if seconds else None,
+            'client': client.stats(),
+            'cache': translator.translation_cache.stats(),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取和翻译流程的离线基准测试")
+    parser.add_argument('--db-url', help="专用的测试数据库（默认使用临时 SQLite 文件）")
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS, default=SECTIONS, help="要运行的测试")
+    parser.add_argument('--feeds', type=int, default=5, help="入库测试的源数量")
+    parser.add_argument('--entries', type=int, default=1000, help="每个源的条目数")
+    parser.add_argument('--overlap', type=int, default=50, help="部分重叠测试中每个源的新条目数")
+    parser.add_argument('--articles', type=int, default=500, help="翻译测试的文章数")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟翻译接口的延迟（秒）")
+    parser.add_argument('--repeat', type=int, default=5, help="解析测试的重复次数")
+    parser.add_argument('--max-ingest-ms', type=float, default=INGEST_BUDGET_MS,
+                        help="入库每条的平均耗时上限（毫秒），超过时以状态码 1 退出，0 为不检查")
+    parser.add_argument('--output', help="结果写入 JSON 文件")
+    parser.add_argument('--verbose', action='store_true', help="输出抓取和翻译的日志")
+    args = parser.parse_args()
+
+    # 先配置日志，RSSManager / ArticleTranslator 中的 basicConfig 不会再覆盖
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_pipeline.db')}"
+    db_session.set_database_url(db_url)
+    Base.metadata.drop_all(db_session.get_engine())
+
+    from rss_scheduler import RSSManager
+    manager = RSSManager()
+
+    results = {}
+    if 'parse_title' in args.sections:
+        results['parse_title'] = bench_parse_title(manager, args.entries * args.feeds, args.repeat)
+    if 'parse' in args.sections:
+        results['parse'] = bench_parse(args.entries, args.repeat)
+    if 'ingest' in args.sections or 'translation' in args.sections:
+        # 翻译测试使用入库测试写入的文章
+        results['ingest'] = bench_ingest(manager, args.feeds, args.entries, args.overlap)
+    if 'translation' in args.sections:
+        results['translation'] = bench_translation(args.articles, args.latency)
+    results['db_pool'] = db_session.pool_status()
+
+    report = {
+        'benchmark': 'pipeline',
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'feedparser': feedparser.__version__,
+        'db': db_session.get_engine().dialect.name,
+        'params': {key: value for key, value in vars(args).items() if key not in ('db_url', 'output', 'verbose')},
+        'results': results,
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.max_ingest_ms and 'ingest' in results:
+        slow = over_budget(results['ingest'], args.max_ingest_ms)
+        for name, ms in slow.items():
+            logging.error(f"ingest/{name}: {ms:.2f} ms/条，超过上限 {args.max_ingest_ms} ms")
+        if slow:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
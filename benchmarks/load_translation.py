@@ -0,0 +1,309 @@
+"""翻译流程的压力测试
+
+对本地的模拟服务（benchmarks.mock_openai_server）运行 ArticleTranslator 和
+DatabaseManager 的翻译方法，输出吞吐量、重试次数和尾延迟，用于在改动生产配置前
+调整 worker 数、并发和限流参数。
+
+    python -m benchmarks.load_translation --articles 300 --workers 2 --rate-429 0.05 --rate-500 0.02
+    python -m benchmarks.load_translation --server-url http://127.0.0.1:8088/v1/ --targets translator_batched
+
+默认在后台线程启动模拟服务，并使用临时 SQLite 库。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import delete, func, select, update
+
+import db_session
+from benchmarks.mock_openai_server import ServerThread, add_config_arguments, config_from_args, percentiles
+from benchmarks.synthetic_feeds import make_entries
+from db_models import Base, Article, TranslationCacheEntry, TranslationState
+
+TARGETS = ['translator', 'translator_batched', 'db_async', 'db_sync', 'db_sync_save']
+
+
+class TimedChatClient:
+    """包装异步客户端，记录每次调用的耗时和异常（包含 SDK 内部的重试时间）"""
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+        self.errors = Counter()
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        begin = time.monotonic()
+        try:
+            return await self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            with self._lock:
+                self.errors[type(e).__name__] += 1
+            raise
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.latencies.append(time.monotonic() - begin)
+
+
+class MockServerHandle:
+    """内置的模拟服务直接读取统计，外部服务通过 /stats 接口"""
+
+    def __init__(self, server=None, base_url=None):
+        self.server = server
+        self.root = base_url.rstrip('/').rsplit('/v1', 1)[0] if base_url else None
+
+    def reset(self):
+        if self.server is not None:
+            self.server.reset()
+        else:
+            urllib.request.urlopen(urllib.request.Request(f"{self.root}/stats/reset", method='POST')).read()
+
+    def stats(self):
+        if self.server is not None:
+            return self.server.stats()
+        with urllib.request.urlopen(f"{self.root}/stats") as response:
+            return json.loads(response.read())
+
+
+def seed_articles(count):
+    """写入 count 篇未翻译的合成文章"""
+    from db_operations import DatabaseManager
+
+    manager = DatabaseManager()
+    manager.init_db()
+    entries = make_entries(count, seed=7)
+    journal_id = manager.get_or_create_journal('LoadTest', 'https://www.mdpi.com/rss/journal/loadtest')
+    manager.add_articles_batch([{
+        'title': entry['actual_title'],
+        'authors': entry['authors'],
+        'link': entry['link'],
+        'published': entry['published'],
+        'summary': entry['summary'],
+        'doi': entry['doi'],
+        'volume': str(entry['volume']),
+        'pages': entry['pages'],
+        'journal_id': journal_id,
+    } for entry in entries])
+
+
+def reset_translations():
+    """清空翻译结果、队列记录和翻译缓存，每个测试从相同的状态开始"""
+    with db_session.session_scope() as session:
+        session.execute(update(Article).values(title_zh=None, summary_zh=None))
+        session.execute(delete(TranslationState))
+        session.execute(delete(TranslationCacheEntry))
+
+
+def count_translated():
+    with db_session.session_scope() as session:
+        return session.execute(
+            select(func.count()).select_from(Article).where(Article.title_zh.isnot(None))
+        ).scalar()
+
+
+def load_articles(limit):
+    with db_session.session_scope() as session:
+        return [(a.title, a.summary) for a in session.query(Article).order_by(Article.id).limit(limit)]
+
+
+def run_translator(args, batched):
+    """workers 个 ArticleTranslator 在各自的线程和事件循环中领取任务"""
+    from translate_articles import ArticleTranslator
+
+    translators = []
+    for index in range(args.workers):
+        translator = ArticleTranslator(args.rpm, args.tpm)
+        translator.worker_id = f"{translator.worker_id}:{index}"
+        translator.client = TimedChatClient(translator.client)
+        translators.append(translator)
+
+    threads = [
+        threading.Thread(target=lambda t=t: asyncio.run(t.run(batched=batched, token_budget=args.token_budget)))
+        for t in translators
+    ]
+    begin = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.monotonic() - begin
+
+    latencies = [latency for t in translators for latency in t.client.latencies]
+    errors = sum((t.client.errors for t in translators), Counter())
+    translated = count_translated()
+    return {
+        'articles': args.articles,
+        'translated': translated,
+        'seconds': round(seconds, 3),
+        'articles_per_second': round(translated / seconds, 2) if seconds else None,
+        'client_calls': sum(t.client.calls for t in translators),
+        'client_errors': dict(errors),
+        'call_latency_seconds': percentiles(latencies),
+    }
+
+
+def run_db_async(args):
+    """DatabaseManager.translate_article_async，最多 concurrency 篇同时进行"""
+    from db_operations import DatabaseManager
+
+    manager = DatabaseManager()
+    manager.async_client = TimedChatClient(manager.async_client)
+    articles = load_articles(args.articles)
+    article_latencies = []
+
+    async def translate_all():
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def translate(title, summary):
+            async with semaphore:
+                begin = time.monotonic()
+                result = await manager.translate_article_async(title, summary)
+                article_latencies.append(time.monotonic() - begin)
+                return result
+
+        return await asyncio.gather(*(translate(title, summary) for title, summary in articles))
+
+    begin = time.monotonic()
+    results = asyncio.run(translate_all())
+    seconds = time.monotonic() - begin
+    translated = sum(1 for title_zh, _ in results if title_zh)
+    return {
+        'articles': len(articles),
+        'translated': translated,
+        'seconds': round(seconds, 3),
+        'articles_per_second': round(translated / seconds, 2) if seconds else None,
+        'client_calls': manager.async_client.calls,
+        'client_errors': dict(manager.async_client.errors),
+        'call_latency_seconds': percentiles(manager.async_client.latencies),
+        'article_latency_seconds': percentiles(article_latencies),
+    }
+
+
+def run_db_sync(args, method):
+    """DatabaseManager 的同步翻译方法，逐篇调用"""
+    from db_operations import DatabaseManager
+
+    manager = DatabaseManager()
+    translate = getattr(manager, method)
+    articles = load_articles(args.sync_articles)
+    article_latencies = []
+    translated = 0
+    begin = time.monotonic()
+    for title, summary in articles:
+        started = time.monotonic()
+        title_zh, _ = translate(title, summary)
+        article_latencies.append(time.monotonic() - started)
+        translated += 1 if title_zh else 0
+    seconds = time.monotonic() - begin
+    return {
+        'articles': len(articles),
+        'translated': translated,
+        'seconds': round(seconds, 3),
+        'articles_per_second': round(translated / seconds, 2) if seconds else None,
+        'article_latency_seconds': percentiles(article_latencies),
+    }
+
+
+def run_target(name, args):
+    if name == 'translator':
+        return run_translator(args, batched=False)
+    if name == 'translator_batched':
+        return run_translator(args, batched=True)
+    if name == 'db_async':
+        return run_db_async(args)
+    if name == 'db_sync':
+        return run_db_sync(args, 'translate_article')
+    return run_db_sync(args, 'translate_and_save_article')
+
+
+def run_all(args, handle):
+    results = {}
+    for name in args.targets:
+        reset_translations()
+        handle.reset()
+        print(f"Running {name} ...")
+        result = run_target(name, args)
+        server = handle.stats()
+        result['server'] = {key: server[key] for key in ('counts', 'tokens', 'max_in_flight', 'latency_seconds')}
+        # 服务端收到的请求比客户端调用多出的部分是 SDK 内部的重试
+        if 'client_calls' in result:
+            result['sdk_retries'] = server['counts']['requests'] - result['client_calls']
+        result['requests_per_article'] = round(server['counts']['requests'] / result['articles'], 3) \
+            if result['articles'] else None
+        results[name] = result
+    return results
+
+
+def main():
+    from rate_limiter import REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE
+    from translate_articles import BATCH_TOKEN_BUDGET
+
+    parser = argparse.ArgumentParser(description="翻译流程的压力测试（使用本地模拟服务）")
+    parser.add_argument('--server-url', help="已启动的模拟服务地址（默认在后台启动一个）")
+    parser.add_argument('--db-url', help="专用的测试数据库（默认使用临时 SQLite 文件）")
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS, help="要测试的翻译方法")
+    parser.add_argument('--articles', type=int, default=200, help="文章数")
+    parser.add_argument('--sync-articles', type=int, default=20, help="同步方法测试的文章数（逐篇调用，较慢）")
+    parser.add_argument('--workers', type=int, default=1, help="ArticleTranslator 的 worker 数")
+    parser.add_argument('--concurrency', type=int, default=8, help="translate_article_async 的并发数")
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE, help="每个 worker 的每分钟请求数")
+    parser.add_argument('--tpm', type=int, default=TOKENS_PER_MINUTE, help="每个 worker 的每分钟token数")
+    parser.add_argument('--token-budget', type=int, default=BATCH_TOKEN_BUDGET, help="批量翻译每个请求的token预算")
+    parser.add_argument('--output', help="结果写入 JSON 文件")
+    parser.add_argument('--verbose', action='store_true', help="输出翻译日志")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_translation.db')}"
+    db_session.set_database_url(db_url)
+    Base.metadata.drop_all(db_session.get_engine())
+    seed_articles(args.articles)
+    os.environ.setdefault('RSS2WEB_OPENAI_API_KEY', 'mock')
+
+    config = config_from_args(args)
+    if args.server_url:
+        os.environ['RSS2WEB_OPENAI_BASE_URL'] = args.server_url
+        results = run_all(args, MockServerHandle(base_url=args.server_url))
+    else:
+        with ServerThread(config) as thread:
+            os.environ['RSS2WEB_OPENAI_BASE_URL'] = thread.base_url
+            results = run_all(args, MockServerHandle(server=thread.server))
+
+    print(f"\n{'target':<20}{'done':>10}{'art/s':>10}{'req/art':>10}{'p50 s':>10}{'p99 s':>10}")
+    for name, result in results.items():
+        latency = result.get('article_latency_seconds') or result.get('call_latency_seconds')
+        print(f"{name:<20}{result['translated']:>5}/{result['articles']:<4}"
+              f"{result['articles_per_second'] or 0:>10.2f}{result['requests_per_article'] or 0:>10.2f}"
+              f"{latency['p50'] or 0:>10.3f}{latency['p99'] or 0:>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'load_translation',
+                'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+                'db': db_session.get_engine().dialect.name,
+                'server': None if args.server_url else vars(config),
+                'params': {key: value for key, value in vars(args).items()
+                           if key not in ('db_url', 'output', 'verbose')},
+                'results': results,
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""本地的 OpenAI 兼容模拟服务（只实现 chat completions）
+
+用于在不花钱的情况下测试翻译的并发、重试和限流：
+
+- 延迟分布：fixed / uniform / exponential / lognormal，外加按输出token计算的生成时间
+- 按比例注入 429、500 和格式错误的 JSON
+- 可选的每分钟请求数 / token数配额，超出时返回 429 和 retry-after
+- 统计请求数、token用量和服务端延迟分位数（GET /stats，POST /stats/reset）
+
+    python -m benchmarks.mock_openai_server --port 8088 --latency-ms 800 --rate-429 0.05
+    export RSS2WEB_OPENAI_BASE_URL=http://127.0.0.1:8088/v1/
+"""
+import argparse
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+
+from aiohttp import web
+
+from benchmarks.stub_client import respond
+from translate_articles import estimate_tokens
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+
+@dataclass
+class MockConfig:
+    latency_dist: str = 'lognormal'
+    latency_ms: float = 500.0       # fixed 为固定值，其余为中位数（exponential 为均值）
+    latency_sigma: float = 0.5      # lognormal 的 sigma，uniform 为相对中位数的浮动比例
+    ms_per_token: float = 0.0       # 每个输出token额外的生成时间
+    rate_429: float = 0.0
+    rate_500: float = 0.0
+    rate_malformed: float = 0.0
+    retry_after: float = 1.0        # 429 响应的 retry-after（秒）
+    rpm: int = 0                    # 每分钟请求数配额，0 表示不限制
+    tpm: int = 0                    # 每分钟token数配额，0 表示不限制
+    seed: int = None
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """最近邻法计算分位数，返回 {'p50': ..., 'max': ...}"""
+    result = {}
+    if not samples:
+        result.update({f"p{p}": None for p in points})
+        result['max'] = None
+        return result
+    ordered = sorted(samples)
+    for p in points:
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        result[f"p{p}"] = round(ordered[index], 6)
+    result['max'] = round(ordered[-1], 6)
+    return result
+
+
+class MockOpenAIServer:
+    def __init__(self, config=None):
+        self.config = config or MockConfig()
+        self.random = random.Random(self.config.seed)
+        self._window = deque()          # (时间, token数)，最近一分钟的请求
+        self.reset()
+
+    def reset(self):
+        self.counts = {
+            'requests': 0,
+            'ok': 0,
+            'injected_429': 0,
+            'quota_429': 0,
+            'injected_500': 0,
+            'malformed': 0,
+            'bad_request': 0,
+        }
+        self.tokens = {'prompt': 0, 'completion': 0}
+        self.latencies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started_at = time.monotonic()
+
+    def sample_latency(self, completion_tokens=0):
+        """按配置的分布抽取一次延迟（秒）"""
+        config = self.config
+        base = config.latency_ms
+        if config.latency_dist == 'uniform':
+            base *= self.random.uniform(1 - config.latency_sigma, 1 + config.latency_sigma)
+        elif config.latency_dist == 'exponential':
+            base = self.random.expovariate(1 / base) if base > 0 else 0
+        elif config.latency_dist == 'lognormal':
+            base *= self.random.lognormvariate(0, config.latency_sigma)
+        return max(0.0, base + config.ms_per_token * completion_tokens) / 1000
+
+    def _over_quota(self, tokens):
+        """检查最近一分钟的配额，未超出时记入窗口"""
+        config = self.config
+        if not config.rpm and not config.tpm:
+            return False
+        now = time.monotonic()
+        while self._window and now - self._window[0][0] >= 60:
+            self._window.popleft()
+        used_tokens = sum(item[1] for item in self._window)
+        if (config.rpm and len(self._window) + 1 > config.rpm) or \
+                (config.tpm and used_tokens + tokens > config.tpm):
+            return True
+        self._window.append((now, tokens))
+        return False
+
+    def _error(self, status, message, error_type, headers=None):
+        return web.json_response(
+            {'error': {'message': message, 'type': error_type, 'code': None}},
+            status=status, headers=headers
+        )
+
+    def _rate_limited(self, message):
+        return self._error(429, message, 'rate_limit_error', {'retry-after': str(self.config.retry_after)})
+
+    async def handle_chat(self, request):
+        begin = time.monotonic()
+        self.counts['requests'] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await self._chat(request)
+        finally:
+            self.in_flight -= 1
+            self.latencies.append(time.monotonic() - begin)
+
+    async def _chat(self, request):
+        config = self.config
+        try:
+            body = await request.json()
+            prompt = body['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError, TypeError):
+            self.counts['bad_request'] += 1
+            return self._error(400, "invalid request body", 'invalid_request_error')
+
+        prompt_tokens = estimate_tokens(prompt)
+        max_tokens = body.get('max_tokens') or 0
+        if self._over_quota(prompt_tokens + max_tokens):
+            self.counts['quota_429'] += 1
+            return self._rate_limited("Rate limit reached (quota)")
+        if self.random.random() < config.rate_429:
+            self.counts['injected_429'] += 1
+            return self._rate_limited("Rate limit reached (injected)")
+
+        content = respond(prompt)
+        completion_tokens = estimate_tokens(content)
+        await asyncio.sleep(self.sample_latency(completion_tokens))
+
+        if self.random.random() < config.rate_500:
+            self.counts['injected_500'] += 1
+            return self._error(500, "The server had an error (injected)", 'server_error')
+        if self.random.random() < config.rate_malformed:
+            self.counts['malformed'] += 1
+            if self.random.random() < 0.5:
+                content = content[:len(content) // 2]
+            else:
+                content = f"以下是翻译结果：\n{content}"
+        else:
+            self.counts['ok'] += 1
+
+        self.tokens['prompt'] += prompt_tokens
+        self.tokens['completion'] += completion_tokens
+        return web.json_response({
+            'id': f"chatcmpl-mock{self.counts['requests']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at
+        return {
+            'config': asdict(self.config),
+            'elapsed_seconds': round(elapsed, 3),
+            'counts': dict(self.counts),
+            'tokens': dict(self.tokens),
+            'requests_per_second': round(self.counts['requests'] / elapsed, 2) if elapsed else None,
+            'max_in_flight': self.max_in_flight,
+            'latency_seconds': percentiles(self.latencies),
+        }
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats())
+
+    async def handle_reset(self, request):
+        self.reset()
+        return web.json_response({'reset': True})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.handle_chat)
+        app.router.add_post('/chat/completions', self.handle_chat)
+        app.router.add_get('/stats', self.handle_stats)
+        app.router.add_post('/stats/reset', self.handle_reset)
+        return app
+
+
+class ServerThread:
+    """在后台线程的事件循环中运行模拟服务，供同步或使用自己事件循环的代码调用
+
+        with ServerThread(MockConfig(rate_429=0.1)) as server:
+            os.environ['RSS2WEB_OPENAI_BASE_URL'] = server.base_url
+    """
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.server = MockOpenAIServer(config)
+        self.host = host
+        self.port = port
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1/"
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.server.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # port=0 时取实际分配的端口
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def add_config_arguments(parser):
+    """模拟服务的命令行参数（load_translation 也使用）"""
+    parser.add_argument('--latency-dist', choices=LATENCY_DISTRIBUTIONS, default='lognormal', help="延迟分布")
+    parser.add_argument('--latency-ms', type=float, default=500.0, help="延迟中位数（毫秒）")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="lognormal 的 sigma / uniform 的浮动比例")
+    parser.add_argument('--ms-per-token', type=float, default=0.0, help="每个输出token的生成时间（毫秒）")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="注入 429 的比例")
+    parser.add_argument('--rate-500', type=float, default=0.0, help="注入 500 的比例")
+    parser.add_argument('--rate-malformed', type=float, default=0.0, help="返回格式错误JSON的比例")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="429 响应的 retry-after（秒）")
+    parser.add_argument('--server-rpm', type=int, default=0, help="服务端每分钟请求数配额（0 不限制）")
+    parser.add_argument('--server-tpm', type=int, default=0, help="服务端每分钟token数配额（0 不限制）")
+    parser.add_argument('--seed', type=int, help="随机种子")
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        ms_per_token=args.ms_per_token,
+        rate_429=args.rate_429,
+        rate_500=args.rate_500,
+        rate_malformed=args.rate_malformed,
+        retry_after=args.retry_after,
+        rpm=args.server_rpm,
+        tpm=args.server_tpm,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地的 OpenAI 兼容模拟服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(config_from_args(args))
+    print(f"Mock OpenAI server on http://{args.host}:{args.port}/v1/ (stats: /stats)")
+    web.run_app(server.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""不联网的翻译接口模拟客户端
+
+接口与 openai.AsyncOpenAI 的 client.chat.completions.create 相同，按提示词的格式
+（逐篇翻译或批量 JSON 数组）返回合法的翻译结果，可设置固定延迟。
+"""
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+from translate_articles import estimate_tokens
+
+_SINGLE_RE = re.compile(r'标题：(.*?)\n\s*摘要：(.*?)\n', re.S)
+
+
+def fake_translation(text):
+    """把英文原文变成可辨认的“译文”"""
+    return f"[zh] {text[:200]}"
+
+
+def respond(prompt):
+    """根据 translate_articles 的提示词生成回复内容"""
+    marker = '文章：\n'
+    if marker in prompt:
+        articles = json.loads(prompt.split(marker, 1)[1])
+        return json.dumps([
+            [number, fake_translation(title), fake_translation(summary)]
+            for number, title, summary in articles
+        ], ensure_ascii=False, separators=(',', ':'))
+    match = _SINGLE_RE.search(prompt)
+    title, summary = match.groups() if match else ('', '')
+    return json.dumps({
+        'title': fake_translation(title or 'title'),
+        'abstract': fake_translation(summary or 'abstract'),
+    }, ensure_ascii=False)
+
+
+class _Completions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        if self.owner.latency:
+            await asyncio.sleep(self.owner.latency)
+        content = respond(prompt)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        self.owner.requests += 1
+        self.owner.prompt_tokens += prompt_tokens
+        self.owner.completion_tokens += completion_tokens
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+
+class StubChatClient:
+    """模拟的异步客户端，记录请求数和token用量"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+        }
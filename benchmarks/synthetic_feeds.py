@@ -0,0 +1,202 @@
+"""生成与 MDPI 相同结构的合成 RSS 1.0 / Atom 源
+
+标题使用 MDPI 的 "Journal, Vol. X, Pages Y: Title" 格式，其中一部分标题本身带冒号，
+少量条目没有卷号页码，用来覆盖 RSSManager.parse_title 的各个分支。
+
+    python -m benchmarks.synthetic_feeds --entries 500 --format atom > feed.xml
+"""
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+from xml.sax.saxutils import escape
+
+JOURNALS = [
+    ('Remote Sensing', 'remotesensing', 'rs'),
+    ('Sensors', 'sensors', 's'),
+    ('ISPRS International Journal of Geo-Information', 'ijgi', 'ijgi'),
+    ('Land', 'land', 'land'),
+    ('Sustainability', 'sustainability', 'su'),
+]
+
+WORDS = (
+    'remote sensing satellite imagery land cover classification deep learning urban '
+    'vegetation index spatial temporal analysis hyperspectral lidar point cloud model '
+    'estimation change detection monitoring network convolutional segmentation soil '
+    'moisture drought flood forest biomass sentinel landsat uav multispectral mapping'
+).split()
+
+# 约 10% 的标题本身带冒号，约 5% 的条目没有卷号页码
+COLON_TITLE_RATIO = 0.1
+PLAIN_TITLE_RATIO = 0.05
+
+RSS1_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/" \
+xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:prism="http://prismstandard.org/namespaces/basic/2.0/" \
+xmlns:cc="http://web.resource.org/cc/">
+<channel rdf:about="https://www.mdpi.com/rss/journal/{slug}">
+<title>{journal}</title>
+<description>Latest open access articles published in {journal} at https://www.mdpi.com/journal/{slug}</description>
+<link>https://www.mdpi.com/journal/{slug}</link>
+<items><rdf:Seq>
+{seq}
+</rdf:Seq></items>
+</channel>
+"""
+
+RSS1_ITEM = """<item rdf:about="{link}">
+<title>{title}</title>
+<link>{link}</link>
+<description>{description}</description>
+{creators}
+<dc:title>{actual_title}</dc:title>
+<dc:identifier>doi: {doi}</dc:identifier>
+<dc:source>{journal}, Vol. {volume}, Pages {pages}</dc:source>
+<dc:date>{published}</dc:date>
+<prism:publicationName>{journal}</prism:publicationName>
+<prism:publicationDate>{published}</prism:publicationDate>
+<prism:volume>{volume}</prism:volume>
+<prism:number>{number}</prism:number>
+<prism:section>Article</prism:section>
+<prism:startingPage>{pages}</prism:startingPage>
+<prism:doi>{doi}</prism:doi>
+<prism:url>{link}</prism:url>
+<cc:license rdf:resource="CC BY 4.0"/>
+</item>
+"""
+
+ATOM_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:prism="http://prismstandard.org/namespaces/basic/2.0/">
+<title>{journal}</title>
+<id>https://www.mdpi.com/rss/journal/{slug}</id>
+<link href="https://www.mdpi.com/journal/{slug}"/>
+<updated>{updated}T00:00:00Z</updated>
+"""
+
+ATOM_ENTRY = """<entry>
+<title>{title}</title>
+<id>{link}</id>
+<link rel="alternate" href="{link}"/>
+<published>{published}</published>
+<updated>{published}</updated>
+{authors}
+<summary>{summary}</summary>
+<prism:doi>{doi}</prism:doi>
+</entry>
+"""
+
+
+def _sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def make_entries(count, journal_index=0, start=0, seed=0, newest=date(2024, 6, 30)):
+    """生成条目数据，按发布日期从新到旧排列（与 MDPI 一致）
+
+    序号 start..start+count-1 决定DOI，相同序号在不同调用中生成相同的条目，
+    因此可以用重叠的序号范围模拟“部分条目已入库”的源。
+    """
+    journal, slug, prefix = JOURNALS[journal_index % len(JOURNALS)]
+    entries = []
+    for number in range(start + count - 1, start - 1, -1):
+        rng = random.Random(f"{seed}:{journal_index}:{number}")
+        actual_title = _sentence(rng, 6, 14).capitalize()
+        if rng.random() < COLON_TITLE_RATIO:
+            actual_title = f"{actual_title}: {_sentence(rng, 3, 6)}"
+        volume = 10 + number // 2000
+        pages = str(number + 1)
+        if rng.random() < PLAIN_TITLE_RATIO:
+            title = actual_title
+        else:
+            title = f"{journal}, Vol. {volume}, Pages {pages}: {actual_title}"
+        entries.append({
+            'journal': journal,
+            'title': title,
+            'actual_title': actual_title,
+            'link': f"https://www.mdpi.com/{number // 1000}/{number % 1000}/{number}",
+            'doi': f"10.3390/{prefix}{volume}{number:06d}",
+            'authors': [f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}"
+                        for _ in range(rng.randint(1, 8))],
+            'summary': '. '.join(_sentence(rng, 12, 30).capitalize() for _ in range(rng.randint(4, 10))) + '.',
+            'published': (newest - timedelta(days=(start + count - 1 - number) // 50)).isoformat(),
+            'volume': volume,
+            'number': number // 500 + 1,
+            'pages': pages,
+        })
+    return entries
+
+
+def render_rss1(entries, journal_index=0):
+    """MDPI 使用的 RSS 1.0 (RDF) 格式，描述中带 HTML"""
+    journal, slug, _ = JOURNALS[journal_index % len(JOURNALS)]
+    seq = '\n'.join(f'<rdf:li rdf:resource="{escape(e["link"])}"/>' for e in entries)
+    parts = [RSS1_HEADER.format(journal=escape(journal), slug=slug, seq=seq)]
+    for e in entries:
+        description = (
+            f"<p><b>{e['actual_title']}</b></p><p>{e['journal']}, Vol. {e['volume']}, "
+            f"Pages {e['pages']}: <a href=\"{e['link']}\">{e['link']}</a></p>"
+            f"<p>Authors: {', '.join(e['authors'])}</p><p>{e['summary']}</p>"
+        )
+        parts.append(RSS1_ITEM.format(
+            title=escape(e['title']),
+            actual_title=escape(e['actual_title']),
+            link=escape(e['link']),
+            description=escape(description),
+            creators='\n'.join(f"<dc:creator>{escape(name)}</dc:creator>" for name in e['authors']),
+            doi=e['doi'],
+            journal=escape(e['journal']),
+            published=e['published'],
+            volume=e['volume'],
+            number=e['number'],
+            pages=e['pages'],
+        ))
+    parts.append('</rdf:RDF>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def render_atom(entries, journal_index=0):
+    """Atom 格式（published 使用 YYYY-MM-DD，与入库时的日期解析一致）"""
+    journal, slug, _ = JOURNALS[journal_index % len(JOURNALS)]
+    updated = entries[0]['published'] if entries else date.today().isoformat()
+    parts = [ATOM_HEADER.format(journal=escape(journal), slug=slug, updated=updated)]
+    for e in entries:
+        parts.append(ATOM_ENTRY.format(
+            title=escape(e['title']),
+            link=escape(e['link']),
+            published=e['published'],
+            authors='\n'.join(f"<author><name>{escape(name)}</name></author>" for name in e['authors']),
+            summary=escape(e['summary']),
+            doi=e['doi'],
+        ))
+    parts.append('</feed>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+RENDERERS = {'rss1': render_rss1, 'atom': render_atom}
+
+
+def generate_feed(count, journal_index=0, feed_format='rss1', start=0, seed=0):
+    """生成一个合成源的字节内容"""
+    entries = make_entries(count, journal_index=journal_index, start=start, seed=seed)
+    return RENDERERS[feed_format](entries, journal_index)
+
+
+def feed_url(journal_index):
+    """合成源对应的 RSS 地址（最后一段用作期刊名）"""
+    _, slug, _ = JOURNALS[journal_index % len(JOURNALS)]
+    return f"https://www.mdpi.com/rss/journal/{slug}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成的 MDPI 风格 RSS/Atom 源")
+    parser.add_argument('--entries', type=int, default=100, help="条目数")
+    parser.add_argument('--journal', type=int, default=0, help=f"期刊序号（0-{len(JOURNALS) - 1}）")
+    parser.add_argument('--format', choices=sorted(RENDERERS), default='rss1', help="源格式")
+    parser.add_argument('--start', type=int, default=0, help="起始序号")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    sys.stdout.buffer.write(generate_feed(args.entries, args.journal, args.format, args.start, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import (create_engine, Column, Integer, SmallInteger, BigInteger, Float, String, Text, LargeBinary,
+                        DateTime, ForeignKey, Table, Index, text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
@@ -10,7 +11,19 @@ article_tags = Table(
     'article_tags',
     Base.metadata,
     Column('article_id', Integer, ForeignKey('articles.id')),
-    Column('tag_id', Integer, ForeignKey('tags.id'))
+    Column('tag_id', Integer, ForeignKey('tags.id')),
+    Index('ix_article_tags_article_id', 'article_id'),
+    Index('ix_article_tags_tag_id', 'tag_id', 'article_id'),   # 按标签查文章
+)
+
+# 文章-作者关联表（position 保留作者顺序）
+article_authors = Table(
+    'article_authors',
+    Base.metadata,
+    Column('article_id', Integer, ForeignKey('articles.id'), primary_key=True),
+    Column('position', Integer, primary_key=True),
+    Column('author_id', Integer, ForeignKey('authors.id'), nullable=False),
+    Index('ix_article_authors_author_id', 'author_id', 'article_id'),   # 按作者查文章
 )
 
 class Journal(Base):
@@ -21,12 +34,43 @@ class Journal(Base):
     rss_url = Column(String(500), nullable=False)
     description = Column(Text)
     articles = relationship("Article", back_populates="journal")
+    feed_state = relationship("FeedState", back_populates="journal", uselist=False)
+
+class FeedState(Base):
+    """RSS源抓取状态（条件请求缓存）"""
+    __tablename__ = 'feed_states'
+    
+    id = Column(Integer, primary_key=True)
+    journal_id = Column(Integer, ForeignKey('journals.id'), nullable=False, unique=True)
+    etag = Column(String(500))            # 上次响应的 ETag
+    last_modified = Column(String(100))   # 上次响应的 Last-Modified
+    content_hash = Column(String(64))     # 上次处理内容的 SHA-256
+    last_status = Column(Integer)
+    last_fetched_at = Column(DateTime)
+    # 自适应轮询
+    poll_interval = Column(Integer)            # 当前轮询间隔（秒）
+    next_poll_at = Column(DateTime)            # 下次轮询时间
+    consecutive_failures = Column(Integer)     # 连续失败次数
+    last_new_at = Column(DateTime)             # 最近一次发现新文章的时间
+    
+    journal = relationship("Journal", back_populates="feed_state")
 
 class Article(Base):
     __tablename__ = 'articles'
+    __table_args__ = (
+        Index('ix_articles_doi', 'doi', unique=True),                          # 去重
+        Index('ix_articles_published_date', 'published_date', 'id'),           # 网页按发布时间排序
+        Index('ix_articles_journal_id', 'journal_id', 'published_date'),
+        Index('ix_articles_duplicate_of', 'duplicate_of'),
+        # 只包含未翻译文章的部分索引（PostgreSQL / SQLite）
+        Index('ix_articles_untranslated', 'id',
+              postgresql_where=text('title_zh IS NULL'),
+              sqlite_where=text('title_zh IS NULL')),
+    )
     
     id = Column(Integer, primary_key=True)
     title = Column(String(500), nullable=False)
+    raw_title = Column(Text)        # RSS 中的原始标题（含期刊、卷号和页码），重新解析时使用
     title_zh = Column(String(500))  # 中文标题
     volume = Column(String(200))    # 增加长度
     pages = Column(String(200))     # 增加长度
@@ -38,9 +82,12 @@ class Article(Base):
     summary_zh = Column(Text)
     journal_id = Column(Integer, ForeignKey('journals.id'))
     image_url = Column(String(500))
+    duplicate_of = Column(Integer, ForeignKey('articles.id'))   # 近似重复时指向规范文章，复用它的翻译
     
     journal = relationship("Journal", back_populates="articles")
     tags = relationship("Tag", secondary=article_tags)
+    author_list = relationship("Author", secondary=article_authors, order_by=article_authors.c.position,
+                               viewonly=True)
     comments = relationship("Comment", back_populates="article")
 
 class Tag(Base):
@@ -49,8 +96,68 @@ class Tag(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False, unique=True)
 
+class Author(Base):
+    """规范化的作者名（name_key 为去掉大小写和多余空白后的名字）"""
+    __tablename__ = 'authors'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(300), nullable=False)                   # 第一次出现时的写法
+    name_key = Column(String(300), nullable=False, unique=True)
+
+class TagTerm(Base):
+    """自动标签的语料统计：包含每个词的文章数（term 为空字符串的行是文章总数）"""
+    __tablename__ = 'tag_terms'
+    
+    term = Column(String(100), primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0)
+
+class ArticleSignature(Base):
+    """文章的 MinHash 签名（duplicates.NUM_PERM 个小端 uint32）"""
+    __tablename__ = 'article_signatures'
+    
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class ArticleLshBand(Base):
+    """MinHash 签名的 LSH 分段，(band, bucket) 相同的文章是近似重复的候选"""
+    __tablename__ = 'article_lsh_bands'
+    
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+
+class ArticleVector(Base):
+    """文章的哈希 TF-IDF 向量（related.DIM 个小端 float32，已归一化）和所属的倒排列表"""
+    __tablename__ = 'article_vectors'
+    __table_args__ = (
+        Index('ix_article_vectors_list_no', 'list_no', 'article_id'),
+    )
+    
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    list_no = Column(Integer, nullable=False)   # 最近的聚类中心
+    vector = Column(LargeBinary, nullable=False)
+
+class VectorCentroid(Base):
+    """倒排索引（IVF）的聚类中心，related.py --rebuild 时重新训练"""
+    __tablename__ = 'vector_centroids'
+    
+    list_no = Column(Integer, primary_key=True)
+    vector = Column(LargeBinary, nullable=False)
+
+class RelatedArticle(Base):
+    """预先计算的相关文章，每篇文章按相似度排序的前 related.TOP_K 篇"""
+    __tablename__ = 'related_articles'
+    
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    rank = Column(SmallInteger, primary_key=True)
+    related_id = Column(Integer, ForeignKey('articles.id'), nullable=False)
+    score = Column(Float, nullable=False)
+
 class Comment(Base):
     __tablename__ = 'comments'
+    __table_args__ = (
+        Index('ix_comments_article_id', 'article_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     article_id = Column(Integer, ForeignKey('articles.id'))
@@ -66,4 +173,94 @@ class User(Base):
     
     id = Column(Integer, primary_key=True)
     username = Column(String(100), nullable=False, unique=True)
-    email = Column(String(200))
\ No newline at end of file
+    email = Column(String(200))
+
+class TranslationCacheEntry(Base):
+    """翻译缓存，按 (模型, 提示词版本, 原文) 的哈希寻址，重置数据库时保留"""
+    __tablename__ = 'translation_cache'
+    
+    key = Column(String(64), primary_key=True)  # SHA-256 十六进制
+    model = Column(String(100), nullable=False)
+    title_zh = Column(Text, nullable=False)
+    summary_zh = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TranslationState(Base):
+    """翻译队列状态：租约、尝试次数、最后的错误和下次可重试的时间"""
+    __tablename__ = 'translation_states'
+    
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    status = Column(String(20), nullable=False, default='pending')  # pending / gave_up
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    next_attempt_at = Column(DateTime)
+    leased_by = Column(String(100))      # 当前领取该文章的 worker
+    lease_expires_at = Column(DateTime)  # 租约到期后其他 worker 可以重新领取
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    article = relationship("Article")
+
+class ArticleListing(Base):
+    """文章列表快照：列表页需要的字段和期刊名，按 (published_date, article_id) 键集分页"""
+    __tablename__ = 'article_listings'
+    __table_args__ = (
+        Index('ix_article_listings_published', 'published_date', 'article_id'),
+        Index('ix_article_listings_journal', 'journal_id', 'published_date', 'article_id'),
+        Index('ix_article_listings_updated_at', 'updated_at'),
+    )
+    
+    article_id = Column(Integer, ForeignKey('articles.id'), primary_key=True)
+    journal_id = Column(Integer, nullable=False)
+    journal_name = Column(String(200))
+    published_date = Column(DateTime, nullable=False)  # 没有发布时间的文章按 1970-01-01 排序
+    title = Column(String(500), nullable=False)
+    title_zh = Column(String(500))
+    summary = Column(Text)
+    summary_zh = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # 插入或保存翻译的时间（静态导出按此增量生成）
+
+class ListingCount(Base):
+    """每个期刊的文章数（journal_id 为 0 的行是全部文章），随快照增量更新，列表页不需要 COUNT(*)"""
+    __tablename__ = 'listing_counts'
+    
+    journal_id = Column(Integer, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class PublishedFeed(Base):
+    """生成的 Atom / RSS / JSON Feed 缓存
+
+    文章入库或保存翻译时 version 加 1，built_version 落后于 version 的缓存需要重新生成
+    """
+    __tablename__ = 'published_feeds'
+    
+    feed = Column(String(50), primary_key=True)      # all / journal-<期刊ID>
+    format = Column(String(10), primary_key=True)    # atom / rss / json
+    body = Column(Text)
+    etag = Column(String(70))
+    version = Column(Integer, nullable=False, default=1)
+    built_version = Column(Integer, nullable=False, default=0)
+    entry_count = Column(Integer)
+    oldest_published = Column(DateTime)   # 缓存中最早的条目，更早的文章变化不影响该订阅源
+    oldest_article_id = Column(Integer)
+    generated_at = Column(DateTime)
+
+class BackfillProgress(Base):
+    """backfill.py 每个转换处理到的文章ID，与该批的更新在同一个事务中提交"""
+    __tablename__ = 'backfill_progress'
+    
+    transform = Column(String(50), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    changed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class SchemaMigration(Base):
+    """已执行的数据库迁移版本"""
+    __tablename__ = 'schema_migrations'
+    
+    version = Column(Integer, primary_key=True)
+    description = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -1,29 +1,40 @@
 import json
+import os
 import time
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from db_models import Base, Journal, Article, Tag, Comment, User
+from db_models import Base, Journal, Article, Tag, Comment, User, FeedState, TranslationState
 from datetime import datetime
 import openai
 from typing import Tuple, Optional
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.future import select
+from translation_cache import TranslationCache, TRANSLATION_MODEL
+from db_session import DATABASE_URL, ensure_schema, get_engine, get_session_factory, session_scope
+import authors
+import duplicates
+import listings
+import metrics
+import search_index
+import tagger
+from profiling import span
 
 class DatabaseManager:
     def __init__(self):
-        # 数据库连接URL
-        self.db_url = "你的数据库链接"
-        self.engine = create_engine(self.db_url)
-        self.Session = sessionmaker(bind=self.engine)
+        # 数据库连接（进程内共享引擎和连接池，见 db_session）
+        self.db_url = DATABASE_URL
+        self.engine = get_engine()
+        self.Session = get_session_factory()
+        self.translation_cache = TranslationCache(self.Session)
         
         # 配置 OpenAI
-        openai.api_key = "sk-LsJwuRBc4eikc3Ir002fD6B9F89349E3A65258650a88F3F6"
-        openai.base_url = "https://api.gpt.ge/v1/"
+        # 可用环境变量指向其他兼容接口（例如本地的模拟服务）
+        openai.api_key = os.environ.get('RSS2WEB_OPENAI_API_KEY', "sk-LsJwuRBc4eikc3Ir002fD6B9F89349E3A65258650a88F3F6")
+        openai.base_url = os.environ.get('RSS2WEB_OPENAI_BASE_URL', "https://api.gpt.ge/v1/")
+        self.async_client = openai.AsyncOpenAI(api_key=openai.api_key, base_url=openai.base_url)
 
     def init_db(self):
-        """初始化数据库表"""
-        Base.metadata.create_all(self.engine)
+        """初始化数据库表，并对已有的库执行未完成的迁移"""
+        ensure_schema()
         
     def add_journal(self, name, rss_url, description=""):
         """添加期刊"""
@@ -60,6 +71,11 @@ class DatabaseManager:
     
     def translate_and_save_article(self, title: str, summary: str, max_retries: int = 6):
         """翻译单个文章并返回结果"""
+        cached = self.translation_cache.get(title, summary)
+        if cached:
+            print("使用缓存的翻译")
+            return cached
+            
         for attempt in range(max_retries):
             try:
                 prompt = f"""请将以下英文标题和摘要翻译成中文：
@@ -74,7 +90,7 @@ class DatabaseManager:
                 }}"""
                 
                 completion = openai.chat.completions.create(
-                    model="gpt-4o-mini",
+                    model=TRANSLATION_MODEL,
                     messages=[{"role": "user", "content": prompt}],
                     temperature=0.3,
                     max_tokens=2000
@@ -86,6 +102,7 @@ class DatabaseManager:
                 # 验证翻译结果不为空
                 if translation['title'].strip() and translation['abstract'].strip():
                     print(f"文章翻译成功 (尝试 {attempt + 1}/{max_retries})")
+                    self.translation_cache.put(title, summary, translation['title'], translation['abstract'])
                     return translation['title'], translation['abstract']
                 else:
                     raise ValueError("翻译结果为空")
@@ -124,6 +141,7 @@ class DatabaseManager:
             # 创建并立即保存文章
             article = Article(
                 title=article_data['title'],
+                raw_title=article_data.get('raw_title'),
                 title_zh=title_zh,  # 如果翻译失败，这里会是 None
                 volume=article_data.get('volume', ''),
                 pages=article_data.get('pages', ''),
@@ -137,6 +155,12 @@ class DatabaseManager:
             )
             
             session.add(article)
+            session.flush()
+            duplicates.link_articles(session, [article])
+            search_index.index_articles(session, [article])
+            listings.add_articles(session, [article])
+            authors.link_articles(session, [article])
+            tagger.tag_articles(session, [article])
             session.commit()
             article_id = article.id
             
@@ -182,6 +206,7 @@ class DatabaseManager:
             # 创建文章对象
             article = Article(
                 title=article_data['title'],
+                raw_title=article_data.get('raw_title'),
                 title_zh=title_zh,
                 volume=article_data.get('volume', ''),
                 pages=article_data.get('pages', ''),
@@ -209,6 +234,10 @@ class DatabaseManager:
 
     async def translate_article_async(self, title: str, summary: str, max_retries: int = 3):
         """异步翻译文章"""
+        cached = self.translation_cache.get(title, summary)
+        if cached:
+            return cached
+            
         for attempt in range(max_retries):
             try:
                 prompt = f"""请将以下英文标题和摘要翻译成中文：
@@ -222,8 +251,8 @@ class DatabaseManager:
                     "abstract": "中文摘要"
                 }}"""
                 
-                completion = await openai.chat.completions.acreate(
-                    model="gpt-4o-mini",
+                completion = await self.async_client.chat.completions.create(
+                    model=TRANSLATION_MODEL,
                     messages=[{"role": "user", "content": prompt}],
                     temperature=0.3,
                     max_tokens=2000
@@ -234,6 +263,7 @@ class DatabaseManager:
                 
                 if translation['title'].strip() and translation['abstract'].strip():
                     print(f"翻译成功 (尝试 {attempt + 1}/{max_retries})")
+                    self.translation_cache.put(title, summary, translation['title'], translation['abstract'])
                     return translation['title'], translation['abstract']
                     
             except Exception as e:
@@ -244,6 +274,27 @@ class DatabaseManager:
         
         return None, None
 
+    def _build_untranslated_article(self, article_data):
+        """根据文章数据构建未翻译的 Article 对象"""
+        # 转换发布日期字符串为datetime对象
+        with span('strptime'):
+            published_date = datetime.strptime(article_data['published'], '%Y-%m-%d')
+        
+        return Article(
+            title=article_data['title'],
+            raw_title=article_data.get('raw_title'),
+            title_zh=None,  # 初始为空
+            volume=article_data.get('volume', ''),
+            pages=article_data.get('pages', ''),
+            authors=json.dumps(article_data.get('authors', [])),
+            published_date=published_date,
+            doi=article_data['doi'],
+            link=article_data['link'],
+            summary=article_data['summary'],
+            summary_zh=None,  # 初始为空
+            journal_id=article_data['journal_id']
+        )
+
     def add_article_without_translation(self, article_data):
         """添加文章（不包含翻译）"""
         session = self.Session()
@@ -255,25 +306,16 @@ class DatabaseManager:
                 session.close()
                 return None
             
-            # 转换发布日期字符串为datetime对象
-            published_date = datetime.strptime(article_data['published'], '%Y-%m-%d')
-            
             # 创建新文章
-            article = Article(
-                title=article_data['title'],
-                title_zh=None,  # 初始为空
-                volume=article_data.get('volume', ''),
-                pages=article_data.get('pages', ''),
-                authors=json.dumps(article_data.get('authors', [])),
-                published_date=published_date,
-                doi=article_data['doi'],
-                link=article_data['link'],
-                summary=article_data['summary'],
-                summary_zh=None,  # 初始为空
-                journal_id=article_data['journal_id']
-            )
+            article = self._build_untranslated_article(article_data)
             
             session.add(article)
+            session.flush()
+            duplicates.link_articles(session, [article])
+            search_index.index_articles(session, [article])
+            listings.add_articles(session, [article])
+            authors.link_articles(session, [article])
+            tagger.tag_articles(session, [article])
             session.commit()
             article_id = article.id
             session.close()
@@ -285,6 +327,77 @@ class DatabaseManager:
             session.close()
             return None
 
+    def _existing_dois(self, session, dois, chunk_size=500):
+        """查询已存在的DOI（分块避免 IN 列表过长）"""
+        existing = set()
+        for i in range(0, len(dois), chunk_size):
+            rows = session.query(Article.doi)\
+                .filter(Article.doi.in_(dois[i:i + chunk_size]))\
+                .all()
+            existing.update(doi for (doi,) in rows)
+        return existing
+
+    def existing_dois(self, dois, session=None):
+        """返回 dois 中已经入库的DOI集合"""
+        with session_scope(session) as scope:
+            return self._existing_dois(scope, list(dois))
+
+    def add_articles_batch(self, articles_data, session=None, chunk_size=500):
+        """批量添加文章（不包含翻译），返回新文章的ID列表
+
+        已存在的DOI用一次集合查询过滤，新文章在同一个事务中插入。
+        传入 session 时在调用方的事务中执行，出错时异常交给调用方处理。
+        """
+        # 批次内按DOI去重，保留第一次出现的条目
+        unique = {}
+        for article_data in articles_data:
+            unique.setdefault(article_data['doi'], article_data)
+        if not unique:
+            return []
+        
+        begin = time.perf_counter()
+        try:
+            with session_scope(session) as scope:
+                with span('dedup_query'):
+                    existing = self._existing_dois(scope, list(unique), chunk_size)
+                
+                articles = []
+                with span('build_rows'):
+                    for doi, article_data in unique.items():
+                        if doi in existing:
+                            continue
+                        try:
+                            articles.append(self._build_untranslated_article(article_data))
+                        except Exception as e:
+                            print(f"添加文章错误：{str(e)}")
+                
+                if not articles:
+                    return []
+                
+                scope.add_all(articles)
+                # flush 后即可拿到ID，避免 commit 后逐条刷新对象
+                with span('flush'):
+                    scope.flush()
+                with span('duplicates'):
+                    duplicates.link_articles(scope, articles)
+                with span('search_index'):
+                    search_index.index_articles(scope, articles)
+                with span('listings'):
+                    listings.add_articles(scope, articles)
+                with span('authors'):
+                    authors.link_articles(scope, articles)
+                with span('tags'):
+                    tagger.tag_articles(scope, articles)
+                return [article.id for article in articles]
+            
+        except Exception as e:
+            if session is not None:
+                raise
+            print(f"批量添加文章错误：{str(e)}")
+            return []
+        finally:
+            metrics.DB_INSERT_SECONDS.observe(time.perf_counter() - begin)
+
     def get_untranslated_articles(self, limit=10):
         """获取未翻译的文章"""
         session = self.Session()
@@ -299,6 +412,10 @@ class DatabaseManager:
 
     def translate_article(self, title: str, summary: str, max_retries: int = 3):
         """翻译文章内容"""
+        cached = self.translation_cache.get(title, summary)
+        if cached:
+            return cached
+            
         for attempt in range(max_retries):
             try:
                 prompt = f"""请将以下英文标题和摘要翻译成中文：
@@ -313,7 +430,7 @@ class DatabaseManager:
                 }}"""
                 
                 completion = openai.chat.completions.create(
-                    model="gpt-4o-mini",
+                    model=TRANSLATION_MODEL,
                     messages=[{"role": "user", "content": prompt}],
                     temperature=0.3,
                     max_tokens=2000
@@ -323,6 +440,7 @@ class DatabaseManager:
                 translation = json.loads(response)
                 
                 if translation['title'].strip() and translation['abstract'].strip():
+                    self.translation_cache.put(title, summary, translation['title'], translation['abstract'])
                     return translation['title'], translation['abstract']
                     
             except Exception as e:
@@ -333,33 +451,100 @@ class DatabaseManager:
                     
         return None, None
 
-    def update_article_translation(self, article_id: int, title_zh: str, summary_zh: str):
+    def update_article_translation(self, article_id: int, title_zh: str, summary_zh: str, session=None):
         """更新文章的翻译"""
-        session = self.Session()
         try:
-            article = session.query(Article).filter_by(id=article_id).first()
-            if article:
-                article.title_zh = title_zh
-                article.summary_zh = summary_zh
-                session.commit()
-                return True
-            return False
+            with session_scope(session) as scope:
+                updated = scope.query(Article)\
+                    .filter_by(id=article_id)\
+                    .update({'title_zh': title_zh, 'summary_zh': summary_zh}, synchronize_session=False)
+                # 翻译成功后清除翻译队列中的记录
+                scope.query(TranslationState)\
+                    .filter_by(article_id=article_id)\
+                    .delete(synchronize_session=False)
+                search_index.reindex_ids(scope, [article_id])
+                listings.update_translations(scope, {article_id: (title_zh, summary_zh)})
+                # 等待这篇文章翻译的近似重复文章使用相同的译文
+                for duplicate_id in duplicates.pending_translations(scope, {article_id: (title_zh, summary_zh)}):
+                    self.update_article_translation(duplicate_id, title_zh, summary_zh, session=scope)
+                return updated > 0
         except Exception as e:
-            session.rollback()
+            if session is not None:
+                raise
             print(f"更新翻译错误：{str(e)}")
             return False
-        finally:
-            session.close()
 
-    def get_or_create_journal(self, name, rss_url):
+    def save_translations(self, translations, session=None):
+        """在一个事务中保存多篇文章的翻译，translations 为 {article_id: (title_zh, summary_zh)}"""
+        with session_scope(session) as scope:
+            for article_id, (title_zh, summary_zh) in translations.items():
+                self.update_article_translation(article_id, title_zh, summary_zh, session=scope)
+
+    def get_or_create_journal(self, name, rss_url, session=None):
         """获取或创建期刊"""
-        session = self.Session()
-        try:
-            journal = session.query(Journal).filter_by(name=name).first()
+        with session_scope(session) as scope:
+            journal = scope.query(Journal).filter_by(name=name).first()
             if not journal:
                 journal = Journal(name=name, rss_url=rss_url)
-                session.add(journal)
-                session.commit()
+                scope.add(journal)
+                scope.flush()
             return journal.id
-        finally:
-            session.close()
+
+    def get_feed_states(self, journal_ids, session=None):
+        """批量获取RSS源抓取状态，返回 {journal_id: {...}}"""
+        with session_scope(session) as scope:
+            states = scope.query(FeedState)\
+                .filter(FeedState.journal_id.in_(list(journal_ids)))\
+                .all()
+            return {
+                state.journal_id: {
+                    'etag': state.etag,
+                    'last_modified': state.last_modified,
+                    'content_hash': state.content_hash,
+                    'poll_interval': state.poll_interval,
+                    'next_poll_at': state.next_poll_at,
+                    'consecutive_failures': state.consecutive_failures or 0,
+                    'last_new_at': state.last_new_at
+                }
+                for state in states
+            }
+
+    def save_feed_state(self, journal_id, status, etag=None, last_modified=None, content_hash=None, session=None):
+        """保存RSS源抓取状态，未提供的字段保留原值"""
+        try:
+            with session_scope(session) as scope:
+                state = scope.query(FeedState).filter_by(journal_id=journal_id).first()
+                if not state:
+                    state = FeedState(journal_id=journal_id)
+                    scope.add(state)
+                if etag is not None:
+                    state.etag = etag
+                if last_modified is not None:
+                    state.last_modified = last_modified
+                if content_hash is not None:
+                    state.content_hash = content_hash
+                state.last_status = status
+                state.last_fetched_at = datetime.now()
+        except Exception as e:
+            if session is not None:
+                raise
+            print(f"保存抓取状态错误：{str(e)}")
+
+    def save_feed_schedule(self, journal_id, poll_interval, next_poll_at, consecutive_failures,
+                           found_new=False, session=None):
+        """保存RSS源的轮询计划"""
+        try:
+            with session_scope(session) as scope:
+                state = scope.query(FeedState).filter_by(journal_id=journal_id).first()
+                if not state:
+                    state = FeedState(journal_id=journal_id)
+                    scope.add(state)
+                state.poll_interval = poll_interval
+                state.next_poll_at = next_poll_at
+                state.consecutive_failures = consecutive_failures
+                if found_new:
+                    state.last_new_at = datetime.now()
+        except Exception as e:
+            if session is not None:
+                raise
+            print(f"保存轮询计划错误：{str(e)}")
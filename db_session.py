@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from profiling import span
+
+# 数据库配置（环境变量优先）
+DATABASE_URL = os.environ.get('RSS2WEB_DATABASE_URL', "你的数据库链接")
+POOL_SIZE = int(os.environ.get('RSS2WEB_DB_POOL_SIZE', 5))
+MAX_OVERFLOW = int(os.environ.get('RSS2WEB_DB_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = int(os.environ.get('RSS2WEB_DB_POOL_TIMEOUT', 30))        # 等待连接的超时（秒）
+POOL_RECYCLE = int(os.environ.get('RSS2WEB_DB_POOL_RECYCLE', 1800))      # 连接最长复用时间（秒）
+POOL_PRE_PING = os.environ.get('RSS2WEB_DB_POOL_PRE_PING', '1') != '0'   # 取出连接前先检测是否可用
+
+_lock = threading.Lock()
+_engine = None
+_session_factory = None
+_engine_pid = None
+_schema_ready = False
+
+
+class PoolMetrics:
+    """连接池统计：取出/归还次数、新建连接数、失效次数和等待连接的耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_max': round(self.wait_seconds_max, 6),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """记录每次从连接池取连接等待时间的 QueuePool"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+def _install_pool_listeners(engine):
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.checkouts += 1
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        pool_metrics.checkins += 1
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics.connects += 1
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.invalidations += 1
+
+
+def _create_engine(url):
+    if url.startswith('sqlite'):
+        # SQLite 使用 SQLAlchemy 默认的连接池，不支持 pool_size 等参数
+        engine = create_engine(url)
+    else:
+        engine = create_engine(
+            url,
+            poolclass=TimedQueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=POOL_PRE_PING
+        )
+    _install_pool_listeners(engine)
+    return engine
+
+
+def get_engine():
+    """进程内共享的数据库引擎（fork 出的子进程会重新创建）"""
+    global _engine, _session_factory, _engine_pid
+    with _lock:
+        if _engine is None or _engine_pid != os.getpid():
+            if _engine is not None:
+                # 不关闭父进程的连接，只丢弃引用
+                _engine.dispose(close=False)
+            _engine = _create_engine(DATABASE_URL)
+            # 提交后对象仍可读取（session_scope 返回的查询结果在事务外使用）
+            _session_factory = sessionmaker(bind=_engine, expire_on_commit=False)
+            _engine_pid = os.getpid()
+        return _engine
+
+
+def set_database_url(url):
+    """切换到另一个数据库（基准测试等使用独立的库），已有的引擎会被关闭"""
+    global DATABASE_URL, _engine, _session_factory, _engine_pid, _schema_ready
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+        DATABASE_URL = url
+        _engine = _session_factory = _engine_pid = None
+        _schema_ready = False
+
+
+def get_session_factory():
+    """进程内共享的 sessionmaker"""
+    get_engine()
+    return _session_factory
+
+
+@contextmanager
+def session_scope(session=None):
+    """事务范围：正常结束时提交，出错时回滚
+
+    传入已有的 session 时直接复用，由外层的事务范围负责提交，
+    这样多个批量操作可以共享同一个事务。
+    """
+    if session is not None:
+        yield session
+        return
+
+    session = get_session_factory()()
+    try:
+        yield session
+        with span('commit'):
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def ensure_schema():
+    """创建缺失的表并执行未完成的迁移（每个进程只执行一次）"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    from db_models import Base
+    from migrations import upgrade
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    upgrade(engine)
+    _schema_ready = True
+
+
+def pool_status():
+    """连接池当前状态和累计统计"""
+    engine = get_engine()
+    status = pool_metrics.as_dict()
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+    return status
+
+
+def log_pool_status():
+    logging.info(f"DB pool: {pool_status()}")
+
+
+def insert_ignore(dialect_name, model):
+    """INSERT ... ON CONFLICT DO NOTHING（PostgreSQL / SQLite）"""
+    if dialect_name == 'postgresql':
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect_name == 'sqlite':
+        return sqlite.insert(model).on_conflict_do_nothing()
+    raise NotImplementedError(f"不支持的数据库: {dialect_name}")
+
+
+def insert_or_add(dialect_name, model, key, column):
+    """INSERT ... ON CONFLICT (key) DO UPDATE SET column = column + excluded.column（PostgreSQL / SQLite）"""
+    if dialect_name == 'postgresql':
+        statement = postgresql.insert(model)
+    elif dialect_name == 'sqlite':
+        statement = sqlite.insert(model)
+    else:
+        raise NotImplementedError(f"不支持的数据库: {dialect_name}")
+    target = getattr(model, column)
+    return statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: target + getattr(statement.excluded, column)}
+    )
@@ -0,0 +1,345 @@
+"""近似重复文章检测（MinHash + LSH）
+
+同一篇文章可能以不同的 DOI 或条目ID出现多次（更正版本、多个期刊的源）。入库时用标题和摘要的
+词三元组计算 MinHash 签名，签名按 BANDS 段哈希写入 article_lsh_bands，候选文章只需按
+(band, bucket) 索引查找，再用签名估计的 Jaccard 相似度确认。相似度不低于 THRESHOLD 的新文章
+记录 duplicate_of 指向规范文章：规范文章已翻译时直接复用译文，否则不进入翻译队列，
+规范文章保存翻译时一起写入。
+
+有 NumPy 时一批文章的签名一次计算，否则使用纯 Python 的实现（结果相同）。
+
+    python duplicates.py --rebuild           # 为已有的文章计算签名（不重新关联已有的文章）
+    python duplicates.py --article-id 123    # 输出与该文章近似重复的文章
+"""
+import argparse
+import hashlib
+import logging
+import random
+import struct
+import time
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+
+from sqlalchemy import delete, select, union_all
+
+import metrics
+import search_index
+from db_models import Article, ArticleLshBand, ArticleSignature
+from db_session import get_engine, session_scope
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖
+    np = None
+
+# 签名长度（哈希函数个数）和 LSH 分段：16 段 x 4 行，相似度 0.8 的文章成为候选的概率约 99.9%
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# 估计的 Jaccard 相似度不低于该值时视为重复
+THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+# 词三元组太少的文章（只有标题、没有摘要）不做判断，避免短标题误判
+MIN_SHINGLES = 8
+SEED = 20240601
+REBUILD_BATCH_SIZE = 2000
+LOOKUP_BATCH_SIZE = 500
+# 每条候选查询最多的 bucket 数（每个占一个绑定参数），低于 SQLite（32766）和 PostgreSQL（65535）的参数上限
+CANDIDATE_BATCH_SIZE = 8000
+# 每次向量化计算的最大词三元组数（控制 NumPy 临时数组的大小）
+CHUNK_SHINGLES = 50_000
+
+_MASK = (1 << 32) - 1
+_rng = random.Random(SEED)
+# 哈希函数为 (a * x + b) mod 2^32（a 为奇数时是 2^32 上的置换），NumPy 的 uint32 乘法自然回绕，
+# 纯 Python 的实现用 & _MASK 得到相同的结果
+_A = [_rng.randrange(1, 1 << 32) | 1 for _ in range(NUM_PERM)]
+_B = [_rng.randrange(0, 1 << 32) for _ in range(NUM_PERM)]
+# 三个相邻词的哈希合成词三元组的哈希
+_K0, _K1 = 0x9E3779B1, 0x85EBCA77
+_STRUCT = struct.Struct(f'<{NUM_PERM}I')
+
+
+@lru_cache(maxsize=1 << 18)
+def _word_hash(word):
+    """词的 CRC32（进程之间结果一致）"""
+    return zlib.crc32(word.encode('utf-8'))
+
+
+def _words(title, summary):
+    return search_index.tokenize(f"{title or ''} {summary or ''}")
+
+
+def shingles(title, summary):
+    """标题和摘要的词三元组哈希"""
+    hashes = [_word_hash(word) for word in _words(title, summary)]
+    return {
+        ((hashes[i] * _K0) ^ (hashes[i + 1] * _K1) ^ hashes[i + 2]) & _MASK
+        for i in range(len(hashes) - SHINGLE_SIZE + 1)
+    }
+
+
+def _minhash_python(hashes):
+    return _STRUCT.pack(*(
+        min(((a * x + b) & _MASK) for x in hashes)
+        for a, b in zip(_A, _B)
+    ))
+
+
+def _signatures_python(texts):
+    result = []
+    for title, summary in texts:
+        hashes = shingles(title, summary)
+        result.append(_minhash_python(hashes) if len(hashes) >= MIN_SHINGLES else None)
+    return result
+
+
+def _signatures_numpy(texts):
+    """一批文章一起计算：所有词的哈希拼成一个数组，词三元组和最小哈希都按数组计算"""
+    word_lists = [_words(title, summary) for title, summary in texts]
+    lengths = np.fromiter((len(words) for words in word_lists), dtype=np.int64, count=len(word_lists))
+    hashes = np.fromiter(map(_word_hash, chain.from_iterable(word_lists)), dtype=np.uint64,
+                         count=int(lengths.sum()))
+    # 以每个位置开头的词三元组（跨文章的三元组不会被取到）
+    grams = (((hashes[:-2] * np.uint64(_K0)) ^ (hashes[1:-1] * np.uint64(_K1)) ^ hashes[2:])
+             & np.uint64(_MASK)).astype(np.uint32) if len(hashes) >= SHINGLE_SIZE else np.zeros(0, np.uint32)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    counts = np.maximum(lengths - SHINGLE_SIZE + 1, 0)
+
+    result = [None] * len(texts)
+    usable = [
+        i for i in range(len(texts))
+        if counts[i] >= MIN_SHINGLES and len(np.unique(grams[starts[i]:starts[i] + counts[i]])) >= MIN_SHINGLES
+    ]
+    a = np.array(_A, dtype=np.uint32)
+    b = np.array(_B, dtype=np.uint32)
+    begin = 0
+    while begin < len(usable):
+        # 每次最多计算 CHUNK_SHINGLES 个词三元组（控制临时数组的大小）
+        end = begin
+        size = 0
+        while end < len(usable) and (size == 0 or size + counts[usable[end]] <= CHUNK_SHINGLES):
+            size += counts[usable[end]]
+            end += 1
+        chunk = usable[begin:end]
+        x = np.concatenate([grams[starts[i]:starts[i] + counts[i]] for i in chunk])
+        # (NUM_PERM, 词三元组数)，按行连续存放，每篇文章的最小值沿行方向取
+        values = a[:, None] * x + b[:, None]
+        offsets = np.concatenate(([0], np.cumsum(counts[chunk])[:-1]))
+        minimums = np.minimum.reduceat(values, offsets, axis=1).T.astype('<u4')
+        for i, row in zip(chunk, minimums):
+            result[i] = row.tobytes()
+        begin = end
+    return result
+
+
+def signatures(texts):
+    """[(title, summary), ...] -> [签名 bytes 或 None（太短）, ...]"""
+    if np is not None:
+        return _signatures_numpy(texts)
+    return _signatures_python(texts)
+
+
+def bands(signature):
+    """签名 -> [(band, bucket)]，bucket 为该段的 64 位有符号哈希"""
+    width = ROWS * 4
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(signature[band * width:(band + 1) * width], digest_size=8).digest(),
+            'little', signed=True))
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    """签名估计的 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(_STRUCT.unpack(first), _STRUCT.unpack(second))) / NUM_PERM
+
+
+def _candidates(session, keys):
+    """{(band, bucket)} -> {(band, bucket): {已入库的候选文章ID}}
+
+    一批文章的所有分段用一条查询：每段一个 band = :band AND bucket IN (...) 的子查询，UNION ALL 合并，
+    每个子查询都走 (band, bucket) 主键索引（按二元组 IN 查询时 SQLite 会扫描全表）。
+    """
+    keys = sorted(keys)
+    found = defaultdict(set)
+    for i in range(0, len(keys), CANDIDATE_BATCH_SIZE):
+        per_band = defaultdict(list)
+        for band, bucket in keys[i:i + CANDIDATE_BATCH_SIZE]:
+            per_band[band].append(bucket)
+        statement = union_all(*(
+            select(ArticleLshBand.band, ArticleLshBand.bucket, ArticleLshBand.article_id)
+            .where(ArticleLshBand.band == band, ArticleLshBand.bucket.in_(buckets))
+            for band, buckets in per_band.items()
+        ))
+        for band, bucket, article_id in session.execute(statement):
+            found[(band, bucket)].add(article_id)
+    return found
+
+
+def _load(session, article_ids):
+    """{文章ID: 签名, 规范文章ID, 译文} 的行"""
+    article_ids = list(article_ids)
+    rows = {}
+    for i in range(0, len(article_ids), LOOKUP_BATCH_SIZE):
+        for row in session.execute(
+            select(ArticleSignature.article_id, ArticleSignature.signature,
+                   Article.duplicate_of, Article.title_zh, Article.summary_zh)
+            .join(Article, Article.id == ArticleSignature.article_id)
+            .where(ArticleSignature.article_id.in_(article_ids[i:i + LOOKUP_BATCH_SIZE]))
+        ):
+            rows[row.article_id] = row
+    return rows
+
+
+def _write(session, signed):
+    """写入 [(article_id, 签名, bands)]（Core 的 executemany，不经过 ORM 的批量插入）"""
+    if not signed:
+        return
+    session.execute(ArticleSignature.__table__.insert(), [
+        {'article_id': article_id, 'signature': signature} for article_id, signature, _ in signed
+    ])
+    session.execute(ArticleLshBand.__table__.insert(), [
+        {'band': band, 'bucket': bucket, 'article_id': article_id}
+        for article_id, _, keys in signed for band, bucket in keys
+    ])
+
+
+def link_articles(session, articles):
+    """给刚插入的 Article 对象（已 flush，有ID）计算签名并关联近似重复的文章，返回重复的篇数
+
+    需要在写入全文检索和列表快照之前调用，复用的译文才会一起写入。
+    """
+    computed = signatures([(article.title, article.summary) for article in articles])
+    signed = [
+        (article, signature, bands(signature))
+        for article, signature in zip(articles, computed) if signature is not None
+    ]
+    if not signed:
+        return 0
+    buckets = _candidates(session, {key for _, _, keys in signed for key in keys})
+    stored = _load(session, set().union(*buckets.values()))
+
+    # 同一批中的文章也互相比较（按ID顺序，先入库的作为规范文章）
+    batch_buckets = defaultdict(list)
+    duplicates = 0
+    for article, signature, keys in signed:
+        best = None
+        candidates = {candidate_id for key in keys for candidate_id in buckets.get(key, ())}
+        for candidate_id in sorted(candidates):
+            candidate = stored.get(candidate_id)
+            if candidate is None:
+                continue
+            score = similarity(signature, candidate.signature)
+            if score >= THRESHOLD and (best is None or score > best[0]):
+                best = (score, candidate.duplicate_of or candidate_id, candidate.title_zh, candidate.summary_zh)
+        others = {id(other): (other, other_signature)
+                  for key in keys for other, other_signature in batch_buckets[key]}
+        for other, other_signature in others.values():
+            score = similarity(signature, other_signature)
+            if score >= THRESHOLD and (best is None or score > best[0]):
+                best = (score, other.duplicate_of or other.id, other.title_zh, other.summary_zh)
+        for key in keys:
+            batch_buckets[key].append((article, signature))
+        if best is not None:
+            _, canonical_id, title_zh, summary_zh = best
+            article.duplicate_of = canonical_id
+            if article.title_zh is None and title_zh and summary_zh:
+                article.title_zh, article.summary_zh = title_zh, summary_zh
+            duplicates += 1
+            logging.info(f"文章 ID {article.id} 与 ID {canonical_id} 近似重复（相似度 {best[0]:.2f}）")
+
+    _write(session, [(article.id, signature, keys) for article, signature, keys in signed])
+    metrics.NEAR_DUPLICATES.inc(duplicates)
+    return duplicates
+
+
+def pending_translations(session, translations):
+    """规范文章保存翻译时，等待它的未翻译重复文章 {article_id: (title_zh, summary_zh)}"""
+    canonical_ids = list(translations)
+    if not canonical_ids:
+        return {}
+    rows = session.execute(
+        select(Article.id, Article.duplicate_of)
+        .where(Article.duplicate_of.in_(canonical_ids))
+        .where(Article.title_zh.is_(None))
+    ).all()
+    return {article_id: translations[canonical_id] for article_id, canonical_id in rows}
+
+
+def populate(conn, batch_size=REBUILD_BATCH_SIZE):
+    """清空并按ID分批重新计算所有文章的签名（迁移和 --rebuild 使用），返回读取的文章数
+
+    在调用方的事务中执行，不重新关联已有的文章。
+    """
+    conn.execute(delete(ArticleLshBand))
+    conn.execute(delete(ArticleSignature))
+    last_id = 0
+    total = 0
+    begin = time.monotonic()
+    while True:
+        rows = conn.execute(
+            select(Article.id, Article.title, Article.summary)
+            .where(Article.id > last_id)
+            .order_by(Article.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        computed = signatures([(row.title, row.summary) for row in rows])
+        _write(conn, [
+            (row.id, signature, bands(signature))
+            for row, signature in zip(rows, computed) if signature is not None
+        ])
+        last_id = rows[-1].id
+        total += len(rows)
+        logging.info(f"Signed {total} articles ({total / (time.monotonic() - begin):.0f}/s)")
+    return total
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """清空并重新计算所有文章的签名"""
+    with get_engine().begin() as conn:
+        return populate(conn, batch_size)
+
+
+def similar_to(article_id, session=None):
+    """与该文章近似重复的已入库文章 [(article_id, 相似度)]，按相似度倒序"""
+    with session_scope(session) as scope:
+        signature = scope.get(ArticleSignature, article_id)
+        if signature is None:
+            return []
+        buckets = _candidates(scope, bands(signature.signature))
+        stored = _load(scope, set().union(*buckets.values()) - {article_id})
+        matches = [
+            (candidate_id, similarity(signature.signature, row.signature))
+            for candidate_id, row in stored.items()
+        ]
+    return sorted((match for match in matches if match[1] >= THRESHOLD), key=lambda match: -match[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="近似重复文章检测")
+    parser.add_argument('--rebuild', action='store_true', help="为所有文章重新计算签名")
+    parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help="重建时每批的文章数")
+    parser.add_argument('--article-id', type=int, help="输出与该文章近似重复的文章")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.rebuild:
+        begin = time.monotonic()
+        total = rebuild(args.batch_size)
+        logging.info(f"Rebuilt MinHash signatures: {total} articles in {time.monotonic() - begin:.1f}s")
+    if args.article_id:
+        for article_id, score in similar_to(args.article_id):
+            print(f"{article_id:>8}  {score:.2f}")
+
+
+if __name__ == "__main__":
+    main()
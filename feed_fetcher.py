@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+# 并发抓取配置
+MAX_CONCURRENCY = 20       # 全局最大并发请求数
+MAX_PER_HOST = 4           # 单个主机最大并发请求数（大部分源都在 mdpi.com）
+REQUEST_TIMEOUT = 30       # 单个请求总超时（秒）
+CONNECT_TIMEOUT = 10       # 建立连接超时（秒）
+USER_AGENT = "rss2web/1.0 (+https://github.com/ruiduobao/rss2web)"
+
+# 下载过程中的网络错误
+FETCH_ERRORS = (asyncio.TimeoutError, aiohttp.ClientError)
+
+
+@dataclass
+class FetchResult:
+    """单个RSS源的抓取结果"""
+    url: str
+    status: Optional[int] = None
+    content: Optional[bytes] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # 边下载边处理时（consume）不保存内容，只保存处理结果
+    streamed: bool = False
+    consumed: Any = None
+    size: Optional[int] = None
+
+    @property
+    def ok(self):
+        return self.status == 200 and (self.content is not None or self.streamed)
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+    @property
+    def content_hash(self):
+        if self.content is None:
+            return None
+        return hashlib.sha256(self.content).hexdigest()
+
+
+class AsyncFeedFetcher:
+    """基于 asyncio 的RSS并发抓取器，共享连接池并限制全局/单主机并发"""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST,
+                 timeout=REQUEST_TIMEOUT, connect_timeout=CONNECT_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self._session = None
+        self._global_limit = None
+        self._host_limits = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.max_per_host,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={"User-Agent": USER_AGENT}
+        )
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits = {}
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
+    def _host_limit(self, url):
+        host = urlparse(url).hostname or ''
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, url, etag=None, last_modified=None,
+                    consume: Optional[Callable[[FetchResult, aiohttp.StreamReader], Awaitable]] = None) -> FetchResult:
+        """抓取单个RSS源，异常和超时都记录在结果中而不是抛出
+
+        传入上次的 etag / last_modified 时发送条件请求，未变化的源返回 304。
+        指定 consume 时不读取整个响应，而是把响应流交给 consume(result, stream) 边下载边处理，
+        返回值保存在 result.consumed 中；consume 提前返回时剩余内容不再下载。
+        """
+        result = FetchResult(url=url)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        # 先在信号量上排队再发请求，排队时间不计入请求超时
+        async with self._global_limit, self._host_limit(url):
+            start = time.monotonic()
+            try:
+                async with self._session.get(url, headers=headers) as response:
+                    result.status = response.status
+                    result.etag = response.headers.get('ETag')
+                    result.last_modified = response.headers.get('Last-Modified')
+                    if response.status == 200 and consume is not None:
+                        result.consumed = await consume(result, response.content)
+                        result.streamed = True
+                    elif response.status == 200:
+                        result.content = await response.read()
+            except asyncio.TimeoutError:
+                result.error = "timeout"
+            except aiohttp.ClientError as e:
+                result.error = f"{type(e).__name__}: {str(e)}"
+            finally:
+                result.elapsed = time.monotonic() - start
+        return result
+
+    def fetch_all(self, urls: List[str], validators: Optional[Dict[str, dict]] = None, consume=None):
+        """并发抓取所有URL，按完成顺序返回结果的迭代器（协程）
+
+        validators: {url: {'etag': ..., 'last_modified': ...}}，用于条件请求
+        consume: 同 fetch，边下载边处理
+        """
+        validators = validators or {}
+        tasks = []
+        for url in urls:
+            cached = validators.get(url) or {}
+            tasks.append(asyncio.ensure_future(self.fetch(
+                url,
+                etag=cached.get('etag'),
+                last_modified=cached.get('last_modified'),
+                consume=consume
+            )))
+        return asyncio.as_completed(tasks)
@@ -0,0 +1,381 @@
+"""发布翻译后的文章订阅源（Atom、RSS 2.0、JSON Feed）
+
+每个订阅源包含最新的 FEED_SIZE 篇文章：all 是全部期刊，journal-<期刊ID> 是单个期刊。
+生成的文档缓存在 published_feeds 表中，文章入库或保存翻译时（listings 的增量更新里）
+只让包含该文章的订阅源失效，下次请求时重新生成。ETag 是内容的 SHA-256，内容不变时 ETag 不变。
+
+    python feed_publisher.py --output site/feeds          # 写出所有订阅源（只写有变化的文件）
+    python feed_publisher.py --serve --port 8090          # GET /feeds/all.atom，支持 If-None-Match
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from sqlalchemy import or_, select, tuple_, update
+
+from db_models import Article, ArticleListing, ListingCount, PublishedFeed
+from db_session import insert_ignore, session_scope
+
+# 每个订阅源的文章数
+FEED_SIZE = 50
+# 站点地址（订阅源和文章的链接）
+SITE_URL = os.environ.get('RSS2WEB_SITE_URL', 'http://localhost:3000').rstrip('/')
+SITE_TITLE = 'Academic Articles'
+ALL_FEED = 'all'
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+EXTENSIONS = {'atom': 'atom', 'rss': 'xml', 'json': 'json'}
+# 从数据库读取条目时每次取的行数
+FETCH_SIZE = 100
+
+
+def journal_feed(journal_id):
+    return f"journal-{journal_id}"
+
+
+def parse_feed(feed):
+    """订阅源名称 -> 期刊ID（all 返回 None），名称不对时抛出 ValueError"""
+    if feed == ALL_FEED:
+        return None
+    prefix, _, journal_id = feed.partition('-')
+    if prefix != 'journal' or not journal_id.isdigit():
+        raise ValueError(f"未知的订阅源: {feed!r}")
+    return int(journal_id)
+
+
+def invalidate(session, entries):
+    """文章变化后让包含它的订阅源失效，entries 为 [(journal_id, published_date, article_id)]
+
+    每个订阅源只按变化文章中最新的一篇判断：比缓存中最早的条目更新（或缓存未满）才需要重新生成。
+    """
+    newest = {}
+    for journal_id, published_date, article_id in entries:
+        key = (published_date, article_id)
+        for feed in (ALL_FEED, journal_feed(journal_id)) if journal_id is not None else (ALL_FEED,):
+            if feed not in newest or key > newest[feed]:
+                newest[feed] = key
+    for feed, (published_date, article_id) in newest.items():
+        session.execute(
+            update(PublishedFeed)
+            .where(PublishedFeed.feed == feed)
+            .where(or_(
+                PublishedFeed.entry_count.is_(None),
+                PublishedFeed.entry_count < FEED_SIZE,
+                tuple_(PublishedFeed.oldest_published, PublishedFeed.oldest_article_id)
+                <= tuple_(published_date, article_id),
+            ))
+            .values(version=PublishedFeed.version + 1)
+        )
+
+
+def invalidate_all(conn):
+    conn.execute(update(PublishedFeed).values(version=PublishedFeed.version + 1))
+
+
+def invalidate_articles(session, article_ids):
+    """按文章ID让订阅源失效（保存翻译后调用）"""
+    article_ids = list(article_ids)
+    if not article_ids:
+        return
+    rows = session.execute(
+        select(ArticleListing.journal_id, ArticleListing.published_date, ArticleListing.article_id)
+        .where(ArticleListing.article_id.in_(article_ids))
+    ).all()
+    invalidate(session, rows)
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc)
+
+
+def _rfc3339(value):
+    return _utc(value).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _authors(raw):
+    """articles.authors（feedparser 的作者列表 JSON）-> 作者名列表"""
+    try:
+        authors = json.loads(raw) if raw else []
+    except ValueError:
+        return []
+    names = []
+    for author in authors if isinstance(authors, list) else []:
+        name = author.get('name') if isinstance(author, dict) else author
+        if name:
+            names.append(str(name))
+    return names
+
+
+def _entry_url(row):
+    return f"{SITE_URL}/articles/{row.article_id}"
+
+
+def _entry_id(row):
+    return f"https://doi.org/{row.doi}" if row.doi else _entry_url(row)
+
+
+def _content(row):
+    """正文：中文摘要在前，英文原文在后（原文摘要本身是 HTML）"""
+    if row.summary_zh:
+        return f"<p>{escape(row.summary_zh)}</p><hr/>{row.summary or ''}"
+    return row.summary or ''
+
+
+def _iter_entries(session, journal_id):
+    """按发布时间倒序逐批读取订阅源的条目"""
+    statement = (
+        select(
+            ArticleListing.article_id, ArticleListing.journal_name, ArticleListing.published_date,
+            ArticleListing.updated_at, ArticleListing.title, ArticleListing.title_zh,
+            ArticleListing.summary, ArticleListing.summary_zh,
+            Article.doi, Article.link, Article.authors,
+        )
+        .join(Article, Article.id == ArticleListing.article_id)
+        .order_by(ArticleListing.published_date.desc(), ArticleListing.article_id.desc())
+        .limit(FEED_SIZE)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    if journal_id is not None:
+        statement = statement.where(ArticleListing.journal_id == journal_id)
+    yield from session.execute(statement)
+
+
+def _feed_title(session, journal_id):
+    if journal_id is None:
+        return SITE_TITLE
+    name = session.execute(
+        select(ArticleListing.journal_name).where(ArticleListing.journal_id == journal_id).limit(1)
+    ).scalar()
+    return f"{name or journal_id} - {SITE_TITLE}"
+
+
+def render_atom(title, feed_url, page_url, rows):
+    """逐条生成 Atom 文档的片段；feed 的 updated 取条目中最新的 updated_at，相同的内容输出相同"""
+    entries = []
+    updated = None
+    for row in rows:
+        updated = max(updated, row.updated_at) if updated else row.updated_at
+        authors = ''.join(f"<author><name>{escape(name)}</name></author>" for name in _authors(row.authors))
+        entries.append(
+            f"<entry><id>{escape(_entry_id(row))}</id>"
+            f"<title>{escape(row.title_zh or row.title)}</title>"
+            f"<link rel=\"alternate\" href={quoteattr(_entry_url(row))}/>"
+            + (f"<link rel=\"related\" href={quoteattr(row.link)}/>" if row.link else '')
+            + f"<published>{_rfc3339(row.published_date)}</published>"
+            f"<updated>{_rfc3339(row.updated_at or row.published_date)}</updated>"
+            f"{authors}"
+            f"<summary>{escape(row.title)}</summary>"
+            f"<content type=\"html\">{escape(_content(row))}</content></entry>\n"
+        )
+    yield '<?xml version="1.0" encoding="utf-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n'
+    yield (
+        f"<id>{escape(feed_url)}</id><title>{escape(title)}</title>"
+        f"<link rel=\"self\" href={quoteattr(feed_url)}/><link rel=\"alternate\" href={quoteattr(page_url)}/>"
+        f"<updated>{_rfc3339(updated or datetime(1970, 1, 1))}</updated>\n"
+    )
+    yield from entries
+    yield '</feed>\n'
+
+
+def render_rss(title, feed_url, page_url, rows):
+    items = []
+    updated = None
+    for row in rows:
+        updated = max(updated, row.updated_at) if updated else row.updated_at
+        authors = ''.join(f"<dc:creator>{escape(name)}</dc:creator>" for name in _authors(row.authors))
+        items.append(
+            f"<item><title>{escape(row.title_zh or row.title)}</title>"
+            f"<link>{escape(_entry_url(row))}</link>"
+            f"<guid isPermaLink=\"false\">{escape(_entry_id(row))}</guid>"
+            f"<pubDate>{format_datetime(_utc(row.published_date))}</pubDate>"
+            f"{authors}"
+            f"<description>{escape(_content(row))}</description></item>\n"
+        )
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+    yield (
+        f"<channel><title>{escape(title)}</title><link>{escape(page_url)}</link>"
+        f"<description>{escape(title)}</description>"
+        f"<atom:link rel=\"self\" type=\"application/rss+xml\" href={quoteattr(feed_url)}/>"
+        f"<lastBuildDate>{format_datetime(_utc(updated or datetime(1970, 1, 1)))}</lastBuildDate>\n"
+    )
+    yield from items
+    yield '</channel></rss>\n'
+
+
+def render_json(title, feed_url, page_url, rows):
+    items = []
+    for row in rows:
+        item = {
+            'id': _entry_id(row),
+            'url': _entry_url(row),
+            'title': row.title_zh or row.title,
+            'content_html': _content(row),
+            'summary': row.title,
+            'date_published': _rfc3339(row.published_date),
+            'date_modified': _rfc3339(row.updated_at or row.published_date),
+            'authors': [{'name': name} for name in _authors(row.authors)],
+            'language': 'zh' if row.title_zh else 'en',
+        }
+        if row.link:
+            item['external_url'] = row.link
+        items.append(item)
+    yield json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': title,
+        'home_page_url': page_url,
+        'feed_url': feed_url,
+        'items': items,
+    }, ensure_ascii=False, indent=1)
+    yield '\n'
+
+
+RENDERERS = {'atom': render_atom, 'rss': render_rss, 'json': render_json}
+
+
+def feed_url(feed, fmt):
+    return f"{SITE_URL}/feeds/{feed}.{EXTENSIONS[fmt]}"
+
+
+def generate(session, feed, fmt):
+    """生成订阅源，返回 (文档, 条目数, 最早的条目)"""
+    journal_id = parse_feed(feed)
+    title = _feed_title(session, journal_id)
+    page_url = SITE_URL if journal_id is None else f"{SITE_URL}/journals/{journal_id}/"
+    rows = []
+
+    def tracked():
+        for row in _iter_entries(session, journal_id):
+            rows.append((row.published_date, row.article_id))
+            yield row
+
+    body = ''.join(RENDERERS[fmt](title, feed_url(feed, fmt), page_url, tracked()))
+    return body, len(rows), (rows[-1] if rows else (None, None))
+
+
+def get(feed, fmt, session=None):
+    """缓存的订阅源 (文档, ETag)，缓存不存在或已失效时重新生成"""
+    if fmt not in RENDERERS:
+        raise ValueError(f"未知的格式: {fmt!r}")
+    parse_feed(feed)
+    with session_scope(session) as scope:
+        cached = scope.execute(
+            select(PublishedFeed.body, PublishedFeed.etag, PublishedFeed.version, PublishedFeed.built_version)
+            .where(PublishedFeed.feed == feed, PublishedFeed.format == fmt)
+        ).first()
+        if cached is not None and cached.version == cached.built_version:
+            return cached.body, cached.etag
+        if cached is None:
+            scope.execute(insert_ignore(scope.get_bind().dialect.name, PublishedFeed),
+                          [{'feed': feed, 'format': fmt, 'version': 1, 'built_version': 0}])
+            version = 1
+        else:
+            version = cached.version
+
+        body, entry_count, (oldest_published, oldest_article_id) = generate(scope, feed, fmt)
+        etag = f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"'
+        # 生成期间又有文章变化时 version 已经增加，built_version 仍然落后，下次会再生成
+        scope.execute(
+            update(PublishedFeed)
+            .where(PublishedFeed.feed == feed, PublishedFeed.format == fmt)
+            .values(
+                body=body, etag=etag, built_version=version, entry_count=entry_count,
+                oldest_published=oldest_published, oldest_article_id=oldest_article_id,
+                generated_at=datetime.utcnow(),
+            )
+        )
+        return body, etag
+
+
+def all_feeds(session=None):
+    """全部订阅源的名称：all 和每个有文章的期刊"""
+    with session_scope(session) as scope:
+        journal_ids = scope.execute(
+            select(ListingCount.journal_id).where(ListingCount.journal_id != 0, ListingCount.total > 0)
+            .order_by(ListingCount.journal_id)
+        ).scalars().all()
+    return [ALL_FEED] + [journal_feed(journal_id) for journal_id in journal_ids]
+
+
+def write_feeds(output):
+    """把所有订阅源写到目录（<名称>.atom / .xml / .json），只写 ETag 变化的文件，返回写入的文件数"""
+    from static_export import write_atomic
+
+    etags_path = os.path.join(output, 'etags.json')
+    try:
+        with open(etags_path, encoding='utf-8') as f:
+            written_etags = json.load(f)
+    except (OSError, ValueError):
+        written_etags = {}
+    written = 0
+    for feed in all_feeds():
+        for fmt in RENDERERS:
+            filename = f"{feed}.{EXTENSIONS[fmt]}"
+            body, etag = get(feed, fmt)
+            if written_etags.get(filename) != etag or not os.path.exists(os.path.join(output, filename)):
+                write_atomic(os.path.join(output, filename), body)
+                written_etags[filename] = etag
+                written += 1
+    write_atomic(etags_path, json.dumps(written_etags, indent=1, sort_keys=True))
+    return written
+
+
+def create_app():
+    """aiohttp 应用：GET /feeds/<名称>.<atom|xml|json>，If-None-Match 匹配时返回 304"""
+    import asyncio
+    from aiohttp import web
+
+    formats = {extension: fmt for fmt, extension in EXTENSIONS.items()}
+
+    async def handle(request):
+        feed, _, extension = request.match_info['name'].rpartition('.')
+        fmt = formats.get(extension)
+        if fmt is None:
+            raise web.HTTPNotFound()
+        try:
+            # 数据库查询在线程池中执行，不阻塞事件循环
+            body, etag = await asyncio.get_running_loop().run_in_executor(None, get, feed, fmt)
+        except ValueError:
+            raise web.HTTPNotFound()
+        headers = {'ETag': etag, 'Cache-Control': 'public, max-age=300'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body.encode('utf-8'), headers={**headers, 'Content-Type': CONTENT_TYPES[fmt]})
+
+    app = web.Application()
+    app.router.add_get('/feeds/{name}', handle)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="发布翻译后的订阅源（Atom / RSS 2.0 / JSON Feed）")
+    parser.add_argument('--output', help="把所有订阅源写到该目录")
+    parser.add_argument('--serve', action='store_true', help="启动 HTTP 服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.output:
+        written = write_feeds(args.output)
+        logging.info(f"Wrote {written} changed feed files to {args.output}")
+    if args.serve:
+        from aiohttp import web
+        logging.info(f"Serving feeds on http://{args.host}:{args.port}/feeds/{ALL_FEED}.atom")
+        web.run_app(create_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import hashlib
+import xml.etree.ElementTree as ET
+from typing import Callable, Iterable, Iterator
+
+from feedparser import FeedParserDict
+
+# 逐块读取的大小
+CHUNK_SIZE = 64 * 1024
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+RDF_NS = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+ENTRY_TAGS = {'item', 'entry'}
+
+
+def _split_tag(tag):
+    """'{namespace}local' -> (namespace, local)"""
+    if tag.startswith('{'):
+        namespace, local = tag[1:].split('}', 1)
+        return namespace, local
+    return '', tag
+
+
+def _text(element):
+    return ''.join(element.itertext()).strip()
+
+
+def _entry_from_element(element):
+    """把 RSS 1.0 / RSS 2.0 的 item 或 Atom 的 entry 转成与 feedparser 相同字段的字典"""
+    entry = FeedParserDict()
+    authors = []
+    about = element.get(f'{{{RDF_NS}}}about')
+    if about:
+        entry['id'] = about
+
+    for child in element:
+        namespace, name = _split_tag(child.tag)
+        if name == 'title':
+            # MDPI 的条目同时有 <title> 和 <dc:title>，与 feedparser 一样保留第一个
+            entry.setdefault('title', _text(child))
+        elif name == 'link':
+            href = child.get('href')
+            if href is None:
+                entry['link'] = _text(child)
+            elif child.get('rel', 'alternate') == 'alternate':
+                entry['link'] = href
+        elif name in ('description', 'summary') or (name == 'content' and namespace == ATOM_NS):
+            entry.setdefault('summary', _text(child))
+        elif name in ('pubDate', 'published', 'issued'):
+            entry['published'] = _text(child)
+        elif name in ('date', 'updated'):
+            entry['updated'] = _text(child)
+        elif name in ('guid', 'id'):
+            entry['id'] = _text(child)
+        elif name == 'doi':
+            entry['prism_doi'] = _text(child)
+        elif name == 'creator':
+            authors.append(FeedParserDict(name=_text(child)))
+        elif name == 'author':
+            author_name = child.find(f'{{{ATOM_NS}}}name')
+            authors.append(FeedParserDict(name=_text(author_name if author_name is not None else child)))
+
+    if authors:
+        entry['authors'] = authors
+    return entry
+
+
+def iter_chunks(content: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """把已下载的内容切成块"""
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
+
+
+class ChunkReader:
+    """按需读取数据块的来源，记录已读取的内容
+
+    read_chunk() 每次返回一块数据，读完时返回 b''。解析出错时用 read_all() 取回完整内容交给 feedparser；
+    只有读到结尾时 content_hash 才是整个内容的哈希，提前停止时为 None。
+    """
+
+    def __init__(self, read_chunk: Callable[[], bytes]):
+        self._read_chunk = read_chunk
+        self._received = []
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.complete = False
+
+    @classmethod
+    def from_content(cls, content: bytes, chunk_size: int = CHUNK_SIZE):
+        """已下载的内容"""
+        chunks = iter_chunks(content, chunk_size)
+        return cls(lambda: next(chunks, b''))
+
+    def __iter__(self) -> Iterator[bytes]:
+        while not self.complete:
+            chunk = self._read_chunk()
+            if not chunk:
+                self.complete = True
+                break
+            self._received.append(chunk)
+            self._hash.update(chunk)
+            self.size += len(chunk)
+            yield chunk
+
+    def read_all(self) -> bytes:
+        """读完剩余内容，返回包括已读部分在内的完整内容"""
+        for _ in self:
+            pass
+        return b''.join(self._received)
+
+    @property
+    def content_hash(self):
+        return self._hash.hexdigest() if self.complete else None
+
+
+def iter_entries(chunks: Iterable[bytes]) -> Iterator[FeedParserDict]:
+    """增量解析RSS/Atom，逐条产出条目
+
+    每条处理完就从树上移除，内存占用与单条大小相关而不是整个文档；
+    调用方停止迭代后剩余内容不会再解析。不是合法的 XML 时（例如未声明的 HTML 实体 &nbsp;）抛出 ET.ParseError。
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    stack = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                stack.append(element)
+                continue
+            stack.pop()
+            if _split_tag(element.tag)[1] not in ENTRY_TAGS:
+                continue
+            yield _entry_from_element(element)
+            # 释放已处理的条目
+            if stack:
+                stack[-1].remove(element)
+            element.clear()
+    parser.close()
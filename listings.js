@@ -0,0 +1,89 @@
+// 列表页的键集分页（与 listings.py 相同）：读取 article_listings 快照和 listing_counts 计数，
+// 不需要 OFFSET 和 COUNT(*)。游标是最后一行的 (published_date, article_id)，格式与 listings.py 的游标通用。
+
+// listing_counts 中表示全部文章的 journal_id
+const ALL_JOURNALS = 0;
+const PAGE_SIZE = 10;
+const MAX_PAGE_SIZE = 100;
+
+const COLUMNS = `article_id AS id, journal_id, journal_name, published_date, published_date::text AS cursor_date,
+                 title, title_zh, summary, summary_zh`;
+
+function encodeCursor(publishedDate, articleId) {
+    return Buffer.from(`${publishedDate}|${articleId}`, 'utf8').toString('base64url');
+}
+
+// 游标 -> [published_date 字符串, article_id]，格式不对时抛出错误（status 为 400）
+function decodeCursor(cursor) {
+    const [publishedDate, articleId, ...rest] = Buffer.from(String(cursor), 'base64url').toString('utf8').split('|');
+    if (rest.length || !/^\d{4}-\d{2}-\d{2}[T ][\d:.]+$/.test(publishedDate || '') || !/^\d+$/.test(articleId || '')) {
+        const err = new Error(`Invalid cursor: ${cursor}`);
+        err.status = 400;
+        throw err;
+    }
+    return [publishedDate, parseInt(articleId)];
+}
+
+function pageSize(limit) {
+    return Math.min(Math.max(parseInt(limit) || PAGE_SIZE, 1), MAX_PAGE_SIZE);
+}
+
+// 按发布时间倒序的一页文章：after 为 next 游标（更早的文章），before 为 prev 游标（更新的文章）
+// 返回 { articles, next, prev, total }
+async function page(db, { after, before, limit, journalId } = {}) {
+    limit = pageSize(limit);
+    const params = [];
+    const where = [];
+    if (journalId !== undefined && journalId !== null) {
+        params.push(parseInt(journalId));
+        where.push(`journal_id = $${params.length}`);
+    }
+    const cursor = before || after;
+    if (cursor) {
+        const [publishedDate, articleId] = decodeCursor(cursor);
+        params.push(publishedDate, articleId);
+        const op = before ? '>' : '<';
+        where.push(`(published_date, article_id) ${op} ($${params.length - 1}::timestamp, $${params.length})`);
+    }
+    const order = before ? 'ASC' : 'DESC';
+    // 多取一行判断是否还有下一页
+    params.push(limit + 1);
+    const result = await db.query(`
+        SELECT ${COLUMNS}
+        FROM article_listings
+        ${where.length ? 'WHERE ' + where.join(' AND ') : ''}
+        ORDER BY published_date ${order}, article_id ${order}
+        LIMIT $${params.length}
+    `, params);
+
+    let rows = result.rows;
+    const more = rows.length > limit;
+    rows = rows.slice(0, limit);
+    let hasNewer, hasOlder;
+    if (before) {
+        rows.reverse();
+        [hasNewer, hasOlder] = [more, true];
+    } else {
+        [hasNewer, hasOlder] = [Boolean(after), more];
+    }
+    const total = await count(db, journalId);
+    const first = rows[0];
+    const last = rows[rows.length - 1];
+    return {
+        articles: rows.map(({ cursor_date, ...row }) => row),
+        next: rows.length && hasOlder ? encodeCursor(last.cursor_date, last.id) : null,
+        prev: rows.length && hasNewer ? encodeCursor(first.cursor_date, first.id) : null,
+        total
+    };
+}
+
+// 文章数（读取计数表，不扫描文章）
+async function count(db, journalId) {
+    const result = await db.query(
+        'SELECT total FROM listing_counts WHERE journal_id = $1',
+        [journalId === undefined || journalId === null ? ALL_JOURNALS : parseInt(journalId)]
+    );
+    return result.rows.length ? parseInt(result.rows[0].total) : 0;
+}
+
+module.exports = { page, count, pageSize, encodeCursor, decodeCursor, PAGE_SIZE };
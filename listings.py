@@ -0,0 +1,263 @@
+"""文章列表快照和键集分页
+
+article_listings 保存列表页需要的字段和期刊名（不用再连接 journals 表），
+listing_counts 保存每个期刊和全部文章（journal_id = 0）的文章数。
+两张表在插入文章和保存翻译的同一个事务中增量更新，列表查询不需要 OFFSET 和 COUNT(*)：
+
+    SELECT * FROM article_listings
+    WHERE (published_date, article_id) < (:published_date, :article_id)
+    ORDER BY published_date DESC, article_id DESC LIMIT 10
+
+游标是最后一行的 (published_date, article_id) 编码成的字符串，新文章插入后已有的游标仍然有效。
+
+    python listings.py --rebuild
+    python listings.py --page --journal-id 2
+    python listings.py --page --after <游标>
+"""
+import argparse
+import base64
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import bindparam, delete, func, insert, literal, select, tuple_, update
+
+import feed_publisher
+from db_models import Article, ArticleListing, Journal, ListingCount
+from db_session import get_engine, insert_ignore, session_scope
+
+# listing_counts 中表示全部文章的 journal_id
+ALL_JOURNALS = 0
+PAGE_SIZE = 10
+# 没有发布时间的文章排在最后
+MISSING_DATE = datetime(1970, 1, 1)
+
+_COLUMNS = ['article_id', 'journal_id', 'journal_name', 'published_date', 'title', 'title_zh', 'summary', 'summary_zh']
+_SNAPSHOT_COLUMNS = _COLUMNS + ['updated_at']
+
+
+def encode_cursor(published_date, article_id):
+    raw = f"{published_date.isoformat()}|{article_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """游标 -> (published_date, article_id)，格式不对时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        published, article_id = raw.split('|')
+        return datetime.fromisoformat(published), int(article_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor!r}") from e
+
+
+def _journal_names(session, journal_ids):
+    journal_ids = [journal_id for journal_id in journal_ids if journal_id is not None]
+    if not journal_ids:
+        return {}
+    return dict(session.execute(select(Journal.id, Journal.name).where(Journal.id.in_(journal_ids))).all())
+
+
+def _add_counts(session, per_journal):
+    """增加各期刊和全部文章的计数（UPDATE total = total + n，并发的事务不会互相覆盖）"""
+    per_journal = {journal_id: n for journal_id, n in per_journal.items() if journal_id is not None and n}
+    per_journal[ALL_JOURNALS] = sum(per_journal.values())
+    if not per_journal[ALL_JOURNALS]:
+        return
+    now = datetime.utcnow()
+    session.execute(
+        insert_ignore(session.get_bind().dialect.name, ListingCount),
+        [{'journal_id': journal_id, 'total': 0, 'updated_at': now} for journal_id in per_journal]
+    )
+    for journal_id, n in per_journal.items():
+        session.execute(
+            update(ListingCount)
+            .where(ListingCount.journal_id == journal_id)
+            .values(total=ListingCount.total + n, updated_at=now)
+        )
+
+
+def add_articles(session, articles):
+    """把刚插入的 Article 对象（已 flush，有ID）写入快照并增加计数"""
+    if not articles:
+        return 0
+    names = _journal_names(session, {article.journal_id for article in articles})
+    now = datetime.utcnow()
+    session.execute(insert(ArticleListing), [{
+        'article_id': article.id,
+        'journal_id': article.journal_id,
+        'journal_name': names.get(article.journal_id),
+        'published_date': article.published_date or MISSING_DATE,
+        'title': article.title,
+        'title_zh': article.title_zh,
+        'summary': article.summary,
+        'summary_zh': article.summary_zh,
+        'updated_at': now,
+    } for article in articles])
+    _add_counts(session, Counter(article.journal_id for article in articles))
+    feed_publisher.invalidate(session, [
+        (article.journal_id, article.published_date or MISSING_DATE, article.id) for article in articles
+    ])
+    return len(articles)
+
+
+def update_translations(session, translations):
+    """保存翻译后更新快照，translations 为 {article_id: (title_zh, summary_zh)}"""
+    now = datetime.utcnow()
+    for article_id, (title_zh, summary_zh) in translations.items():
+        session.execute(
+            update(ArticleListing)
+            .where(ArticleListing.article_id == article_id)
+            .values(title_zh=title_zh, summary_zh=summary_zh, updated_at=now)
+        )
+    feed_publisher.invalidate_articles(session, translations)
+
+
+def update_titles(session, titles):
+    """重新解析标题后更新快照（一条 executemany），titles 为 {article_id: title}"""
+    if not titles:
+        return
+    session.execute(
+        update(ArticleListing.__table__)
+        .where(ArticleListing.article_id == bindparam('b_article_id'))
+        .values(title=bindparam('b_title'), updated_at=datetime.utcnow()),
+        [{'b_article_id': article_id, 'b_title': title} for article_id, title in titles.items()]
+    )
+    feed_publisher.invalidate_articles(session, titles)
+
+
+def populate(conn):
+    """用一条 INSERT ... SELECT 重建快照和计数（迁移和 --rebuild 使用，在数据库内完成）"""
+    now = datetime.utcnow()
+    conn.execute(delete(ListingCount))
+    conn.execute(delete(ArticleListing))
+    conn.execute(insert(ArticleListing).from_select(_SNAPSHOT_COLUMNS, select(
+        Article.id,
+        Article.journal_id,
+        Journal.name,
+        func.coalesce(Article.published_date, MISSING_DATE),
+        Article.title,
+        Article.title_zh,
+        Article.summary,
+        Article.summary_zh,
+        literal(now),
+    ).outerjoin(Journal, Journal.id == Article.journal_id)))
+
+    conn.execute(insert(ListingCount).from_select(
+        ['journal_id', 'total', 'updated_at'],
+        select(ArticleListing.journal_id, func.count(), literal(now))
+        .where(ArticleListing.journal_id.isnot(None))
+        .group_by(ArticleListing.journal_id)
+    ))
+    total = conn.execute(select(func.count()).select_from(ArticleListing)).scalar()
+    conn.execute(insert(ListingCount).values(journal_id=ALL_JOURNALS, total=total, updated_at=now))
+    return total
+
+
+def rebuild():
+    with get_engine().begin() as conn:
+        total = populate(conn)
+        # 快照重建后所有订阅源都需要重新生成
+        feed_publisher.invalidate_all(conn)
+        return total
+
+
+def count(journal_id=None, session=None):
+    """文章数（读取计数表，不扫描文章）"""
+    with session_scope(session) as scope:
+        total = scope.get(ListingCount, ALL_JOURNALS if journal_id is None else journal_id)
+        return total.total if total else 0
+
+
+def page(after=None, before=None, limit=PAGE_SIZE, journal_id=None, session=None):
+    """按发布时间倒序的一页文章
+
+    after 为上一页的 next 游标（更早的文章），before 为 prev 游标（更新的文章），都不传时返回第一页。
+    返回 {'articles': [...], 'next': 游标或 None, 'prev': 游标或 None, 'total': 文章数}
+    """
+    key = tuple_(ArticleListing.published_date, ArticleListing.article_id)
+    statement = select(ArticleListing)
+    if journal_id is not None:
+        statement = statement.where(ArticleListing.journal_id == journal_id)
+    if before is not None:
+        statement = statement.where(key > tuple_(*decode_cursor(before))).order_by(
+            ArticleListing.published_date.asc(), ArticleListing.article_id.asc())
+    else:
+        if after is not None:
+            statement = statement.where(key < tuple_(*decode_cursor(after)))
+        statement = statement.order_by(ArticleListing.published_date.desc(), ArticleListing.article_id.desc())
+
+    with session_scope(session) as scope:
+        # 多取一行判断是否还有下一页
+        rows = scope.execute(statement.limit(limit + 1)).scalars().all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if before is not None:
+            rows.reverse()
+            has_newer, has_older = more, True
+        else:
+            has_newer, has_older = after is not None, more
+        total = count(journal_id, session=scope)
+
+    first, last = (rows[0], rows[-1]) if rows else (None, None)
+    return {
+        'articles': [{column: getattr(row, column) for column in _COLUMNS} for row in rows],
+        'next': encode_cursor(last.published_date, last.article_id) if rows and has_older else None,
+        'prev': encode_cursor(first.published_date, first.article_id) if rows and has_newer else None,
+        'total': total,
+    }
+
+
+def verify(session=None):
+    """对比计数表和实际的文章数，返回不一致的 {journal_id: (计数表, 实际)}"""
+    with session_scope(session) as scope:
+        actual = dict(scope.execute(
+            select(Article.journal_id, func.count()).where(Article.journal_id.isnot(None)).group_by(Article.journal_id)
+        ).all())
+        actual[ALL_JOURNALS] = scope.execute(select(func.count()).select_from(Article)).scalar()
+        stored = dict(scope.execute(select(ListingCount.journal_id, ListingCount.total)).all())
+    return {
+        journal_id: (stored.get(journal_id, 0), actual.get(journal_id, 0))
+        for journal_id in set(actual) | set(stored)
+        if stored.get(journal_id, 0) != actual.get(journal_id, 0)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文章列表快照")
+    parser.add_argument('--rebuild', action='store_true', help="从 articles 表重建快照和计数")
+    parser.add_argument('--verify', action='store_true', help="检查计数表与实际文章数是否一致")
+    parser.add_argument('--page', action='store_true', help="输出一页文章")
+    parser.add_argument('--after', help="下一页游标")
+    parser.add_argument('--before', help="上一页游标")
+    parser.add_argument('--journal-id', type=int, help="只列出该期刊")
+    parser.add_argument('--limit', type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.rebuild:
+        begin = time.monotonic()
+        total = rebuild()
+        logging.info(f"Rebuilt listing snapshot: {total} articles in {time.monotonic() - begin:.1f}s")
+    if args.verify:
+        mismatches = verify()
+        for journal_id, (stored, actual) in sorted(mismatches.items()):
+            logging.warning(f"journal {journal_id}: listing_counts={stored} articles={actual}")
+        logging.info("Listing counts are consistent" if not mismatches else "Run --rebuild to fix the counts")
+    if args.page:
+        begin = time.monotonic()
+        result = page(after=args.after, before=args.before, limit=args.limit, journal_id=args.journal_id)
+        elapsed = (time.monotonic() - begin) * 1000
+        for row in result['articles']:
+            print(f"{row['published_date']:%Y-%m-%d}  {row['article_id']:>8}  [{row['journal_name']}] "
+                  f"{(row['title_zh'] or row['title'])[:70]}")
+        print(f"total {result['total']}, {elapsed:.1f} ms")
+        print(f"prev: {result['prev']}\nnext: {result['next']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 延迟直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 字节数直方图的分桶
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self, const_labels):
+        with self._lock:
+            return [(self.name, const_labels + key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """可以设置为任意值的指标"""
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def samples(self, const_labels):
+        with self._lock:
+            return [(self.name, const_labels + key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """分桶直方图，同时记录总和与次数"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def merged(self):
+        """合并所有标签的统计：(各桶计数, 总和, 次数)"""
+        with self._lock:
+            buckets = [0] * len(self.buckets)
+            total = 0.0
+            count = 0
+            for state in self._values.values():
+                buckets = [a + b for a, b in zip(buckets, state['buckets'])]
+                total += state['sum']
+                count += state['count']
+            return buckets, total, count
+
+    def quantile(self, q):
+        """按分桶估算分位数（返回所在桶的上界）"""
+        buckets, _, count = self.merged()
+        if not count:
+            return None
+        target = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return self.buckets[-1]
+
+    def samples(self, const_labels):
+        samples = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                labels = const_labels + key
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, state['buckets']):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", labels + (('le', _format_value(float(bound))),), cumulative))
+                samples.append((f"{self.name}_sum", labels, state['sum']))
+                samples.append((f"{self.name}_count", labels, state['count']))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        # 所有指标附加的标签（例如多 worker 时的 worker 编号）
+        self.const_labels = {}
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标 {metric.name} 已用不同的类型或标签注册")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self):
+        """Prometheus 文本格式"""
+        const_labels = tuple(sorted((key, str(value)) for key, value in self.const_labels.items()))
+        lines = []
+        for metric in self.metrics():
+            samples = metric.samples(const_labels)
+            if not samples:
+                continue
+            lines.extend(metric.header())
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def write_textfile(path, registry=REGISTRY):
+    """原子地写入文本文件，供 node_exporter 的 textfile collector 读取"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+def start_http_server(port, host='0.0.0.0', registry=REGISTRY):
+    """在后台线程中提供 /metrics，返回 server（调用 shutdown() 停止）"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name='metrics-http').start()
+    logging.info(f"Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def summary_lines(registry=REGISTRY):
+    """一次性运行结束时输出的摘要：计数器的合计，直方图的次数、均值和估算的 p50/p95"""
+    lines = []
+    for metric in registry.metrics():
+        if isinstance(metric, Counter):
+            total = metric.total()
+            if total:
+                lines.append(f"{metric.name}: {_format_value(float(total))}")
+        elif isinstance(metric, Gauge):
+            for _, labels, value in metric.samples(()):
+                lines.append(f"{metric.name}{_format_labels(labels)}: {_format_value(value)}")
+        elif isinstance(metric, Histogram):
+            _, total, count = metric.merged()
+            if count:
+                lines.append(
+                    f"{metric.name}: count={count} sum={total:.3f} avg={total / count:.3f} "
+                    f"p50<={_format_value(float(metric.quantile(0.5)))} "
+                    f"p95<={_format_value(float(metric.quantile(0.95)))}"
+                )
+    return lines
+
+
+def log_summary(title, registry=REGISTRY):
+    lines = summary_lines(registry)
+    if lines:
+        logging.info(f"{title}:\n  " + '\n  '.join(lines))
+
+
+def add_arguments(parser):
+    """--metrics-port / --metrics-textfile 命令行参数"""
+    parser.add_argument('--metrics-port', type=int, help="在该端口提供 Prometheus /metrics")
+    parser.add_argument('--metrics-textfile', help="把指标写入文件（node_exporter textfile collector）")
+
+
+# 抓取
+FEED_FETCH_SECONDS = REGISTRY.histogram(
+    'rss2web_feed_fetch_seconds', "RSS源下载耗时", ['journal', 'outcome'])
+FEED_BYTES = REGISTRY.counter(
+    'rss2web_feed_bytes_total', "下载的RSS内容字节数", ['journal'])
+FEED_SIZE_BYTES = REGISTRY.histogram(
+    'rss2web_feed_size_bytes', "单次下载的RSS内容大小", buckets=SIZE_BUCKETS)
+FEED_FETCHES = REGISTRY.counter(
+    'rss2web_feed_fetches_total', "RSS源抓取次数（ok/not_modified/unchanged/error）", ['journal', 'outcome'])
+ENTRIES_SEEN = REGISTRY.counter(
+    'rss2web_ingest_entries_seen_total', "解析到的条目数", ['journal'])
+ENTRIES_NEW = REGISTRY.counter(
+    'rss2web_ingest_entries_new_total', "新入库的文章数", ['journal'])
+ENTRIES_DUPLICATE = REGISTRY.counter(
+    'rss2web_ingest_entries_duplicate_total', "已入库而跳过的条目数", ['journal'])
+NEAR_DUPLICATES = REGISTRY.counter(
+    'rss2web_ingest_near_duplicates_total', "与已入库文章近似重复的新文章数")
+DB_INSERT_SECONDS = REGISTRY.histogram(
+    'rss2web_db_insert_seconds', "批量去重和插入文章的耗时")
+
+# 翻译
+TRANSLATION_REQUEST_SECONDS = REGISTRY.histogram(
+    'rss2web_translation_request_seconds', "翻译接口请求耗时", ['mode', 'outcome'])
+TRANSLATION_TOKENS = REGISTRY.counter(
+    'rss2web_translation_tokens_total', "翻译接口token用量", ['mode', 'kind'])
+TRANSLATION_RETRIES = REGISTRY.counter(
+    'rss2web_translation_retries_total', "翻译重试次数（逐篇重试或批量拆分）", ['reason'])
+TRANSLATION_RATE_LIMITED = REGISTRY.counter(
+    'rss2web_translation_rate_limited_total', "收到 429 的次数")
+TRANSLATION_FAILURES = REGISTRY.counter(
+    'rss2web_translation_failures_total', "记录为失败的文章数")
+TRANSLATED_ARTICLES = REGISTRY.counter(
+    'rss2web_translated_articles_total', "保存了翻译的文章数")
+TRANSLATION_CACHE_LOOKUPS = REGISTRY.counter(
+    'rss2web_translation_cache_lookups_total', "翻译缓存查询（memory/db/miss）", ['result'])
+TRANSLATION_BACKLOG = REGISTRY.gauge(
+    'rss2web_translation_backlog', "未翻译的文章数")
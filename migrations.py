@@ -0,0 +1,271 @@
+import argparse
+import logging
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, inspect, select, text
+
+from db_models import (Base, Article, ArticleListing, ArticleLshBand, ArticleSignature, ArticleVector, Author,
+                       BackfillProgress, Comment, FeedState, ListingCount, PublishedFeed, RelatedArticle, TagTerm,
+                       TranslationCacheEntry, TranslationState, SchemaMigration, VectorCentroid, article_authors,
+                       article_tags)
+
+# 按版本号顺序执行的迁移，每个迁移都必须可以重复执行（新建的库里对象可能已经存在）
+MIGRATIONS = []
+
+
+class MigrationError(Exception):
+    """迁移无法安全执行"""
+
+
+def migration(version, description):
+    """注册一个迁移"""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return fn
+    return register
+
+
+def add_missing_columns(conn, model, column_names):
+    """给已存在的表补上缺少的列（只支持可为空的列）"""
+    table = model.__table__
+    preparer = conn.dialect.identifier_preparer
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    for name in column_names:
+        if name not in existing:
+            column_type = table.c[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(
+                f"ALTER TABLE {preparer.quote(table.name)} "
+                f"ADD COLUMN {preparer.quote(name)} {column_type}"
+            ))
+            logging.info(f"Added column {table.name}.{name}")
+
+
+def create_missing_indexes(conn, model, index_names=None):
+    """创建表上声明但数据库中还不存在的索引"""
+    table = getattr(model, '__table__', model)
+    existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+    for index in table.indexes:
+        if index_names is not None and index.name not in index_names:
+            continue
+        if index.name not in existing:
+            index.create(conn)
+            logging.info(f"Created index {index.name}")
+
+
+def _has_articles(conn):
+    """升级的是已有数据的库（新建的库不需要重建派生数据）"""
+    return conn.execute(select(Article.id).limit(1)).first() is not None
+
+
+@migration(1, "create feed_states, translation_cache and translation_states")
+def create_side_tables(conn):
+    Base.metadata.create_all(conn, tables=[
+        FeedState.__table__,
+        TranslationCacheEntry.__table__,
+        TranslationState.__table__,
+    ])
+
+
+@migration(2, "add lease columns to translation_states")
+def add_lease_columns(conn):
+    add_missing_columns(conn, TranslationState, ['leased_by', 'lease_expires_at'])
+
+
+@migration(3, "add article and comment indexes, unique DOI")
+def add_article_indexes(conn):
+    # 唯一索引之前先检查重复的DOI，不删除任何数据
+    duplicates = conn.execute(
+        select(Article.doi, func.count())
+        .where(Article.doi.isnot(None))
+        .group_by(Article.doi)
+        .having(func.count() > 1)
+        .limit(20)
+    ).all()
+    if duplicates:
+        listed = ', '.join(f"{doi!r} x{count}" for doi, count in duplicates)
+        raise MigrationError(f"articles.doi 存在重复值，请先处理后再创建唯一索引: {listed}")
+
+    # 只创建这个迁移引入的索引，之后的迁移添加的列（如 duplicate_of）此时还不存在
+    create_missing_indexes(conn, Article, {
+        'ix_articles_doi', 'ix_articles_published_date', 'ix_articles_journal_id', 'ix_articles_untranslated'
+    })
+    create_missing_indexes(conn, Comment, {'ix_comments_article_id'})
+
+
+@migration(4, "add polling schedule columns to feed_states")
+def add_poll_schedule_columns(conn):
+    add_missing_columns(conn, FeedState, [
+        'poll_interval', 'next_poll_at', 'consecutive_failures', 'last_new_at'
+    ])
+
+
+@migration(5, "create full-text search index")
+def create_search_index(conn):
+    import search_index
+    if search_index.create(conn) and _has_articles(conn):
+        # 已有的文章在迁移中加入索引，否则检索不到迁移之前入库的文章
+        total = search_index.populate(conn)
+        logging.info(f"Search index: {total} articles")
+
+
+@migration(6, "create and populate the article listing snapshot")
+def create_listing_snapshot(conn):
+    import listings
+    Base.metadata.create_all(conn, tables=[ArticleListing.__table__, ListingCount.__table__])
+    total = listings.populate(conn)
+    logging.info(f"Listing snapshot: {total} articles")
+
+
+@migration(7, "add updated_at to article_listings")
+def add_listing_updated_at(conn):
+    add_missing_columns(conn, ArticleListing, ['updated_at'])
+    conn.execute(
+        ArticleListing.__table__.update()
+        .where(ArticleListing.updated_at.is_(None))
+        .values(updated_at=datetime.utcnow())
+    )
+    create_missing_indexes(conn, ArticleListing, {'ix_article_listings_updated_at'})
+
+
+@migration(8, "create published feed cache")
+def create_published_feeds(conn):
+    PublishedFeed.__table__.create(conn, checkfirst=True)
+
+
+@migration(9, "create normalized authors and convert the author lists")
+def create_authors(conn):
+    import authors
+    Base.metadata.create_all(conn, tables=[Author.__table__, article_authors])
+    # 新建的库里 create_all 已经建好表，只有没有关联的文章需要转换
+    if conn.execute(select(article_authors.c.article_id).limit(1)).first() is None:
+        total = authors.populate(conn)
+        logging.info(f"Article authors: {total} links")
+
+
+@migration(10, "create automatic tagging statistics and article_tags indexes")
+def create_tag_terms(conn):
+    TagTerm.__table__.create(conn, checkfirst=True)
+    create_missing_indexes(conn, article_tags)
+    if conn.execute(select(TagTerm.term).limit(1)).first() is None and _has_articles(conn):
+        import tagger
+        total = tagger.populate(conn)
+        logging.info(f"Automatic tags: {total} article tags")
+
+
+@migration(11, "add near-duplicate detection")
+def create_duplicate_detection(conn):
+    add_missing_columns(conn, Article, ['duplicate_of'])
+    create_missing_indexes(conn, Article, {'ix_articles_duplicate_of'})
+    Base.metadata.create_all(conn, tables=[ArticleSignature.__table__, ArticleLshBand.__table__])
+    if conn.execute(select(ArticleSignature.article_id).limit(1)).first() is None and _has_articles(conn):
+        import duplicates
+        total = duplicates.populate(conn)
+        logging.info(f"MinHash signatures: {total} articles")
+
+
+@migration(12, "create related article vectors")
+def create_related_articles(conn):
+    Base.metadata.create_all(conn, tables=[
+        ArticleVector.__table__,
+        VectorCentroid.__table__,
+        RelatedArticle.__table__,
+    ])
+    if conn.execute(select(ArticleVector.article_id).limit(1)).first() is None and _has_articles(conn):
+        import related
+        if related.np is None:
+            # 相关文章是可选功能：安装 NumPy 之后增量计算会自动训练聚类中心并计算所有文章
+            logging.warning("NumPy 未安装，已有的文章暂不计算相关文章")
+            return
+        total = related.populate(conn)
+        logging.info(f"Related articles: {total} articles")
+
+
+@migration(13, "add articles.raw_title and backfill progress")
+def add_raw_title(conn):
+    add_missing_columns(conn, Article, ['raw_title'])
+    BackfillProgress.__table__.create(conn, checkfirst=True)
+
+
+@migration(14, "rebuild the PostgreSQL search index with positional tsvectors")
+def rebuild_positional_search_index(conn):
+    import search_index
+    # 之前的 tsvector 没有位置信息，标题权重和相关度排序都不起作用
+    if conn.dialect.name == 'postgresql' and inspect(conn).has_table(search_index.TABLE) \
+            and conn.execute(text(f"SELECT 1 FROM {search_index.TABLE} LIMIT 1")).first() is not None:
+        total = search_index.populate(conn)
+        logging.info(f"Search index: {total} articles")
+
+
+@migration(15, "recompute MinHash signatures with the vectorized shingle hash")
+def recompute_signatures(conn):
+    import duplicates
+    # 词三元组和签名的哈希函数变了，旧的签名与新文章的签名无法比较
+    if conn.execute(select(ArticleSignature.article_id).limit(1)).first() is not None:
+        total = duplicates.populate(conn)
+        logging.info(f"MinHash signatures: {total} articles")
+
+
+def current_version(conn):
+    """当前已执行的最高迁移版本"""
+    return conn.execute(select(func.max(SchemaMigration.version))).scalar() or 0
+
+
+def upgrade(engine, target=None):
+    """执行所有未执行的迁移，每个迁移一个事务"""
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        version = current_version(conn)
+
+    applied = []
+    for number, description, fn in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        logging.info(f"Applying migration {number}: {description}")
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=number,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+        applied.append(number)
+    return applied
+
+
+def status(engine):
+    """输出每个迁移是否已执行"""
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        done = {row.version: row.applied_at for row in conn.execute(select(SchemaMigration))}
+    for number, description, _ in MIGRATIONS:
+        applied_at = done.get(number)
+        mark = applied_at.strftime('%Y-%m-%d %H:%M') if applied_at else 'pending'
+        print(f"{number:>4}  {mark:<16}  {description}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库迁移")
+    parser.add_argument('--db-url', default=None, help="数据库连接（默认使用 RSS2WEB_DATABASE_URL）")
+    parser.add_argument('--status', action='store_true', help="只显示迁移状态")
+    parser.add_argument('--target', type=int, help="迁移到指定版本")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.db_url:
+        engine = create_engine(args.db_url)
+    else:
+        from db_session import get_engine
+        engine = get_engine()
+    if args.status:
+        status(engine)
+        return
+    applied = upgrade(engine, args.target)
+    logging.info(f"Applied {len(applied)} migrations")
+
+
+if __name__ == "__main__":
+    main()
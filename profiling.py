@@ -0,0 +1,287 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+# 采样调用栈的默认间隔（秒）
+SAMPLE_INTERVAL = 0.005
+# 报告中列出的条目数
+TOP_N = 25
+
+_NULL_SPAN = nullcontext()
+
+
+def _snapshot():
+    """内存快照（排除 tracemalloc 和本模块自身的分配）"""
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+
+class Profiler:
+    """按阶段统计耗时，可选按阶段记录 cProfile 和 tracemalloc，并定时采样调用栈
+
+    span 可以嵌套，每个线程有自己的 span 栈。标记为 stage 的 span 才会记录
+    cProfile / tracemalloc（开销较大），普通 span 只计时。
+    异步代码中跨 await 的耗时用 record() 直接记录，避免多个协程共用一个 span 栈。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.use_cprofile = False
+        self.use_tracemalloc = False
+        self.sample_interval = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stacks = {}                       # 线程ID -> 当前的 span 栈
+        self.calls = Counter()                  # span 路径 -> 次数
+        self.seconds = defaultdict(float)       # span 路径 -> 总耗时
+        self.samples = Counter()                # 采样到的调用栈 -> 次数
+        self._profiles = {}                     # (阶段, 线程ID) -> cProfile.Profile
+        self.allocations = defaultdict(Counter)  # 阶段 -> {分配位置: 净增加字节数}
+        self.allocation_peaks = Counter()       # 阶段 -> 最大的单次净增加字节数
+        self._sampler = None
+        self._stop = threading.Event()
+        self.started_at = None
+
+    def start(self, cprofile=False, trace_allocations=False, sample_interval=SAMPLE_INTERVAL):
+        self.enabled = True
+        self.use_cprofile = cprofile
+        self.use_tracemalloc = trace_allocations
+        self.sample_interval = sample_interval
+        self.started_at = time.perf_counter()
+        if trace_allocations and not tracemalloc.is_tracing():
+            # 报告只按分配位置（最内层一帧）汇总，只保存一帧开销最小
+            tracemalloc.start(1)
+        if sample_interval:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True, name='profiler-sampler')
+            self._sampler.start()
+
+    def stop(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = False
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            self._local.profiles = []
+            with self._lock:
+                self._stacks[threading.get_ident()] = stack
+        return stack
+
+    @contextmanager
+    def _span(self, name, stage):
+        stack = self._stack()
+        stack.append(name)
+        path = tuple(stack)
+        profile = self._enter_cprofile(name) if stage and self.use_cprofile else None
+        snapshot = _snapshot() if stage and self.use_tracemalloc else None
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - begin
+            if profile is not None:
+                self._exit_cprofile(profile)
+            if snapshot is not None:
+                self._record_allocations(name, snapshot)
+            stack.pop()
+            with self._lock:
+                self.calls[path] += 1
+                self.seconds[path] += elapsed
+
+    def span(self, name, stage=False):
+        """计时范围；未启用时返回空的上下文，几乎没有开销"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, stage)
+
+    def record(self, name, seconds):
+        """直接记录一次耗时（挂在当前线程的 span 下），用于跨 await 的操作"""
+        if not self.enabled:
+            return
+        path = tuple(self._stack()) + (name,)
+        with self._lock:
+            self.calls[path] += 1
+            self.seconds[path] += seconds
+
+    def _enter_cprofile(self, name):
+        # 同一线程同一时间只能有一个 profiler 生效，进入子阶段时暂停父阶段
+        active = self._local.profiles
+        if active:
+            active[-1].disable()
+        key = (name, threading.get_ident())
+        with self._lock:
+            profile = self._profiles.setdefault(key, cProfile.Profile())
+        active.append(profile)
+        profile.enable()
+        return profile
+
+    def _exit_cprofile(self, profile):
+        profile.disable()
+        active = self._local.profiles
+        active.pop()
+        if active:
+            active[-1].enable()
+
+    def _record_allocations(self, name, before):
+        after = _snapshot()
+        growth = 0
+        with self._lock:
+            for stat in after.compare_to(before, 'lineno'):
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    self.allocations[name][f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+                    growth += stat.size_diff
+            self.allocation_peaks[name] = max(self.allocation_peaks[name], growth)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+            with self._lock:
+                stacks = {tid: tuple(stack) for tid, stack in self._stacks.items() if stack}
+            for tid, spans in stacks.items():
+                frame = frames.get(tid)
+                if frame is None or tid == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ';'.join(spans + tuple(reversed(names)))
+                with self._lock:
+                    self.samples[key] += 1
+
+    def stage_table(self):
+        """[(路径, 次数, 总耗时, 自身耗时)]，自身耗时不含子 span"""
+        with self._lock:
+            paths = dict(self.seconds)
+            calls = dict(self.calls)
+        children = defaultdict(float)
+        for path, seconds in paths.items():
+            if len(path) > 1:
+                children[path[:-1]] += seconds
+        return sorted(
+            ((path, calls[path], seconds, max(0.0, seconds - children[path])) for path, seconds in paths.items()),
+            key=lambda row: row[0]
+        )
+
+    def format_stage_table(self):
+        lines = [f"{'stage':<48}{'calls':>10}{'total s':>12}{'self s':>12}{'avg ms':>10}"]
+        for path, calls, total, own in self.stage_table():
+            name = '  ' * (len(path) - 1) + path[-1]
+            lines.append(f"{name:<48}{calls:>10}{total:>12.3f}{own:>12.3f}{total / calls * 1000:>10.3f}")
+        return '\n'.join(lines)
+
+    def write_report(self, directory, top=TOP_N):
+        """写出报告文件，返回写出的文件列表
+
+        stages.txt          各阶段次数和耗时
+        stages.collapsed    按阶段自身耗时（微秒）的折叠栈，可直接用 flamegraph.pl / speedscope 查看
+        stacks.collapsed    采样到的调用栈（以所在阶段为根）
+        cprofile-<阶段>.prof / .txt   每个阶段的 cProfile 数据和累计耗时前 N 的函数
+        allocations.txt     每个阶段净增加内存最多的前 N 个代码位置
+        """
+        os.makedirs(directory, exist_ok=True)
+        written = []
+
+        def write(filename, text):
+            path = os.path.join(directory, filename)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            written.append(path)
+
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0
+        write('stages.txt', f"wall time: {elapsed:.3f}s\n\n{self.format_stage_table()}\n")
+        write('stages.collapsed', ''.join(
+            f"{';'.join(path)} {int(own * 1_000_000)}\n"
+            for path, _, _, own in self.stage_table() if own > 0
+        ))
+        if self.samples:
+            with self._lock:
+                samples = sorted(self.samples.items())
+            write('stacks.collapsed', ''.join(f"{stack} {count}\n" for stack, count in samples))
+
+        by_stage = defaultdict(list)
+        with self._lock:
+            for (name, _), profile in self._profiles.items():
+                by_stage[name].append(profile)
+        for name, profiles in sorted(by_stage.items()):
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            path = os.path.join(directory, f"cprofile-{name}.prof")
+            stats.dump_stats(path)
+            written.append(path)
+            output = io.StringIO()
+            pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(top)
+            write(f"cprofile-{name}.txt", output.getvalue())
+
+        if self.allocations:
+            lines = []
+            with self._lock:
+                for name, locations in sorted(self.allocations.items()):
+                    lines.append(f"== {name} (largest single-span growth {self.allocation_peaks[name] / 1024:.1f} KiB)")
+                    for location, size in locations.most_common(top):
+                        lines.append(f"{size / 1024:>12.1f} KiB  {location}")
+                    lines.append('')
+            write('allocations.txt', '\n'.join(lines))
+        return written
+
+
+PROFILER = Profiler()
+
+
+def span(name, stage=False):
+    return PROFILER.span(name, stage)
+
+
+def record(name, seconds):
+    PROFILER.record(name, seconds)
+
+
+def add_arguments(parser):
+    """--profile 及相关命令行参数"""
+    parser.add_argument('--profile', action='store_true', help="按阶段统计耗时并输出折叠栈（火焰图）")
+    parser.add_argument('--profile-dir', default='profile', help="性能报告输出目录")
+    parser.add_argument('--profile-cprofile', action='store_true', help="每个阶段记录 cProfile")
+    parser.add_argument('--profile-tracemalloc', action='store_true', help="每个阶段记录内存分配（较慢）")
+    parser.add_argument('--profile-interval', type=float, default=SAMPLE_INTERVAL * 1000,
+                        help="调用栈采样间隔（毫秒，0 表示不采样）")
+    parser.add_argument('--profile-top', type=int, default=TOP_N, help="报告中列出的条目数")
+
+
+def start_from_args(args):
+    if args.profile:
+        PROFILER.start(
+            cprofile=args.profile_cprofile,
+            trace_allocations=args.profile_tracemalloc,
+            sample_interval=args.profile_interval / 1000
+        )
+
+
+def finish_from_args(args):
+    """停止采样，写出报告并在日志中输出阶段耗时"""
+    if not args.profile:
+        return
+    PROFILER.stop()
+    written = PROFILER.write_report(args.profile_dir, args.profile_top)
+    logging.info(f"Profile by stage:\n{PROFILER.format_stage_table()}")
+    logging.info(f"Profile written to {', '.join(written)}")
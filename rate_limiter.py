@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+# 默认配额（按服务商的限制调整）
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 100000
+
+
+class TokenBucket:
+    """令牌桶：按每分钟速率持续补充，容量默认等于一分钟的配额"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount=1):
+        """取出 amount 个令牌，不够时等待补充（先到先得）"""
+        # 超过容量的请求按容量计算，否则永远等不到
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta):
+        """按实际用量修正预估值，delta 为正表示多用了令牌（允许透支）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AdaptiveConcurrency:
+    """AIMD 自适应并发：延迟正常时逐步增加，遇到 429 或延迟过高时减少"""
+
+    def __init__(self, initial=4, minimum=1, maximum=32, target_latency=20.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency):
+        if latency <= self.target_latency:
+            # 每个并发窗口大约加 1
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        else:
+            self.limit = max(self.minimum, self.limit * 0.9)
+
+    def on_rate_limited(self):
+        self.limit = max(self.minimum, self.limit / 2)
+        logging.warning(f"触发限流，并发数降为 {int(self.limit)}")
+
+
+class RateLimiter:
+    """组合每分钟请求数、每分钟token数和自适应并发的限流器"""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, concurrency=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self._paused_until = 0.0
+
+    def pause(self, seconds):
+        """收到 429 后暂停所有新请求一段时间"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.concurrency.on_rate_limited()
+
+    @asynccontextmanager
+    async def limit(self, estimated_tokens):
+        """在配额和并发允许时进入，退出时记录请求延迟"""
+        await self.concurrency.acquire()
+        try:
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            start = time.monotonic()
+            yield
+            self.concurrency.on_success(time.monotonic() - start)
+        finally:
+            await self.concurrency.release()
@@ -0,0 +1,445 @@
+"""相关文章
+
+每篇文章用标题和摘要的哈希 TF-IDF 向量表示（tagger 的候选词，逆文档频率使用 tag_terms 的语料统计，
+不需要外部模型或网络）。近邻查找使用倒排索引（IVF）：向量按最近的聚类中心分到倒排列表，
+查询时只比较最近的 NPROBE 个列表中的文章，按余弦相似度取前 TOP_K 篇写入 related_articles，
+详情页只需按 article_id 读取一次。新文章不在入库的事务中计算：抓取的每一轮结束后（或 --update）
+给还没有向量的文章计算向量和相关文章，同时更新候选文章的相关列表（还没有聚类中心时，
+文章数达到 MIN_TRAIN_ARTICLES 后自动重建一次）；
+--rebuild 把所有向量写到内存映射的 float32 矩阵中，重新训练聚类中心并计算相关文章，
+不会一次性加载整个表。需要 NumPy。
+
+    python related.py --rebuild              # 语料增长较多后重新运行，聚类中心随之更新
+    python related.py --update               # 只处理还没有向量的文章
+    python related.py --article-id 123
+"""
+import argparse
+import logging
+import math
+import os
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+
+from sqlalchemy import delete, func, insert, select
+
+import tagger
+from db_models import Article, ArticleVector, RelatedArticle, TagTerm, VectorCentroid
+from db_session import get_engine, session_scope
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖，没有时入库不计算相关文章
+    np = None
+
+# 向量维数（哈希后的特征数）
+DIM = 256
+TOP_K = 10
+# 相似度低于该值的文章不算相关
+MIN_SCORE = 0.1
+# 倒排列表数为 LISTS_FACTOR * sqrt(文章数)，查询时比较最近的 NPROBE 个列表
+LISTS_FACTOR = 2
+MAX_LISTS = 4096
+NPROBE = 16
+# 训练聚类中心的样本数和迭代次数
+TRAIN_SIZE = 20_000
+KMEANS_ITERATIONS = 10
+SEED = 20240602
+REBUILD_BATCH_SIZE = 5000
+UPDATE_BATCH_SIZE = 200
+# 还没有聚类中心时，文章数达到该值后增量计算自动重建（训练初始的聚类中心）
+MIN_TRAIN_ARTICLES = 1000
+# 增量计算查找没有向量的文章时，从已有向量的最大文章ID往回检查的ID数：
+# 并发入库的事务可能晚于更大的ID提交（最多约 MAX_CONCURRENCY 个源 x 每个源的条目数）
+RESCAN_WINDOW = 10_000
+LOOKUP_BATCH_SIZE = 500
+# 增量计算时每篇文章最多比较的文章数（从最近的倒排列表开始读取）
+MAX_CANDIDATES = 2000
+# 增量计算时更新相关列表的已有文章数（每篇新文章最相似的这么多篇）
+UPDATE_NEIGHBOURS = 50
+# 没有候选词（零向量）的文章所在的列表
+EMPTY_LIST = -1
+# 分块计算矩阵乘法的行数
+BLOCK_SIZE = 4096
+
+_warned = False
+
+
+@lru_cache(maxsize=1 << 18)
+def _feature(term):
+    """词 -> (维度, 符号)，CRC32 在不同进程中结果一致"""
+    h = zlib.crc32(term.encode('utf-8'))
+    return h & (DIM - 1), 1.0 if h & 0x80000000 else -1.0
+
+
+def embed(documents, document_counts, corpus_size):
+    """[tagger.candidates(...)] -> 归一化的 float32 矩阵（没有候选词的文章为零向量）"""
+    rows, columns, values = [], [], []
+    for row, document in enumerate(documents):
+        for term, count in document.items():
+            column, sign = _feature(term)
+            idf = math.log((1 + corpus_size) / (1 + document_counts.get(term, 0))) + 1
+            rows.append(row)
+            columns.append(column)
+            values.append(sign * (math.log(count) + 1) * idf)
+    matrix = np.zeros((len(documents), DIM), dtype=np.float32)
+    np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)),
+              np.asarray(values, dtype=np.float32))
+    return _normalize(matrix)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def nearest(matrix, centroids, n):
+    """每行最近的 n 个聚类中心（按相似度倒序）"""
+    n = min(n, len(centroids))
+    result = np.empty((len(matrix), n), dtype=np.int64)
+    for start in range(0, len(matrix), BLOCK_SIZE):
+        sims = np.asarray(matrix[start:start + BLOCK_SIZE]) @ centroids.T
+        best = np.argpartition(-sims, n - 1, axis=1)[:, :n] if n < len(centroids) else \
+            np.tile(np.arange(n), (len(sims), 1))
+        order = np.argsort(-np.take_along_axis(sims, best, axis=1), axis=1)
+        result[start:start + len(sims)] = np.take_along_axis(best, order, axis=1)
+    return result
+
+
+def train(sample, lists, seed=SEED):
+    """球面 k-means：返回 (lists, DIM) 的归一化聚类中心"""
+    rng = np.random.default_rng(seed)
+    lists = min(lists, len(sample))
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = nearest(sample, centroids, 1)[:, 0]
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=lists) == 0
+        # 空的聚类重新取一个随机样本
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+def _top(candidate_ids, scores, top_k=TOP_K):
+    """按相似度倒序取前 top_k 个 [(article_id, score)]"""
+    if len(scores) > top_k:
+        best = np.argpartition(-scores, top_k)[:top_k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.lexsort((np.asarray(candidate_ids)[best], -scores[best]))]
+    return [(int(candidate_ids[i]), float(scores[i])) for i in best if scores[i] >= MIN_SCORE]
+
+
+def _merge(current, additions, top_k=TOP_K):
+    merged = dict(current)
+    merged.update(additions)
+    return sorted(merged.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+
+def _write_vectors(session, article_ids, matrix, list_numbers):
+    if not len(article_ids):
+        return
+    session.execute(insert(ArticleVector), [
+        {'article_id': article_id, 'list_no': int(list_no), 'vector': vector.astype('<f4').tobytes()}
+        for article_id, vector, list_no in zip(article_ids, matrix, list_numbers)
+    ])
+
+
+def _write_related(session, related):
+    """替换 {article_id: [(related_id, score)]} 的相关文章"""
+    article_ids = list(related)
+    for i in range(0, len(article_ids), LOOKUP_BATCH_SIZE):
+        session.execute(delete(RelatedArticle).where(
+            RelatedArticle.article_id.in_(article_ids[i:i + LOOKUP_BATCH_SIZE])))
+    rows = [
+        {'article_id': article_id, 'rank': rank, 'related_id': related_id, 'score': score}
+        for article_id, items in related.items() for rank, (related_id, score) in enumerate(items)
+    ]
+    if rows:
+        session.execute(insert(RelatedArticle), rows)
+
+
+def _load_centroids(session):
+    rows = session.execute(select(VectorCentroid.vector).order_by(VectorCentroid.list_no)).scalars().all()
+    if not rows:
+        return None
+    return np.stack([np.frombuffer(vector, dtype='<f4') for vector in rows])
+
+
+def _load_list(session, list_no):
+    """倒排列表中最新的 MAX_CANDIDATES 篇文章 (文章ID数组, 向量矩阵, 规范文章ID数组)"""
+    rows = session.execute(
+        select(ArticleVector.article_id, ArticleVector.vector, Article.duplicate_of)
+        .join(Article, Article.id == ArticleVector.article_id)
+        .where(ArticleVector.list_no == list_no)
+        .order_by(ArticleVector.article_id.desc())
+        .limit(MAX_CANDIDATES)
+    ).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, DIM), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    return (np.array([row.article_id for row in rows], dtype=np.int64),
+            np.stack([np.frombuffer(row.vector, dtype='<f4') for row in rows]),
+            np.array([row.duplicate_of or row.article_id for row in rows], dtype=np.int64))
+
+
+def _current(session, article_ids):
+    article_ids = list(article_ids)
+    current = defaultdict(list)
+    for i in range(0, len(article_ids), LOOKUP_BATCH_SIZE):
+        for article_id, related_id, score in session.execute(
+            select(RelatedArticle.article_id, RelatedArticle.related_id, RelatedArticle.score)
+            .where(RelatedArticle.article_id.in_(article_ids[i:i + LOOKUP_BATCH_SIZE]))
+            .order_by(RelatedArticle.article_id, RelatedArticle.rank)
+        ):
+            current[article_id].append((related_id, score))
+    return current
+
+
+def _add_batch(session, rows, centroids):
+    """计算一批文章 [(id, title, summary, duplicate_of)] 的向量和相关文章，并更新候选文章的相关列表
+
+    每篇文章按相似度从近到远读取自己的 NPROBE 个倒排列表，候选文章达到 MAX_CANDIDATES 篇后不再读取，
+    每篇文章的开销与文章总数无关。返回更新了相关列表的文章数。
+    """
+    documents = [tagger.candidates(row.title, row.summary) for row in rows]
+    counts = tagger.document_counts(session, set().union(*documents))
+    corpus_size = counts.pop(tagger.CORPUS_KEY, 0)
+    matrix = embed(documents, counts, corpus_size)
+    nonzero = np.linalg.norm(matrix, axis=1) > 0
+    # 没有候选词的文章记在列表 -1 中（不会被查到），待处理的进度不会停在它们上
+    _write_vectors(session, [row.id for row, keep in zip(rows, nonzero) if not keep],
+                   matrix[~nonzero], np.full(int((~nonzero).sum()), EMPTY_LIST))
+    rows = [row for row, keep in zip(rows, nonzero) if keep]
+    if not rows:
+        return 0
+    matrix = matrix[nonzero]
+    probes = nearest(matrix, centroids, NPROBE)
+    _write_vectors(session, [row.id for row in rows], matrix, probes[:, 0])
+
+    lists = {}
+    new_ids = {row.id for row in rows}
+    related = {}
+    additions = defaultdict(dict)
+    for row, vector, probed in zip(rows, matrix, probes):
+        canonical = row.duplicate_of or row.id
+        ids, vectors, scores = [], [], []
+        size = 0
+        for list_no in probed.tolist():
+            if size >= MAX_CANDIDATES:
+                break
+            if list_no not in lists:
+                lists[list_no] = _load_list(session, list_no)
+            list_ids, list_vectors, list_canonical = lists[list_no]
+            # 不推荐自身和近似重复的文章
+            keep = (list_ids != row.id) & (list_canonical != canonical)
+            ids.append(list_ids[keep])
+            vectors.append(list_vectors[keep])
+            size += int(keep.sum())
+        candidate_ids = np.concatenate(ids)
+        if not len(candidate_ids):
+            related[row.id] = []
+            continue
+        scores = np.concatenate(vectors) @ vector
+        related[row.id] = _top(candidate_ids, scores)
+        # 只有最相似的 UPDATE_NEIGHBOURS 篇已有文章可能把新文章排进前 TOP_K
+        for candidate_id, score in _top(candidate_ids, scores, UPDATE_NEIGHBOURS):
+            if candidate_id not in new_ids:
+                additions[candidate_id][row.id] = score
+
+    # 新文章进入已有文章的前 TOP_K 时才改写它的列表
+    current = _current(session, additions)
+    for candidate_id, added in additions.items():
+        merged = _merge(current.get(candidate_id, []), added)
+        if merged != current.get(candidate_id, []):
+            related[candidate_id] = merged
+    _write_related(session, related)
+    return len(related)
+
+
+def update_pending(batch_size=UPDATE_BATCH_SIZE):
+    """给还没有向量的文章计算相关文章（不在入库的事务中），每批一个事务，返回处理的文章数
+
+    每篇处理过的文章都有一行 article_vectors（没有候选词的文章在列表 -1 中），只查找没有向量的文章，
+    范围从已有向量的最大文章ID往回 RESCAN_WINDOW 个，晚于更大ID提交的文章不会被跳过。
+    还没有聚类中心时，文章数达到 MIN_TRAIN_ARTICLES 后调用 rebuild 训练聚类中心并计算所有文章。
+    """
+    global _warned
+    if np is None:
+        if not _warned:
+            logging.warning("NumPy 未安装，不计算相关文章")
+            _warned = True
+        return 0
+    with session_scope() as session:
+        centroids = _load_centroids(session)
+        if centroids is None:
+            articles = session.execute(select(func.count()).select_from(Article)).scalar()
+    if centroids is None:
+        if articles < MIN_TRAIN_ARTICLES:
+            logging.info(
+                f"Related articles wait for {MIN_TRAIN_ARTICLES} articles to train centroids "
+                f"({articles} so far; run python related.py --rebuild to train now)"
+            )
+            return 0
+        logging.info(f"No centroids yet, training on {articles} articles")
+        return rebuild()
+
+    total = 0
+    while True:
+        with session_scope() as session:
+            last_id = session.execute(select(func.max(ArticleVector.article_id))).scalar() or 0
+            rows = session.execute(
+                select(Article.id, Article.title, Article.summary, Article.duplicate_of)
+                .outerjoin(ArticleVector, ArticleVector.article_id == Article.id)
+                .where(Article.id > last_id - RESCAN_WINDOW, ArticleVector.article_id.is_(None))
+                .order_by(Article.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            _add_batch(session, rows, centroids)
+        total += len(rows)
+    if total:
+        logging.info(f"Related articles for {total} new articles")
+    return total
+
+
+def _stream(conn, max_id, batch_size):
+    """按ID分批读取 (id, title, summary, duplicate_of)"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(Article.id, Article.title, Article.summary, Article.duplicate_of)
+            .where(Article.id > last_id, Article.id <= max_id)
+            .order_by(Article.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+
+
+def populate(conn, batch_size=REBUILD_BATCH_SIZE, directory=None, top_k=TOP_K):
+    """清空并重新计算所有文章的向量、聚类中心和相关文章（迁移和 --rebuild 使用），返回有向量的文章数
+
+    在调用方的事务中执行。第一遍分批计算向量，写入临时目录中内存映射的矩阵；然后用抽样训练聚类中心，
+    分配倒排列表并写入数据库；最后每篇文章只和最近的 NPROBE 个列表中的文章计算相似度。
+    """
+    if np is None:
+        raise RuntimeError("计算相关文章需要 NumPy")
+    max_id = conn.execute(select(func.max(Article.id))).scalar() or 0
+    total = conn.execute(select(func.count()).select_from(Article).where(Article.id <= max_id)).scalar()
+    counts = dict(conn.execute(select(TagTerm.term, TagTerm.document_count)).all())
+    corpus_size = counts.pop(tagger.CORPUS_KEY, 0)
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        matrix = np.lib.format.open_memmap(os.path.join(tmp, 'vectors.npy'), mode='w+',
+                                           dtype=np.float32, shape=(max(total, 1), DIM))
+        article_ids = np.zeros(total, dtype=np.int64)
+        canonical = np.zeros(total, dtype=np.int64)
+        size = 0
+        begin = time.monotonic()
+        for rows in _stream(conn, max_id, batch_size):
+            vectors = embed([tagger.candidates(row.title, row.summary) for row in rows], counts, corpus_size)
+            keep = np.linalg.norm(vectors, axis=1) > 0
+            rows = [row for row, kept in zip(rows, keep) if kept]
+            n = len(rows)
+            matrix[size:size + n] = vectors[keep]
+            article_ids[size:size + n] = [row.id for row in rows]
+            canonical[size:size + n] = [row.duplicate_of or row.id for row in rows]
+            size += n
+            logging.info(f"Embedded {size} articles ({size / (time.monotonic() - begin):.0f}/s)")
+
+        conn.execute(delete(RelatedArticle))
+        conn.execute(delete(ArticleVector))
+        conn.execute(delete(VectorCentroid))
+        if not size:
+            return 0
+
+        rng = np.random.default_rng(SEED)
+        sample = np.sort(rng.choice(size, min(size, TRAIN_SIZE), replace=False))
+        lists = max(1, min(MAX_LISTS, int(LISTS_FACTOR * math.sqrt(size))))
+        centroids = train(np.asarray(matrix[sample]), lists)
+        probes = nearest(matrix[:size], centroids, NPROBE)
+        logging.info(f"Trained {len(centroids)} centroids")
+        conn.execute(insert(VectorCentroid), [
+            {'list_no': list_no, 'vector': vector.astype('<f4').tobytes()}
+            for list_no, vector in enumerate(centroids)
+        ])
+        for start in range(0, size, batch_size):
+            _write_vectors(conn, article_ids[start:start + batch_size].tolist(),
+                           matrix[start:start + batch_size], probes[start:start + batch_size, 0])
+
+        # 每个倒排列表中的文章（矩阵的行号）
+        order = np.argsort(probes[:, 0], kind='stable')
+        starts = np.searchsorted(probes[order, 0], np.arange(len(centroids) + 1))
+        begin = time.monotonic()
+        related = {}
+        for i in range(size):
+            candidates = np.concatenate([order[starts[list_no]:starts[list_no + 1]] for list_no in probes[i]])
+            candidates = candidates[canonical[candidates] != canonical[i]]
+            if len(candidates):
+                scores = matrix[candidates] @ matrix[i]
+                related[int(article_ids[i])] = _top(article_ids[candidates], scores, top_k)
+            if len(related) >= batch_size or (i == size - 1 and related):
+                _write_related(conn, related)
+                related = {}
+                logging.info(f"Related articles for {i + 1} articles ({(i + 1) / (time.monotonic() - begin):.0f}/s)")
+        del matrix
+    return size
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE, directory=None, top_k=TOP_K):
+    """清空并重新计算所有文章的向量、聚类中心和相关文章，返回有向量的文章数"""
+    with get_engine().begin() as conn:
+        return populate(conn, batch_size, directory, top_k)
+
+
+def related_to(article_id, session=None):
+    """预先计算的相关文章 [{id, title, title_zh, published_date, score}]"""
+    with session_scope(session) as scope:
+        rows = scope.execute(
+            select(Article.id, Article.title, Article.title_zh, Article.published_date, RelatedArticle.score)
+            .join(Article, Article.id == RelatedArticle.related_id)
+            .where(RelatedArticle.article_id == article_id)
+            .order_by(RelatedArticle.rank)
+        )
+        return [dict(row._mapping) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="相关文章")
+    parser.add_argument('--rebuild', action='store_true', help="重新计算所有文章的向量和相关文章")
+    parser.add_argument('--update', action='store_true', help="给还没有向量的文章计算相关文章")
+    parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help="重建时每批的文章数")
+    parser.add_argument('--tmp-dir', help="重建时存放向量矩阵的目录（默认系统临时目录）")
+    parser.add_argument('--article-id', type=int, help="输出该文章的相关文章")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.rebuild:
+        begin = time.monotonic()
+        total = rebuild(args.batch_size, args.tmp_dir)
+        logging.info(f"Rebuilt related articles: {total} articles in {time.monotonic() - begin:.1f}s")
+    if args.update:
+        begin = time.monotonic()
+        total = update_pending()
+        logging.info(f"Updated related articles: {total} articles in {time.monotonic() - begin:.1f}s")
+    if args.article_id:
+        begin = time.monotonic()
+        rows = related_to(args.article_id)
+        elapsed = (time.monotonic() - begin) * 1000
+        for row in rows:
+            print(f"{row['score']:>6.3f}  {row['id']:>8}  {(row['title_zh'] or row['title'])[:80]}")
+        print(f"{len(rows)} related articles in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
 from db_models import Base
-from sqlalchemy import create_engine
+from migrations import upgrade
+from db_session import get_engine
+import search_index
 
-# 创建数据库连接
-db_url = "你的数据库链接"
-engine = create_engine(db_url)
+# 创建数据库连接（RSS2WEB_DATABASE_URL）
+engine = get_engine()
 
-# 删除所有表
-Base.metadata.drop_all(engine)
+# 删除所有表（保留翻译缓存，重新抓取后无需再次调用翻译API）
+preserved = {'translation_cache'}
+tables = [table for table in Base.metadata.sorted_tables if table.name not in preserved]
+with engine.begin() as conn:
+    # 全文检索索引不在 Base.metadata 中，单独删除
+    search_index.drop(conn)
+Base.metadata.drop_all(engine, tables=tables)
 
-# 重新创建所有表
+# 重新创建所有表，并记录迁移版本
 Base.metadata.create_all(engine)
+upgrade(engine)
 
 print("Database tables have been reset successfully!") 
\ No newline at end of file
@@ -1,38 +1,35 @@
 const express = require('express');
 const router = express.Router();
 const db = require('../db');
+const listings = require('../listings');
 
 router.get('/', async (req, res) => {
     try {
-        const page = parseInt(req.query.page) || 1;
-        const limit = 10;
-        const offset = (page - 1) * limit;
-        
-        // 获取文章总数
-        const countResult = await db.query('SELECT COUNT(*) FROM articles');
-        const total = parseInt(countResult.rows[0].count);
-        
-        // 获取分页文章
-        const result = await db.query(`
-            SELECT a.*, j.name as journal_name 
-            FROM articles a 
-            LEFT JOIN journals j ON a.journal_id = j.id 
-            ORDER BY a.published_date DESC 
-            LIMIT $1 OFFSET $2
-        `, [limit, offset]);
+        // 按 (published_date, id) 游标分页，读取列表快照和计数表（listings.py 在入库和翻译时更新）
+        const journalId = /^\d+$/.test(req.query.journal || '') ? parseInt(req.query.journal) : null;
+        const result = await listings.page(db, {
+            after: req.query.after,
+            before: req.query.before,
+            journalId
+        });
 
         // 修正这里：设置默认值为 true
         const isEnglish = true;  // 默认显示英文
 
         res.render('home', {
-            articles: result.rows,
+            articles: result.articles,
             isEnglish: isEnglish,
             pagination: {
-                current: page,
-                pages: Math.ceil(total / limit)
+                total: result.total,
+                next: result.next,
+                prev: result.prev,
+                journal: journalId
             }
         });
     } catch (err) {
+        if (err.status === 400) {
+            return res.status(400).send('Invalid page cursor');
+        }
         console.error('Error fetching articles:', err);
         res.status(500).send('Server Error');
     }
@@ -62,11 +59,21 @@ router.get('/articles/:id', async (req, res) => {
             ORDER BY c.created_at DESC
         `, [req.params.id]);
 
+        // 预先计算的相关文章（python related.py 生成，表不存在时不显示）
+        const relatedResult = await db.query(`
+            SELECT a.id, a.title, a.title_zh
+            FROM related_articles r
+            JOIN articles a ON a.id = r.related_id
+            WHERE r.article_id = $1
+            ORDER BY r.rank
+        `, [req.params.id]).catch(() => ({ rows: [] }));
+
         const isEnglish = true;  // 默认显示英文
 
         res.render('article', {
             article: articleResult.rows[0],
             comments: commentsResult.rows,  // 添加评论数据
+            related: relatedResult.rows,
             isEnglish: isEnglish
         });
     } catch (err) {
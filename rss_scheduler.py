@@ -1,19 +1,73 @@
 import feedparser
 from db_operations import DatabaseManager
+from db_session import log_pool_status, session_scope
+import metrics
+import profiling
+import related
+from profiling import span, record
+from feed_fetcher import FETCH_ERRORS, AsyncFeedFetcher
+from feed_stream import CHUNK_SIZE, ChunkReader, iter_entries
+import argparse
+import asyncio
+import heapq
 import logging
-from datetime import datetime
+import os
+import random
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
 import time
 
+# 流式解析：连续遇到多少篇已入库的文章后停止
+KNOWN_RUN_THRESHOLD = 5
+# 流式解析：每多少条查询一次数据库
+STREAM_CHECK_BATCH = 10
+
+# 自适应轮询配置（秒）
+MIN_POLL_INTERVAL = 15 * 60
+MAX_POLL_INTERVAL = 24 * 3600
+DEFAULT_POLL_INTERVAL = 2 * 3600
+# 常驻模式下重新读取 rss.txt 的间隔（秒）
+URL_RELOAD_INTERVAL = 10 * 60
+# 常驻模式下每轮最多抓取的源数
+MAX_DUE_BATCH = 50
+
+
+def plan_next_poll(poll_interval, consecutive_failures, new_articles):
+    """根据本次结果计算新的轮询间隔、连续失败次数和距下次轮询的秒数
+
+    new_articles 为 None 表示抓取失败。有新文章时间隔减半，没有新文章时放大 1.5 倍，
+    失败时在当前间隔基础上指数退避。
+    """
+    interval = poll_interval or DEFAULT_POLL_INTERVAL
+    if new_articles is None:
+        failures = consecutive_failures + 1
+        delay = min(MAX_POLL_INTERVAL, interval * 2 ** min(failures, 10))
+        return interval, failures, delay
+
+    if new_articles > 0:
+        interval = max(MIN_POLL_INTERVAL, interval // 2)
+    else:
+        interval = min(MAX_POLL_INTERVAL, int(interval * 1.5))
+    return interval, 0, interval
+
+
 class RSSManager:
-    def __init__(self):
-        self.db_manager = DatabaseManager()
+    def __init__(self, streaming=False, known_threshold=KNOWN_RUN_THRESHOLD):
+        # 日志配置要在迁移输出日志之前完成
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
+        self.db_manager = DatabaseManager()
+        # 流式解析模式（只对并发抓取生效）
+        self.streaming = streaming
+        self.known_threshold = known_threshold
+        # 创建缺失的表并执行未完成的迁移，已有的数据不受影响
+        self.db_manager.init_db()
 
-    def parse_title(self, title):
-        """解析标题，提取卷号和页码"""
+    @staticmethod
+    def parse_title(title):
+        """解析标题，提取卷号和页码（backfill.py 用它重新解析已入库的文章）"""
         volume = ''
         pages = ''
         actual_title = title
@@ -43,7 +97,7 @@ class RSSManager:
             'actual_title': actual_title
         }
 
-    def update_all_journals(self):
+    def update_all_journals(self, concurrent=True):
         """更新所有期刊"""
         logging.info("Starting RSS update cycle...")
         
@@ -51,61 +105,450 @@ class RSSManager:
         if not urls:
             logging.error("No RSS URLs found in file")
             return
+
+        journal_ids = self.resolve_journals(urls)
+        feed_states = self.db_manager.get_feed_states(journal_ids.values())
+
+        if concurrent:
+            asyncio.run(self.update_journals_async(urls, journal_ids, feed_states))
+            self.update_related()
+            log_pool_status()
+            return
             
+        skipped = 0
         for url in urls:
             try:
                 logging.info(f"Processing URL: {url}")
-                journal_name = self.get_journal_name_from_url(url)
-                journal_id = self.db_manager.get_or_create_journal(
-                    name=journal_name,
-                    rss_url=url
-                )
-                
-                feed = feedparser.parse(url)
-                if hasattr(feed, 'status') and feed.status != 200:
-                    logging.error(f"Failed to fetch feed. Status: {feed.status}")
+                journal_id = journal_ids[url]
+                state = feed_states.get(journal_id, {})
+                begin = time.monotonic()
+                with span('fetch_and_parse', stage=True):
+                    feed = feedparser.parse(
+                        url,
+                        etag=state.get('etag'),
+                        modified=state.get('last_modified')
+                    )
+                # feedparser 下载和解析一起完成，耗时包含解析
+                elapsed = time.monotonic() - begin
+                status = getattr(feed, 'status', 200)
+                if status == 304:
+                    # 未变化的源是最常见的情况，直接跳过
+                    skipped += 1
+                    self.record_fetch(url, 'not_modified', elapsed)
+                    self.db_manager.save_feed_state(journal_id, status)
                     continue
-                    
-                logging.info(f"Found {len(feed.entries)} entries in feed")
-                new_articles = 0
-                
-                for entry in feed.entries:
-                    try:
-                        # 解析标题
-                        title_info = self.parse_title(entry.title)
-                        
-                        # 获取摘要
-                        summary = entry.get('summary', '') or entry.get('description', '')
-                        
-                        # 解析文章数据
-                        article_data = {
-                            'title': title_info['actual_title'],  # 使用实际标题
-                            'authors': entry.get('authors', []),
-                            'link': entry.link,
-                            'published': entry.get('published', datetime.now().strftime('%Y-%m-%d')),
-                            'summary': summary,
-                            'doi': entry.get('prism_doi', '') or entry.get('id', ''),
-                            'volume': title_info['volume'],
-                            'pages': title_info['pages'],
-                            'journal_id': journal_id
-                        }
-                        
-                        # 添加原始文章（不包含翻译）
-                        article_id = self.db_manager.add_article_without_translation(article_data)
-                        if article_id:
-                            new_articles += 1
-                            logging.info(f"Added article: {entry.title[:50]}...")
-                        
-                    except Exception as e:
-                        logging.error(f"Error processing article: {str(e)}")
-                        continue
-                
-                logging.info(f"Journal {journal_name}: Added {new_articles} new articles")
+                if status != 200:
+                    self.record_fetch(url, 'error', elapsed)
+                    logging.error(f"Failed to fetch feed. Status: {status}")
+                    continue
+                self.record_fetch(url, 'ok', elapsed)
+
+                # 新文章和抓取状态在同一个事务中提交
+                with session_scope() as session:
+                    self.process_feed(url, feed, journal_id, session=session)
+                    self.db_manager.save_feed_state(
+                        journal_id,
+                        status,
+                        etag=feed.get('etag'),
+                        last_modified=feed.get('modified'),
+                        session=session
+                    )
                 
             except Exception as e:
                 logging.error(f"Error processing journal {url}: {str(e)}")
                 continue
 
+        logging.info(f"Skipped {skipped} unchanged feeds")
+        self.update_related()
+        log_pool_status()
+
+    def ingest_files(self, paths):
+        """从本地文件入库（离线测试和性能分析用，例如 benchmarks.synthetic_feeds 生成的源）
+
+        期刊名取自文件名，返回 {文件路径: 新增文章数}
+        """
+        urls = {path: f"file://{os.path.abspath(path)}" for path in paths}
+        journal_ids = self.resolve_journals(urls.values())
+        outcomes = {}
+        for path, url in urls.items():
+            begin = time.monotonic()
+            with span('read_file'):
+                with open(path, 'rb') as f:
+                    content = f.read()
+            self.record_fetch(url, 'ok', time.monotonic() - begin, len(content))
+            outcomes[path] = self.process_content(url, content, journal_ids[url])
+        logging.info(f"Ingested {len(paths)} files, {sum(outcomes.values())} new articles")
+        self.update_related()
+        return outcomes
+
+    def update_related(self):
+        """入库的事务提交后给新文章计算相关文章，失败不影响抓取（下一轮会继续处理）"""
+        try:
+            with span('related', stage=True):
+                related.update_pending()
+        except Exception as e:
+            logging.error(f"Error updating related articles: {str(e)}")
+
+    def resolve_journals(self, urls):
+        """获取或创建每个URL对应的期刊，返回 {url: journal_id}"""
+        journal_ids = {}
+        with session_scope() as session:
+            for url in urls:
+                journal_ids[url] = self.db_manager.get_or_create_journal(
+                    name=self.get_journal_name_from_url(url),
+                    rss_url=url,
+                    session=session
+                )
+        return journal_ids
+
+    async def update_journals_async(self, urls, journal_ids, feed_states, fetcher=None):
+        """并发抓取所有RSS源，抓取完成一个就处理一个，慢的源不会阻塞其他源
+
+        返回 {url: 新增文章数}，抓取或处理失败的源为 None
+        """
+        if fetcher is None:
+            async with AsyncFeedFetcher() as fetcher:
+                return await self.update_journals_async(urls, journal_ids, feed_states, fetcher)
+
+        start = time.monotonic()
+        outcomes = {}
+        not_modified = 0
+        unchanged = 0
+        validators = {url: feed_states.get(journal_ids[url]) for url in urls}
+        consume = None
+        if self.streaming:
+            async def consume(result, stream):
+                return await self.consume_stream(result, stream, journal_ids[result.url])
+
+        for next_result in fetcher.fetch_all(urls, validators, consume):
+            result = await next_result
+            # 并发下载之间交错执行，直接记录每个源的下载耗时
+            record('fetch', result.elapsed)
+            journal_id = journal_ids[result.url]
+            state = feed_states.get(journal_id, {})
+            outcomes[result.url] = None
+
+            if result.not_modified:
+                not_modified += 1
+                outcomes[result.url] = 0
+                self.record_fetch(result.url, 'not_modified', result.elapsed)
+                await asyncio.to_thread(self.db_manager.save_feed_state, journal_id, result.status)
+                continue
+            if not result.ok:
+                self.record_fetch(result.url, 'error', result.elapsed)
+                logging.error(
+                    f"Failed to fetch feed {result.url}. "
+                    f"Status: {result.status}, error: {result.error}"
+                )
+                continue
+            if result.streamed:
+                # 下载时已经解析入库，处理失败时结果为 None
+                outcomes[result.url] = result.consumed
+                self.record_fetch(result.url, 'ok', result.elapsed, result.size)
+                continue
+
+            content_hash = result.content_hash
+            if content_hash == state.get('content_hash'):
+                # 服务器不支持条件请求但内容没变，同样跳过解析
+                unchanged += 1
+                outcomes[result.url] = 0
+                self.record_fetch(result.url, 'unchanged', result.elapsed, len(result.content))
+                await asyncio.to_thread(
+                    self.db_manager.save_feed_state, journal_id, result.status,
+                    result.etag, result.last_modified
+                )
+                continue
+
+            logging.info(f"Fetched {result.url} ({len(result.content)} bytes, {result.elapsed:.2f}s)")
+            self.record_fetch(result.url, 'ok', result.elapsed, len(result.content))
+            try:
+                # 解析和入库是同步的，放到线程中执行，避免阻塞其他源的抓取
+                outcomes[result.url] = await asyncio.to_thread(
+                    self.process_content, result.url, result.content, journal_id, result
+                )
+            except Exception as e:
+                logging.error(f"Error processing journal {result.url}: {str(e)}")
+
+        failed = sum(1 for outcome in outcomes.values() if outcome is None)
+        logging.info(
+            f"Skipped {not_modified + unchanged} unchanged feeds "
+            f"({not_modified} not modified, {unchanged} same content)"
+        )
+        logging.info(
+            f"RSS update cycle finished: {len(urls)} feeds, {failed} failed, "
+            f"{time.monotonic() - start:.1f}s"
+        )
+        return outcomes
+
+    async def consume_stream(self, result, stream, journal_id):
+        """边下载边解析入库（--stream）
+
+        解析线程需要下一块数据时才从响应中读取，提前停止时剩余内容不再下载。返回新增文章数，处理失败时返回 None
+        """
+        loop = asyncio.get_running_loop()
+
+        def read_chunk():
+            return asyncio.run_coroutine_threadsafe(stream.read(CHUNK_SIZE), loop).result()
+
+        reader = ChunkReader(read_chunk)
+        try:
+            return await asyncio.to_thread(self.process_content, result.url, reader, journal_id, result)
+        except FETCH_ERRORS:
+            # 下载中断由抓取器记录为抓取失败
+            raise
+        except Exception as e:
+            logging.error(f"Error processing journal {result.url}: {str(e)}")
+            return None
+        finally:
+            result.size = reader.size
+
+    def record_fetch(self, url, outcome, elapsed, size=None):
+        """记录一次抓取的耗时、结果和下载的字节数"""
+        journal = self.get_journal_name_from_url(url)
+        metrics.FEED_FETCH_SECONDS.observe(elapsed, journal=journal, outcome=outcome)
+        metrics.FEED_FETCHES.inc(journal=journal, outcome=outcome)
+        if size is not None:
+            metrics.FEED_BYTES.inc(size, journal=journal)
+            metrics.FEED_SIZE_BYTES.observe(size)
+
+    def record_entries(self, journal, seen, new_articles):
+        """记录解析到的条目数、新文章数和重复条目数"""
+        metrics.ENTRIES_SEEN.inc(seen, journal=journal)
+        metrics.ENTRIES_NEW.inc(new_articles, journal=journal)
+        metrics.ENTRIES_DUPLICATE.inc(max(0, seen - new_articles), journal=journal)
+
+    def process_content(self, url, content, journal_id=None, fetch_result=None):
+        """解析RSS内容并入库
+
+        content 是已下载的内容，或者边下载边读取的 ChunkReader（只支持流式解析）
+        """
+        with span('process_content'), session_scope() as session:
+            content_hash = fetch_result.content_hash if fetch_result is not None else None
+            if self.streaming and journal_id is not None:
+                reader = content if isinstance(content, ChunkReader) else ChunkReader.from_content(content)
+                with span('stream', stage=True):
+                    new_articles = self.process_stream(
+                        url, reader, journal_id, self.known_threshold, session=session
+                    )
+                # 边下载边解析时只有读完整个内容才有哈希，提前停止时不更新
+                content_hash = content_hash or reader.content_hash
+            else:
+                with span('parse', stage=True):
+                    feed = feedparser.parse(content)
+                new_articles = self.process_feed(url, feed, journal_id, session=session)
+
+            if fetch_result is not None and journal_id is not None:
+                # 新文章和内容哈希在同一个事务中提交，处理失败时哈希不会被记录，下次会重新处理
+                with span('save_feed_state'):
+                    self.db_manager.save_feed_state(
+                        journal_id, fetch_result.status, fetch_result.etag,
+                        fetch_result.last_modified, content_hash, session=session
+                    )
+        return new_articles
+
+    def build_article_data(self, entry, journal_id):
+        """把RSS条目转换成入库的文章数据"""
+        # 解析标题
+        with span('parse_title'):
+            title_info = self.parse_title(entry.title)
+        
+        # 获取摘要
+        summary = entry.get('summary', '') or entry.get('description', '')
+        
+        # 解析文章数据
+        return {
+            'title': title_info['actual_title'],  # 使用实际标题
+            'raw_title': entry.title,
+            'authors': entry.get('authors', []),
+            'link': entry.link,
+            'published': entry.get('published', datetime.now().strftime('%Y-%m-%d')),
+            'summary': summary,
+            'doi': entry.get('prism_doi', '') or entry.get('id', ''),
+            'volume': title_info['volume'],
+            'pages': title_info['pages'],
+            'journal_id': journal_id
+        }
+
+    def process_feed(self, url, feed, journal_id=None, session=None):
+        """处理解析后的RSS源，返回新增文章数"""
+        journal_name = self.get_journal_name_from_url(url)
+        if journal_id is None:
+            journal_id = self.db_manager.get_or_create_journal(
+                name=journal_name,
+                rss_url=url,
+                session=session
+            )
+            
+        logging.info(f"Found {len(feed.entries)} entries in feed")
+        articles_data = []
+        
+        with span('build_articles', stage=True):
+            for entry in feed.entries:
+                try:
+                    articles_data.append(self.build_article_data(entry, journal_id))
+                except Exception as e:
+                    logging.error(f"Error processing article: {str(e)}")
+                    continue
+        
+        # 整个源的文章一次性去重并在一个事务中插入（不包含翻译）
+        with span('db_insert', stage=True):
+            article_ids = self.db_manager.add_articles_batch(articles_data, session=session)
+        new_articles = len(article_ids)
+        self.record_entries(journal_name, len(feed.entries), new_articles)
+        
+        logging.info(f"Journal {journal_name}: Added {new_articles} new articles")
+        return new_articles
+
+    def process_stream(self, url, reader, journal_id, known_threshold=KNOWN_RUN_THRESHOLD, session=None):
+        """增量解析RSS并入库，连续遇到 known_threshold 篇已入库的文章后停止解析
+
+        RSS源按时间倒序排列，连续的已知文章说明后面都是旧文章。reader 是 ChunkReader，
+        内容不是合法的 XML 时（例如未声明的 HTML 实体）读完剩余内容改用 feedparser 解析
+        """
+        journal_name = self.get_journal_name_from_url(url)
+        articles_data = []
+        pending = []
+        seen = 0
+        known_run = 0
+        stopped = False
+
+        def flush_pending():
+            # 一次查询一小批条目是否已入库，按原顺序统计连续已知的数量
+            nonlocal known_run
+            with span('dedup_query'):
+                existing = self.db_manager.existing_dois((data['doi'] for data in pending), session=session)
+            for data in pending:
+                if data['doi'] in existing:
+                    known_run += 1
+                    if known_run >= known_threshold:
+                        return True
+                else:
+                    known_run = 0
+                    articles_data.append(data)
+            return False
+
+        try:
+            for entry in iter_entries(reader):
+                seen += 1
+                try:
+                    pending.append(self.build_article_data(entry, journal_id))
+                except Exception as e:
+                    logging.error(f"Error processing article: {str(e)}")
+                    continue
+                if len(pending) >= STREAM_CHECK_BATCH:
+                    stopped = flush_pending()
+                    pending = []
+                    if stopped:
+                        break
+        except ET.ParseError as e:
+            # 已解析的条目还没有入库，整个源交给 feedparser 重新处理
+            logging.warning(f"Streaming parse of {url} failed ({e}), falling back to feedparser")
+            with span('parse', stage=True):
+                feed = feedparser.parse(reader.read_all())
+            return self.process_feed(url, feed, journal_id, session=session)
+        if pending and not stopped:
+            stopped = flush_pending()
+
+        with span('db_insert', stage=True):
+            article_ids = self.db_manager.add_articles_batch(articles_data, session=session)
+        self.record_entries(journal_name, seen, len(article_ids))
+        logging.info(
+            f"Journal {journal_name}: parsed {seen} entries"
+            f"{' (stopped early at known entries)' if stopped else ''}, "
+            f"added {len(article_ids)} new articles"
+        )
+        return len(article_ids)
+
+    async def run_daemon(self, max_batch=MAX_DUE_BATCH, metrics_textfile=None):
+        """常驻调度：按每个源各自的下次轮询时间抓取，轮询间隔随更新频率自适应
+
+        指定 metrics_textfile 时每轮抓取后更新指标文件
+        """
+        logging.info("Starting adaptive RSS scheduler...")
+        heap = []
+        journal_ids = {}
+        active_urls = set()
+        last_reload = None
+        polls = 0
+        started = time.monotonic()
+
+        async with AsyncFeedFetcher() as fetcher:
+            while True:
+                if last_reload is None or time.monotonic() - last_reload > URL_RELOAD_INTERVAL:
+                    # 定期重新读取 rss.txt，新增的源立即加入队列
+                    active_urls = await asyncio.to_thread(
+                        self._schedule_new_urls, heap, journal_ids
+                    )
+                    last_reload = time.monotonic()
+
+                if not heap:
+                    await asyncio.sleep(URL_RELOAD_INTERVAL)
+                    continue
+
+                now = datetime.now()
+                wait = (heap[0][0] - now).total_seconds()
+                if wait > 0:
+                    await asyncio.sleep(min(wait, URL_RELOAD_INTERVAL))
+                    continue
+
+                due = []
+                while heap and heap[0][0] <= now and len(due) < max_batch:
+                    url = heapq.heappop(heap)[1]
+                    if url in active_urls:
+                        due.append(url)
+                    else:
+                        # 已从 rss.txt 删除的源不再调度，重新加入时会重新排队
+                        journal_ids.pop(url, None)
+                if not due:
+                    continue
+
+                feed_states = await asyncio.to_thread(
+                    self.db_manager.get_feed_states, [journal_ids[url] for url in due]
+                )
+                outcomes = await self.update_journals_async(due, journal_ids, feed_states, fetcher)
+                polls += len(due)
+                if any(outcomes.get(url) for url in due):
+                    await asyncio.to_thread(self.update_related)
+
+                for url in due:
+                    journal_id = journal_ids[url]
+                    state = feed_states.get(journal_id, {})
+                    new_articles = outcomes.get(url)
+                    interval, failures, delay = plan_next_poll(
+                        state.get('poll_interval'),
+                        state.get('consecutive_failures', 0),
+                        new_articles
+                    )
+                    # 加入少量随机抖动，避免同一主机的源总在同一时刻被抓取
+                    next_poll_at = datetime.now() + timedelta(seconds=delay * random.uniform(0.9, 1.1))
+                    await asyncio.to_thread(
+                        self.db_manager.save_feed_schedule,
+                        journal_id, interval, next_poll_at, failures, bool(new_articles)
+                    )
+                    heapq.heappush(heap, (next_poll_at, url))
+
+                hours = (time.monotonic() - started) / 3600
+                logging.info(
+                    f"Polled {len(due)} feeds ({polls} in {hours:.1f}h since start); "
+                    f"next poll at {heap[0][0]:%H:%M:%S}"
+                )
+                if metrics_textfile:
+                    await asyncio.to_thread(metrics.write_textfile, metrics_textfile)
+
+    def _schedule_new_urls(self, heap, journal_ids):
+        """把 rss.txt 中尚未调度的源加入队列，返回当前所有源"""
+        urls = self.load_rss_urls('rss.txt')
+        new_urls = [url for url in urls if url not in journal_ids]
+        if new_urls:
+            journal_ids.update(self.resolve_journals(new_urls))
+            feed_states = self.db_manager.get_feed_states([journal_ids[url] for url in new_urls])
+            now = datetime.now()
+            for url in new_urls:
+                # 重启后沿用持久化的下次轮询时间
+                state = feed_states.get(journal_ids[url], {})
+                heapq.heappush(heap, (state.get('next_poll_at') or now, url))
+        return set(urls)
+
     def load_rss_urls(self, filename):
         try:
             with open(filename, 'r') as f:
@@ -122,8 +565,39 @@ class RSSManager:
         return name
 
 def main():
-    rss_manager = RSSManager()
-    rss_manager.update_all_journals()
+    parser = argparse.ArgumentParser(description="抓取RSS源")
+    parser.add_argument('--sequential', action='store_true', help="逐个抓取（不并发）")
+    parser.add_argument('--daemon', action='store_true',
+                        help="常驻运行，按每个源的更新频率自适应轮询")
+    parser.add_argument('--stream', action='store_true',
+                        help="增量解析，遇到连续已入库的文章后停止")
+    parser.add_argument('--known-threshold', type=int, default=KNOWN_RUN_THRESHOLD,
+                        help="流式解析时连续多少篇已入库文章后停止")
+    parser.add_argument('--feed-files', nargs='+', metavar='FILE',
+                        help="从本地文件入库而不是抓取 rss.txt 中的源（离线测试）")
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    rss_manager = RSSManager(streaming=args.stream, known_threshold=args.known_threshold)
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+    profiling.start_from_args(args)
+    try:
+        if args.daemon:
+            asyncio.run(rss_manager.run_daemon(metrics_textfile=args.metrics_textfile))
+            return
+        with span('cycle'):
+            if args.feed_files:
+                rss_manager.ingest_files(args.feed_files)
+            else:
+                rss_manager.update_all_journals(concurrent=not args.sequential)
+    finally:
+        # 常驻模式下按 Ctrl-C 退出时也会写出报告
+        profiling.finish_from_args(args)
+    metrics.log_summary("Ingest metrics")
+    if args.metrics_textfile:
+        metrics.write_textfile(args.metrics_textfile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,312 @@
+"""文章全文检索（标题和摘要的中英文）
+
+SQLite 使用 FTS5 虚拟表，PostgreSQL 使用 tsvector 列加 GIN 索引，都建在 article_search 表上，
+行号 / article_id 与 articles.id 对应。分词在 Python 中完成，两种数据库的结果一致：
+
+- 英文等按单词切分，转为小写并去掉重音符号
+- 中日韩文字按字符二元组切分（"遥感影像" -> 遥感 感影 影像 像），不需要分词词典；
+  每段末尾的单字也写入索引，单字查询用前缀匹配
+
+文章入库（add_articles_batch）和保存翻译（save_translations）时在同一个事务中更新索引。
+
+    python search_index.py --rebuild
+    python search_index.py --query "remote sensing 土地覆盖"
+"""
+import argparse
+import logging
+import re
+import time
+import unicodedata
+
+from sqlalchemy import Float, Integer, bindparam, inspect, select, text
+from sqlalchemy.orm import Session
+
+from db_models import Article, Journal
+from db_session import get_engine, session_scope
+
+TABLE = 'article_search'
+# 参与检索的字段，以及排序时的权重（标题命中比摘要命中更相关）
+FIELDS = ('title', 'summary', 'title_zh', 'summary_zh')
+WEIGHTS = {'title': 4.0, 'summary': 1.0, 'title_zh': 4.0, 'summary_zh': 1.0}
+# PostgreSQL 的 tsvector 权重等级
+PG_WEIGHT_CLASSES = {'title': 'A', 'summary': 'C', 'title_zh': 'A', 'summary_zh': 'C'}
+# 重建索引时每批处理的文章数
+REBUILD_BATCH_SIZE = 2000
+
+# 假名、汉字（含扩展A和兼容汉字）、韩文音节
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_CJK_RE = re.compile(f'[{_CJK}]')
+_CJK_RUN_RE = re.compile(f'[{_CJK}]+')
+_WORD_RE = re.compile(rf'[^\W_{_CJK}]+')
+_QUERY_RE = re.compile(rf'([{_CJK}]+|[^\W_{_CJK}]+)(\*?)')
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# 已检查过索引表的数据库 -> 是否存在
+_available = {}
+
+
+def tokenize(text):
+    """把文本切成索引用的词（英文单词小写，中文字符二元组），词的顺序不影响检索"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKC', _TAG_RE.sub(' ', text)).lower()
+    tokens = _WORD_RE.findall(text)
+    if text.isascii():
+        return tokens
+    tokens = [word if word.isascii() else _fold(word) for word in tokens]
+    for run in _CJK_RUN_RE.findall(text):
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        tokens.append(run[-1])
+    return tokens
+
+
+def _fold(word):
+    """小写并去掉重音符号（café -> cafe），PostgreSQL 和 SQLite 的结果一致"""
+    if word.isascii():
+        return word.lower()
+    word = unicodedata.normalize('NFKD', word.casefold())
+    return ''.join(char for char in word if not unicodedata.combining(char))
+
+
+def query_terms(query):
+    """把查询切成 [(词, 是否前缀匹配)]，所有词都必须出现
+
+    中文按二元组匹配（相当于短语中相邻的字都出现），单个汉字和以 * 结尾的词用前缀匹配。
+    """
+    terms = []
+    for match in _QUERY_RE.finditer(unicodedata.normalize('NFKC', query or '')):
+        run, star = match.groups()
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                terms.append((run, True))
+            else:
+                terms.extend((run[i:i + 2], bool(star) and i == len(run) - 2) for i in range(len(run) - 1))
+        else:
+            terms.append((_fold(run), bool(star)))
+    # 去掉重复的词，保留顺序
+    return list(dict.fromkeys(terms))
+
+
+def document(article):
+    """文章各字段分词后的文本 {字段: "词 词 ..."}，article 可以是 Article 或同名字段的行"""
+    return {field: ' '.join(tokenize(getattr(article, field))) for field in FIELDS}
+
+
+def _fts5_query(terms):
+    return ' AND '.join(f'"{token}"' + ('*' if prefix else '') for token, prefix in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join(f"'{token}'" + (':*' if prefix else '') for token, prefix in terms)
+
+
+def create(conn):
+    """创建索引表（已存在时跳过），不支持的数据库返回 False"""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"{', '.join(FIELDS)}, tokenize='unicode61 remove_diacritics 2')"
+        ))
+    elif dialect == 'postgresql':
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+            f"article_id INTEGER PRIMARY KEY REFERENCES articles(id) ON DELETE CASCADE, "
+            f"document TSVECTOR NOT NULL)"
+        ))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_document ON {TABLE} USING GIN (document)"))
+    else:
+        logging.warning(f"全文检索不支持数据库 {dialect}，跳过创建索引")
+        return False
+    _available.pop(str(conn.engine.url), None)
+    return True
+
+
+def drop(conn):
+    """删除索引表（重置数据库前调用）"""
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    _available.pop(str(conn.engine.url), None)
+
+
+def available(session):
+    """当前数据库是否已经建立索引表（每个数据库只检查一次）"""
+    bind = session.get_bind()
+    key = str(bind.engine.url)
+    if key not in _available:
+        _available[key] = bind.dialect.name in ('sqlite', 'postgresql') and \
+            inspect(session.connection()).has_table(TABLE)
+    return _available[key]
+
+
+def _pg_document_sql():
+    """分好词的字段用 simple 配置转成带位置的 tsvector（没有位置的词 setweight 和排序都不起作用）"""
+    parts = [
+        f"setweight(to_tsvector('simple', :{field}), '{PG_WEIGHT_CLASSES[field]}')"
+        for field in FIELDS
+    ]
+    return ' || '.join(parts)
+
+
+def _pg_rank_weights():
+    """ts_rank 的 {D, C, B, A} 权重，与 SQLite 的 bm25 字段权重比例相同"""
+    by_class = {PG_WEIGHT_CLASSES[field]: WEIGHTS[field] / max(WEIGHTS.values()) for field in FIELDS}
+    defaults = {'D': 0.1, 'C': 0.2, 'B': 0.4, 'A': 1.0}
+    return '{' + ', '.join(str(by_class.get(weight_class, defaults[weight_class])) for weight_class in 'DCBA') + '}'
+
+
+def write_documents(session, documents, replace=True):
+    """写入或替换索引中的文章，documents 为 {article_id: document(...)}
+
+    replace=False 时不检查旧的行（重建索引时表已清空）
+    """
+    if not documents or not available(session):
+        return 0
+    rows = [{'article_id': article_id, **doc} for article_id, doc in documents.items()]
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # FTS5 没有 upsert，先删除旧的行
+        if replace:
+            session.execute(
+                text(f"DELETE FROM {TABLE} WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True)),
+                {'ids': list(documents)}
+            )
+        session.execute(text(
+            f"INSERT INTO {TABLE} (rowid, {', '.join(FIELDS)}) "
+            f"VALUES (:article_id, {', '.join(':' + field for field in FIELDS)})"
+        ), rows)
+    else:
+        session.execute(text(
+            f"INSERT INTO {TABLE} (article_id, document) VALUES (:article_id, {_pg_document_sql()}) "
+            f"ON CONFLICT (article_id) DO UPDATE SET document = EXCLUDED.document"
+        ), rows)
+    return len(rows)
+
+
+def index_articles(session, articles):
+    """把刚插入或更新的 Article 对象（已 flush，有ID）写入索引"""
+    return write_documents(session, {article.id: document(article) for article in articles})
+
+
+def reindex_ids(session, article_ids):
+    """从 articles 表读取并重新索引指定文章（保存翻译后调用）"""
+    article_ids = list(article_ids)
+    if not article_ids or not available(session):
+        return 0
+    columns = [getattr(Article, field) for field in FIELDS]
+    rows = session.execute(select(Article.id, *columns).where(Article.id.in_(article_ids))).all()
+    return write_documents(session, {row.id: document(row) for row in rows})
+
+
+def populate(conn, batch_size=REBUILD_BATCH_SIZE):
+    """清空并按ID分批重建索引（迁移和 --rebuild 使用），在调用方的事务中执行，返回索引的文章数"""
+    if not create(conn):
+        return 0
+    conn.execute(text(f"DELETE FROM {TABLE}"))
+    # write_documents 使用会话，绑定到同一个连接，在同一个事务中写入
+    session = Session(bind=conn)
+    columns = [getattr(Article, field) for field in FIELDS]
+    last_id = 0
+    total = 0
+    begin = time.monotonic()
+    while True:
+        rows = conn.execute(
+            select(Article.id, *columns)
+            .where(Article.id > last_id)
+            .order_by(Article.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        total += write_documents(session, {row.id: document(row) for row in rows}, replace=False)
+        last_id = rows[-1].id
+        logging.info(f"Indexed {total} articles ({total / (time.monotonic() - begin):.0f}/s)")
+    return total
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """清空并重建索引：按ID分批读取文章，不会一次性加载整个表"""
+    engine = get_engine()
+    with engine.begin() as conn:
+        total = populate(conn, batch_size)
+
+    if engine.dialect.name == 'sqlite':
+        # 合并 FTS5 的分段，查询更快
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')"))
+    elif engine.dialect.name == 'postgresql':
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level='AUTOCOMMIT').execute(text(f"VACUUM ANALYZE {TABLE}"))
+    return total
+
+
+def search(query, limit=20, offset=0, journal_id=None, session=None):
+    """按相关度返回匹配的文章 [{id, title, title_zh, journal, published_date, score}]
+
+    score 越大越相关；查询中没有可检索的词时返回空列表。
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    with session_scope(session) as scope:
+        dialect = scope.get_bind().dialect.name
+        if dialect == 'sqlite':
+            weights = ', '.join(str(WEIGHTS[field]) for field in FIELDS)
+            # bm25 越小越相关
+            matches = f"SELECT rowid AS article_id, -bm25({TABLE}, {weights}) AS score " \
+                      f"FROM {TABLE} WHERE {TABLE} MATCH :query"
+            params = {'query': _fts5_query(terms)}
+        elif dialect == 'postgresql':
+            matches = f"SELECT article_id, ts_rank(CAST(:weights AS float4[]), document, query) AS score " \
+                      f"FROM {TABLE}, CAST(:query AS tsquery) query WHERE document @@ query"
+            params = {'query': _tsquery(terms), 'weights': _pg_rank_weights()}
+        else:
+            raise NotImplementedError(f"全文检索不支持数据库: {dialect}")
+        if journal_id is None:
+            # 不按期刊过滤时在索引表上先取出前 limit + offset 条，只有这些行需要读取文章表
+            matches += f" ORDER BY score DESC LIMIT {int(limit) + int(offset)}"
+        matches = text(matches).bindparams(**params).columns(article_id=Integer, score=Float).subquery()
+
+        statement = (
+            select(Article.id, Article.title, Article.title_zh, Article.published_date,
+                   Journal.name.label('journal'), matches.c.score)
+            .join(matches, matches.c.article_id == Article.id)
+            .outerjoin(Journal, Journal.id == Article.journal_id)
+            .order_by(matches.c.score.desc(), Article.published_date.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        if journal_id is not None:
+            statement = statement.where(Article.journal_id == journal_id)
+        return [dict(row._mapping) for row in scope.execute(statement)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文章全文检索")
+    parser.add_argument('--rebuild', action='store_true', help="重建索引（分批读取所有文章）")
+    parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help="重建时每批的文章数")
+    parser.add_argument('--query', help="检索并输出结果")
+    parser.add_argument('--journal-id', type=int, help="只检索该期刊")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.rebuild:
+        begin = time.monotonic()
+        total = rebuild(args.batch_size)
+        logging.info(f"Rebuilt search index: {total} articles in {time.monotonic() - begin:.1f}s")
+    if args.query:
+        begin = time.monotonic()
+        results = search(args.query, limit=args.limit, journal_id=args.journal_id)
+        elapsed = (time.monotonic() - begin) * 1000
+        for row in results:
+            print(f"{row['score']:>8.3f}  {row['id']:>8}  [{row['journal']}] {row['title'][:80]}")
+            if row['title_zh']:
+                print(f"{'':>18}{row['title_zh'][:60]}")
+        print(f"{len(results)} results in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""导出静态网站（HTML 和 JSON）
+
+只读访问的部署可以直接用 nginx / CDN 提供导出的文件，不需要 Express 和数据库：
+
+    index.html / index.json                     最新的 HOME_SIZE 篇文章
+    archive/<年-月>.html / .json                 按月归档的全部文章
+    journals/<期刊ID>/index.html / .json         期刊最新文章和月份列表
+    journals/<期刊ID>/<年-月>.html / .json       期刊按月归档
+    articles/<文章ID>.html / .json               文章详情
+    manifest.json                               增量导出的状态
+
+按月分片的页面在新文章加入后不会整体移动，只有文章所在的月份页、期刊首页和首页需要重写。
+增量导出读取 article_listings.updated_at 晚于上次导出的文章（新入库或新翻译的），
+只重写受影响的页面；列表页内容没有变化时不写文件。所有文件先写临时文件再原子替换。
+
+    python static_export.py --output site
+    python static_export.py --output site --full --workers 8
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from html import escape
+
+from sqlalchemy import and_, select
+
+import db_session
+from db_models import Article, ArticleListing
+from db_session import get_engine, session_scope
+
+MANIFEST = 'manifest.json'
+MANIFEST_FORMAT = 1
+# 首页和期刊首页的文章数
+HOME_SIZE = 50
+# 并行导出时每个任务的文章数
+CHUNK_SIZE = 2000
+# 增量导出时回退的时间：导出开始前已开始、之后才提交的事务也会在下次导出时处理
+WATERMARK_LAG = timedelta(minutes=10)
+ALL = 'all'
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public')
+
+_LISTING_FIELDS = ('article_id', 'journal_id', 'journal_name', 'title', 'title_zh', 'summary', 'summary_zh')
+_DETAIL_FIELDS = ('volume', 'pages', 'authors', 'doi', 'link')
+
+
+def month_of(published_date):
+    return published_date.strftime('%Y-%m')
+
+
+def write_atomic(path, content):
+    """写入临时文件后替换，读取的一方不会看到写了一半的文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _layout(title, body):
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{escape(title)}</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
+    <link rel="stylesheet" href="/css/style.css">
+</head>
+<body>
+    <nav class="navbar navbar-expand-lg navbar-light bg-light">
+        <div class="container">
+            <a class="navbar-brand" href="/">Academic Articles</a>
+            <div class="language-switch">
+                <button class="btn btn-outline-primary btn-sm" id="langToggle">
+                    <span class="lang-text">EN</span>
+                </button>
+            </div>
+        </div>
+    </nav>
+
+    <div class="container mt-4">
+{body}
+    </div>
+
+    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
+    <script src="https://unpkg.com/masonry-layout@4/dist/masonry.pkgd.min.js"></script>
+    <script src="/js/main.js"></script>
+</body>
+</html>
+"""
+
+
+def _card(article):
+    return f"""        <div class="grid-item">
+            <div class="card">
+                <div class="card-body">
+                    <h5 class="card-title">
+                        <span class="title-en" style="display: none;">{escape(article['title'])}</span>
+                        <span class="title-zh">{escape(article['title_zh'] or article['title'])}</span>
+                        <a href="/articles/{article['article_id']}.html" class="stretched-link"></a>
+                    </h5>
+                    <h6 class="card-subtitle mb-2 text-muted">{escape(article['journal_name'] or '')}</h6>
+                    <p class="card-text">
+                        <span class="summary-en" style="display: none;">{escape(article['summary'] or '')}</span>
+                        <span class="summary-zh">{escape(article['summary_zh'] or article['summary'] or '')}</span>
+                    </p>
+                    <div class="card-footer bg-transparent">
+                        <small class="text-muted">Published: {article['published_date']:%Y-%m-%d}</small>
+                    </div>
+                </div>
+            </div>
+        </div>"""
+
+
+def _month_links(months, prefix):
+    if not months:
+        return ''
+    links = '\n'.join(
+        f'            <li class="page-item"><a class="page-link" href="{prefix}{month}.html">{month}</a></li>'
+        for month in sorted(months, reverse=True)
+    )
+    return f"""    <div class="pagination-container text-center mt-4">
+        <ul class="pagination flex-wrap justify-content-center">
+{links}
+        </ul>
+    </div>"""
+
+
+def render_listing(title, articles, months=None, month_prefix='/archive/'):
+    """列表页的 (HTML, JSON)"""
+    cards = '\n'.join(_card(article) for article in articles)
+    body = f"""    <h4 class="mb-3">{escape(title)}</h4>
+    <div class="grid">
+{cards}
+    </div>
+{_month_links(months, month_prefix)}"""
+    data = {
+        'title': title,
+        'articles': [
+            {**article, 'published_date': article['published_date'].isoformat(), 'url': f"/articles/{article['article_id']}.html"}
+            for article in articles
+        ],
+    }
+    if months is not None:
+        data['months'] = sorted(months, reverse=True)
+    return _layout(title, body), json.dumps(data, ensure_ascii=False)
+
+
+def render_article(article):
+    """文章详情页的 (HTML, JSON)"""
+    if article['link'] and article['link'].strip():
+        source = f'<a href="{escape(article["link"])}" target="_blank">View Article</a>'
+    elif article['doi'] and article['doi'].strip():
+        source = f'DOI: <a href="https://doi.org/{escape(article["doi"])}" target="_blank">{escape(article["doi"])}</a>'
+    else:
+        source = ''
+    journal = ''
+    if article['journal_id'] is not None:
+        journal = f'<a href="/journals/{article["journal_id"]}/">{escape(article["journal_name"] or "")}</a>'
+    body = f"""    <div class="article-container">
+        <div class="d-flex justify-content-between align-items-center mb-4">
+            <h1>
+                <span class="title-en" style="display: none;">{escape(article['title'])}</span>
+                <span class="title-zh">{escape(article['title_zh'] or article['title'])}</span>
+            </h1>
+        </div>
+        <div class="meta-info mb-4">
+            <p class="text-muted">
+                Published: {article['published_date']:%Y-%m-%d} | Journal: {journal} | {source}
+            </p>
+        </div>
+        <div class="article-content">
+            <p class="summary-en" style="display: none;">{escape(article['summary'] or '')}</p>
+            <p class="summary-zh">{escape(article['summary_zh'] or article['summary'] or '')}</p>
+        </div>
+    </div>"""
+    data = dict(article, published_date=article['published_date'].isoformat())
+    try:
+        data['authors'] = json.loads(article['authors']) if article['authors'] else []
+    except ValueError:
+        pass
+    return _layout(article['title'], body), json.dumps(data, ensure_ascii=False)
+
+
+def _listing_columns():
+    return [getattr(ArticleListing, field) for field in _LISTING_FIELDS] + [ArticleListing.published_date]
+
+
+def _rows(result):
+    return [dict(row._mapping) for row in result]
+
+
+class Exporter:
+    def __init__(self, output):
+        self.output = output
+
+    def path(self, relative):
+        return os.path.join(self.output, relative)
+
+    def write_page(self, relative, html, data, known_hashes=None):
+        """写入 <relative>.html 和 .json；known_hashes 中内容哈希相同时跳过，返回哈希"""
+        digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        if known_hashes is None or known_hashes.get(relative) != digest \
+                or not os.path.exists(self.path(f"{relative}.html")):
+            write_atomic(self.path(f"{relative}.html"), html)
+            write_atomic(self.path(f"{relative}.json"), data)
+        return digest
+
+    def export_articles(self, article_ids, session=None):
+        """导出文章详情页，返回导出的数量"""
+        columns = _listing_columns() + [getattr(Article, field) for field in _DETAIL_FIELDS]
+        count = 0
+        with session_scope(session) as scope:
+            for i in range(0, len(article_ids), 500):
+                rows = _rows(scope.execute(
+                    select(*columns)
+                    .join(Article, Article.id == ArticleListing.article_id)
+                    .where(ArticleListing.article_id.in_(article_ids[i:i + 500]))
+                ))
+                for article in rows:
+                    self.write_page(f"articles/{article['article_id']}", *render_article(article))
+                count += len(rows)
+        return count
+
+    def export_month(self, journal_id, month, known_hashes=None, session=None):
+        """导出一个月的归档（journal_id 为 None 时是全部期刊），返回 {页面: 哈希}"""
+        begin = datetime.strptime(month, '%Y-%m')
+        end = (begin + timedelta(days=32)).replace(day=1)
+        conditions = [ArticleListing.published_date >= begin, ArticleListing.published_date < end]
+        if journal_id is not None:
+            conditions.append(ArticleListing.journal_id == journal_id)
+        with session_scope(session) as scope:
+            articles = _rows(scope.execute(
+                select(*_listing_columns())
+                .where(and_(*conditions))
+                .order_by(ArticleListing.published_date.desc(), ArticleListing.article_id.desc())
+            ))
+        if journal_id is None:
+            relative, title = f"archive/{month}", f"Articles {month}"
+        else:
+            relative = f"journals/{journal_id}/{month}"
+            title = f"{articles[0]['journal_name'] if articles else journal_id} {month}"
+        return {relative: self.write_page(relative, *render_listing(title, articles), known_hashes)}
+
+    def export_home(self, journal_id, months, known_hashes=None, session=None):
+        """导出首页或期刊首页（最新 HOME_SIZE 篇和月份列表），返回 {页面: 哈希}"""
+        statement = select(*_listing_columns())
+        if journal_id is not None:
+            statement = statement.where(ArticleListing.journal_id == journal_id)
+        with session_scope(session) as scope:
+            articles = _rows(scope.execute(
+                statement
+                .order_by(ArticleListing.published_date.desc(), ArticleListing.article_id.desc())
+                .limit(HOME_SIZE)
+            ))
+        if journal_id is None:
+            relative, title, prefix = 'index', 'Academic Articles', '/archive/'
+        else:
+            relative = f"journals/{journal_id}/index"
+            title = articles[0]['journal_name'] if articles else str(journal_id)
+            prefix = f"/journals/{journal_id}/"
+        return {relative: self.write_page(relative, *render_listing(title, articles, months, prefix), known_hashes)}
+
+    def copy_static(self):
+        """复制网页用到的 css / js"""
+        for name in ('css', 'js'):
+            source = os.path.join(STATIC_DIR, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, self.path(name), dirs_exist_ok=True)
+
+    def load_manifest(self):
+        try:
+            with open(self.path(MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('format') != MANIFEST_FORMAT or manifest.get('home_size') != HOME_SIZE:
+            return None
+        return manifest
+
+    def save_manifest(self, manifest):
+        write_atomic(self.path(MANIFEST), json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True))
+
+
+def _init_worker(database_url):
+    db_session.set_database_url(database_url)
+
+
+def _articles_task(output, article_ids):
+    return Exporter(output).export_articles(article_ids)
+
+
+def _month_task(output, journal_id, month, known_hashes):
+    return Exporter(output).export_month(journal_id, month, known_hashes)
+
+
+def export(output, full=False, workers=1):
+    """导出静态网站，返回统计 {'articles': 数量, 'pages': 写入的列表页数, 'full': 是否全量}"""
+    db_session.ensure_schema()
+    exporter = Exporter(output)
+    manifest = None if full else exporter.load_manifest()
+    full = manifest is None
+    if full:
+        manifest = {'format': MANIFEST_FORMAT, 'home_size': HOME_SIZE, 'watermark': None, 'months': {}, 'pages': {}}
+        exporter.copy_static()
+    started = datetime.utcnow()
+    watermark = datetime.fromisoformat(manifest['watermark']) if manifest['watermark'] else None
+
+    # 变化的文章：全量导出时是全部文章
+    statement = select(ArticleListing.article_id, ArticleListing.journal_id, ArticleListing.published_date)
+    if watermark is not None:
+        statement = statement.where(ArticleListing.updated_at > watermark)
+    with session_scope() as session:
+        changed = session.execute(statement.order_by(ArticleListing.article_id)).all()
+
+    months = manifest['months']
+    dirty_months = set()
+    dirty_journals = set()
+    for _, journal_id, published_date in changed:
+        month = month_of(published_date)
+        keys = [ALL] if journal_id is None else [ALL, str(journal_id)]
+        for key in keys:
+            if month not in months.setdefault(key, []):
+                months[key].append(month)
+            dirty_months.add((key, month))
+        if journal_id is not None:
+            dirty_journals.add(journal_id)
+
+    article_ids = [row.article_id for row in changed]
+    chunks = [article_ids[i:i + CHUNK_SIZE] for i in range(0, len(article_ids), CHUNK_SIZE)]
+    known = manifest['pages']
+    pages = {}
+    # 只有少量文章变化时不值得启动进程池
+    if workers > 1 and len(chunks) > 1:
+        database_url = get_engine().url.render_as_string(hide_password=False)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(database_url,)) as pool:
+            article_futures = [pool.submit(_articles_task, output, chunk) for chunk in chunks]
+            month_futures = [
+                pool.submit(_month_task, output, None if key == ALL else int(key), month, known)
+                for key, month in dirty_months
+            ]
+            exported = sum(future.result() for future in article_futures)
+            for future in month_futures:
+                pages.update(future.result())
+    else:
+        exported = sum(exporter.export_articles(chunk) for chunk in chunks)
+        for key, month in dirty_months:
+            pages.update(exporter.export_month(None if key == ALL else int(key), month, known))
+
+    if changed or full:
+        pages.update(exporter.export_home(None, months.get(ALL, []), known))
+    for journal_id in dirty_journals:
+        pages.update(exporter.export_home(journal_id, months.get(str(journal_id), []), known))
+
+    written = sum(1 for relative, digest in pages.items() if known.get(relative) != digest)
+    known.update(pages)
+    manifest['watermark'] = (started - WATERMARK_LAG).isoformat()
+    manifest['built_at'] = started.isoformat(timespec='seconds')
+    exporter.save_manifest(manifest)
+    return {'articles': exported, 'pages': written, 'full': full}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出静态网站（HTML 和 JSON）")
+    parser.add_argument('--output', default='site', help="输出目录")
+    parser.add_argument('--full', action='store_true', help="忽略上次导出的状态，全部重新生成")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行导出的进程数")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    begin = time.monotonic()
+    result = export(args.output, full=args.full, workers=args.workers)
+    logging.info(
+        f"{'Full' if result['full'] else 'Incremental'} export to {args.output}: "
+        f"{result['articles']} articles, {result['pages']} listing pages written "
+        f"in {time.monotonic() - begin:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""自动关键词标签
+
+从标题和摘要（英文原文）中选出 TF-IDF 最高的 TOP_K 个词或词组写入 tags / article_tags。
+候选词是标题和摘要中的单词（去掉停用词和含数字的词），以及标题中相邻两个单词组成的词组。
+逆文档频率使用 tag_terms 表中的语料统计（包含每个词的文章数），入库时按批增量更新，不重新统计整个语料库。
+有 NumPy / SciPy 时一批文章用稀疏矩阵打分，否则使用纯 Python 的实现（结果相同，较慢）。
+
+    python tagger.py --rebuild               # 重新统计语料并给所有文章打标签
+    python tagger.py --article-id 123        # 输出文章的标签
+"""
+import argparse
+import heapq
+import logging
+import math
+import time
+from collections import Counter
+from functools import lru_cache
+
+from sqlalchemy import bindparam, delete, insert, select
+from sqlalchemy.orm import Session
+
+import search_index
+from db_models import Article, Tag, TagTerm, article_tags
+from db_session import get_engine, insert_ignore, insert_or_add, session_scope
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # 可选依赖
+    np = sparse = None
+
+# 每篇文章的标签数
+TOP_K = 5
+# 标题中的词按出现 TITLE_WEIGHT 次计
+TITLE_WEIGHT = 2
+# 至少出现在这么多篇文章中的词才能作为标签（只出现一次的多半是拼写或噪声）
+MIN_DOCUMENT_COUNT = 2
+# 出现在超过这个比例的文章中的词（期刊名、常见词）不作为标签
+MAX_DOCUMENT_RATIO = 0.2
+REBUILD_BATCH_SIZE = 5000
+LOOKUP_BATCH_SIZE = 500
+# 每条语料统计的 upsert 的词数（每个词两个绑定参数，低于 SQLite 的 32766 个参数上限）
+UPSERT_BATCH_SIZE = 5000
+# tag_terms 中保存文章总数的行
+CORPUS_KEY = ''
+WORD_LENGTH = (3, 40)
+# 比较分数时保留的小数位（两种实现的浮点误差不影响分数相同时的顺序）
+SCORE_DIGITS = 9
+
+STOP_WORDS = frozenset("""
+a about above across after again against all almost along also although always among an and another any are
+around as at based be because been before being below between both but by can could did do does done due during
+each either et etc few for from further had has have having here how however if in into is it its itself just
+least less like many may might more most much must near neither no nor not now of off often on once one only or
+other others our out over own per rather same several should since so some such than that the their them then
+there these they this those through thus to too two under until up upon use used uses using very via was we were
+what when where whether which while who whom whose why will with within without would yet
+paper study studies result results method methods approach proposed propose present presented show shows shown
+new novel different various however therefore furthermore moreover respectively compared including performance
+analysis data model models based first second three high higher low lower large well effect effects use
+""".split())
+
+_NAME_LENGTH = Tag.__table__.c.name.type.length
+
+
+@lru_cache(maxsize=1 << 18)
+def _keep(word):
+    return (WORD_LENGTH[0] <= len(word) <= WORD_LENGTH[1] and word not in STOP_WORDS
+            and not any(char.isdigit() for char in word))
+
+
+def candidates(title, summary):
+    """文章的候选词 -> 词频"""
+    counts = Counter()
+    title_words = search_index.tokenize(title)
+    kept = [_keep(word) for word in title_words]
+    for word, keep in zip(title_words, kept):
+        if keep:
+            counts[word] += TITLE_WEIGHT
+    for i in range(len(title_words) - 1):
+        if kept[i] and kept[i + 1] and title_words[i] != title_words[i + 1]:
+            counts[f"{title_words[i]} {title_words[i + 1]}"] += TITLE_WEIGHT
+    counts.update(word for word in search_index.tokenize(summary) if _keep(word))
+    return counts
+
+
+def _max_document_count(corpus_size):
+    return max(MAX_DOCUMENT_RATIO * corpus_size, MIN_DOCUMENT_COUNT)
+
+
+def _pick(scored, top_k):
+    """按分数从高到低选出标签，选中词组后不再单独选其中的单词"""
+    chosen = []
+    for term in scored:
+        words = term.split(' ')
+        if len(words) == 1 and any(term in other.split(' ') for other in chosen if ' ' in other):
+            continue
+        if len(words) > 1:
+            chosen = [other for other in chosen if other not in words]
+        chosen.append(term)
+        if len(chosen) == top_k:
+            break
+    return chosen
+
+
+def _score_numpy(documents, document_counts, corpus_size, top_k):
+    vocabulary = {}
+    indices = []
+    counts = []
+    indptr = [0]
+    for document in documents:
+        for term, count in document.items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            counts.append(count)
+        indptr.append(len(indices))
+    if not vocabulary:
+        return [[] for _ in documents]
+    terms = list(vocabulary)
+    df = np.fromiter((document_counts.get(term, 0) for term in terms), dtype=np.float64, count=len(terms))
+    idf = np.log((1 + corpus_size) / (1 + df)) + 1
+    idf[(df < MIN_DOCUMENT_COUNT) | (df > _max_document_count(corpus_size))] = 0
+
+    matrix = sparse.csr_matrix(
+        (np.log(np.asarray(counts, dtype=np.float64)) + 1, np.asarray(indices), np.asarray(indptr)),
+        shape=(len(documents), len(terms))
+    )
+    matrix = (matrix @ sparse.diags(idf)).tocsr()
+    matrix.eliminate_zeros()
+
+    # 每行按分数倒序（分数相同时按词排序），取前 2 * top_k 个（_pick 可能去掉一部分）
+    rows = np.repeat(np.arange(len(documents)), np.diff(matrix.indptr))
+    term_ranks = np.empty(len(terms), dtype=np.int64)
+    term_ranks[np.argsort(np.array(terms))] = np.arange(len(terms))
+    order = np.lexsort((term_ranks[matrix.indices], -np.round(matrix.data, SCORE_DIGITS), rows))
+    ranks = np.arange(len(order)) - matrix.indptr[rows[order]]
+    order = order[ranks < 2 * top_k]
+    best = [[] for _ in documents]
+    for row, column in zip(rows[order].tolist(), matrix.indices[order].tolist()):
+        best[row].append(terms[column])
+    return [_pick(scored, top_k) for scored in best]
+
+
+def _score_python(documents, document_counts, corpus_size, top_k):
+    max_count = _max_document_count(corpus_size)
+    tags = []
+    for document in documents:
+        scores = {}
+        for term, count in document.items():
+            df = document_counts.get(term, 0)
+            if MIN_DOCUMENT_COUNT <= df <= max_count:
+                scores[term] = (math.log(count) + 1) * (math.log((1 + corpus_size) / (1 + df)) + 1)
+        best = heapq.nsmallest(2 * top_k, scores.items(), key=lambda item: (-round(item[1], SCORE_DIGITS), item[0]))
+        tags.append(_pick([term for term, _ in best], top_k))
+    return tags
+
+
+def score(documents, document_counts, corpus_size, top_k=TOP_K):
+    """[candidates(...)] -> 每篇文章的标签列表"""
+    if np is not None:
+        return _score_numpy(documents, document_counts, corpus_size, top_k)
+    return _score_python(documents, document_counts, corpus_size, top_k)
+
+
+def _add_statistics(session, document_counts, corpus_size):
+    """增加语料统计，返回更新后的 {词: 文章数}（包括 CORPUS_KEY）
+
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING 按 insertmanyvalues 合并成多行的 VALUES，
+    每 UPSERT_BATCH_SIZE 个词一条语句（入库的一批文章通常只需要一条），不用再查询一次统计。
+    按词排序避免并发事务死锁。
+    """
+    rows = [{'term': term, 'document_count': count} for term, count in sorted(document_counts.items())]
+    rows.insert(0, {'term': CORPUS_KEY, 'document_count': corpus_size})
+    statement = insert_or_add(session.get_bind().dialect.name, TagTerm, 'term', 'document_count').returning(
+        TagTerm.term, TagTerm.document_count)
+    return dict(session.execute(
+        statement.execution_options(insertmanyvalues_page_size=UPSERT_BATCH_SIZE), rows
+    ).all())
+
+
+def document_counts(session, terms):
+    """{词: 文章数}，包括 CORPUS_KEY"""
+    terms = [CORPUS_KEY] + list(terms)
+    statement = select(TagTerm.term, TagTerm.document_count).where(
+        TagTerm.term.in_(bindparam('terms', expanding=True)))
+    counts = {}
+    for i in range(0, len(terms), LOOKUP_BATCH_SIZE):
+        counts.update(session.execute(statement, {'terms': terms[i:i + LOOKUP_BATCH_SIZE]}).all())
+    return counts
+
+
+def _write_tags(session, tagged):
+    """写入 {article_id: [标签名]}，不存在的标签先批量插入"""
+    names = sorted({name[:_NAME_LENGTH] for tags in tagged.values() for name in tags})
+    if not names:
+        return 0
+    session.execute(insert_ignore(session.get_bind().dialect.name, Tag), [{'name': name} for name in names])
+    statement = select(Tag.name, Tag.id).where(Tag.name.in_(bindparam('names', expanding=True)))
+    ids = {}
+    for i in range(0, len(names), LOOKUP_BATCH_SIZE):
+        ids.update(session.execute(statement, {'names': names[i:i + LOOKUP_BATCH_SIZE]}).all())
+    rows = [
+        {'article_id': article_id, 'tag_id': ids[name[:_NAME_LENGTH]]}
+        for article_id, tags in tagged.items() for name in tags
+    ]
+    if rows:
+        session.execute(insert(article_tags), rows)
+    return len(rows)
+
+
+def tag_articles(session, articles, top_k=TOP_K):
+    """给刚插入的 Article 对象（已 flush，有ID）打标签，并把它们加入语料统计"""
+    if not articles:
+        return 0
+    documents = [candidates(article.title, article.summary) for article in articles]
+    batch_counts = Counter()
+    for document in documents:
+        batch_counts.update(document.keys())
+    # 返回的统计已包含本批文章
+    counts = _add_statistics(session, batch_counts, len(documents))
+    corpus_size = counts.pop(CORPUS_KEY, len(documents))
+    tags = score(documents, counts, corpus_size, top_k)
+    return _write_tags(session, {article.id: names for article, names in zip(articles, tags)})
+
+
+def _batches(conn, batch_size):
+    """按ID分批读取 (id, title, summary)"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(Article.id, Article.title, Article.summary)
+            .where(Article.id > last_id)
+            .order_by(Article.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+
+
+def populate(conn, batch_size=REBUILD_BATCH_SIZE, top_k=TOP_K):
+    """清空自动标签，重新统计整个语料后给所有文章打标签（迁移和 --rebuild 使用）
+
+    在调用方的事务中执行，两遍读取，内存只保存词表。返回写入的文章标签数。
+    """
+    conn.execute(delete(article_tags))
+    conn.execute(delete(TagTerm))
+    # 写入统计和标签的函数使用会话，绑定到同一个连接
+    session = Session(bind=conn)
+
+    begin = time.monotonic()
+    document_counts = Counter()
+    corpus_size = 0
+    for rows in _batches(conn, batch_size):
+        for row in rows:
+            document_counts.update(candidates(row.title, row.summary).keys())
+        corpus_size += len(rows)
+        logging.info(f"Counted terms in {corpus_size} articles ({corpus_size / (time.monotonic() - begin):.0f}/s)")
+    _add_statistics(session, document_counts, corpus_size)
+    logging.info(f"Corpus statistics: {len(document_counts)} terms")
+
+    begin = time.monotonic()
+    tagged = 0
+    total = 0
+    for rows in _batches(conn, batch_size):
+        documents = [candidates(row.title, row.summary) for row in rows]
+        tags = score(documents, document_counts, corpus_size, top_k)
+        total += _write_tags(session, {row.id: names for row, names in zip(rows, tags)})
+        tagged += len(rows)
+        logging.info(f"Tagged {tagged} articles ({tagged / (time.monotonic() - begin):.0f}/s)")
+    return total
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE, top_k=TOP_K):
+    """清空自动标签，重新统计整个语料后给所有文章打标签"""
+    with get_engine().begin() as conn:
+        return populate(conn, batch_size, top_k)
+
+
+def tags_of(article_ids, session=None):
+    """{文章ID: [标签名, ...]}"""
+    article_ids = list(article_ids)
+    result = {article_id: [] for article_id in article_ids}
+    if not article_ids:
+        return result
+    with session_scope(session) as scope:
+        rows = scope.execute(
+            select(article_tags.c.article_id, Tag.name)
+            .join(Tag, Tag.id == article_tags.c.tag_id)
+            .where(article_tags.c.article_id.in_(article_ids))
+        )
+        for article_id, name in rows:
+            result[article_id].append(name)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动关键词标签")
+    parser.add_argument('--rebuild', action='store_true', help="重新统计语料并给所有文章打标签")
+    parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help="每批的文章数")
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="每篇文章的标签数")
+    parser.add_argument('--article-id', type=int, action='append', help="输出文章的标签")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    if args.rebuild:
+        if np is None:
+            logging.warning("NumPy / SciPy 未安装，使用纯 Python 的实现")
+        begin = time.monotonic()
+        total = rebuild(args.batch_size, args.top_k)
+        logging.info(f"Rebuilt tags: {total} article tags in {time.monotonic() - begin:.1f}s")
+    if args.article_id:
+        for article_id, names in tags_of(args.article_id).items():
+            print(f"{article_id:>8}  {', '.join(names)}")
+
+
+if __name__ == "__main__":
+    main()
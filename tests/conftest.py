@@ -0,0 +1,77 @@
+"""测试共用的数据库
+
+默认使用临时目录中的 SQLite 库；设置 RSS2WEB_TEST_POSTGRES_URL 时同样的测试也在 PostgreSQL 上运行
+（必须是可以清空的测试库，测试结束后会删除所有表）。
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RSS2WEB_OPENAI_API_KEY', 'test')
+
+import db_session  # noqa: E402
+import search_index  # noqa: E402
+from db_models import Base  # noqa: E402
+
+POSTGRES_URL = os.environ.get('RSS2WEB_TEST_POSTGRES_URL')
+
+
+def _reset():
+    engine = db_session.get_engine()
+    with engine.begin() as conn:
+        search_index.drop(conn)
+        conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database(request, tmp_path):
+    """切换到空的测试库并建好所有表，返回数据库类型"""
+    original = db_session.DATABASE_URL
+    if request.param == 'sqlite':
+        url = f"sqlite:///{tmp_path / 'test.db'}"
+    elif POSTGRES_URL:
+        url = POSTGRES_URL
+    else:
+        pytest.skip("没有设置 RSS2WEB_TEST_POSTGRES_URL")
+    db_session.set_database_url(url)
+    search_index._available.clear()
+    if request.param == 'postgresql':
+        _reset()
+    db_session.ensure_schema()
+    yield request.param
+    if request.param == 'postgresql':
+        _reset()
+    db_session.set_database_url(original)
+    search_index._available.clear()
+
+
+def article(doi, title, summary, **fields):
+    """入库用的文章数据（与 RSSManager.build_article_data 的格式相同）"""
+    return {
+        'title': title,
+        'raw_title': title,
+        'authors': fields.pop('authors', []),
+        'link': f"https://example.com/{doi}",
+        'published': fields.pop('published', '2024-01-01'),
+        'summary': summary,
+        'doi': doi,
+        'volume': '',
+        'pages': '',
+        **fields,
+    }
+
+
+@pytest.fixture
+def ingest(database):
+    """ingest([article(...), ...]) 入库到同一个期刊，返回新文章的ID"""
+    from db_operations import DatabaseManager
+    manager = DatabaseManager()
+    journal_id = manager.get_or_create_journal('Test Journal', 'https://example.com/rss')
+
+    def add(entries):
+        return manager.add_articles_batch([{**entry, 'journal_id': journal_id} for entry in entries])
+    return add
@@ -0,0 +1,141 @@
+// 路由的冒烟测试：用假的 db 模块替换数据库，检查首页和文章详情页能渲染模板
+// 运行：npm test（node --test tests/）
+const test = require('node:test');
+const assert = require('node:assert');
+const path = require('path');
+const ejs = require('ejs');
+
+const article = {
+    id: 1, title: 'Title', title_zh: '标题', summary: 'Summary', summary_zh: '摘要',
+    journal_name: 'Remote Sensing', published_date: new Date('2024-01-01'), link: '', doi: '10.1/x'
+};
+
+let relatedQuery = async () => ({ rows: [{ id: 2, title: 'Related', title_zh: null }] });
+
+// 列表快照：id 越大越新，每行的 cursor_date 与 PostgreSQL 的 published_date::text 格式相同
+const listingRows = [5, 4, 3, 2, 1].map(id => ({
+    id, journal_id: 1, journal_name: 'Remote Sensing', published_date: new Date(`2024-01-0${id}`),
+    cursor_date: `2024-01-0${id} 00:00:00`, title: `Title ${id}`, title_zh: null, summary: 'Summary', summary_zh: null
+}));
+const queries = [];
+
+function listingQuery(sql, params) {
+    let rows = listingRows.slice();
+    const keyset = sql.match(/\(published_date, article_id\) ([<>])/);
+    if (keyset) {
+        const [date, id] = params.slice(-3, -1);
+        const key = Date.parse(date.replace(' ', 'T')) * 1000 + id;
+        rows = rows.filter(r => {
+            const rowKey = Date.parse(r.cursor_date.replace(' ', 'T')) * 1000 + r.id;
+            return keyset[1] === '<' ? rowKey < key : rowKey > key;
+        });
+    }
+    if (sql.includes('ASC')) rows.reverse();
+    return { rows: rows.slice(0, params[params.length - 1]) };
+}
+
+require.cache[require.resolve('../db')] = {
+    id: require.resolve('../db'),
+    filename: require.resolve('../db'),
+    loaded: true,
+    exports: {
+        query: async (sql, params) => {
+            queries.push(sql);
+            if (sql.includes('FROM article_listings')) return listingQuery(sql, params);
+            if (sql.includes('FROM listing_counts')) return { rows: [{ total: '5' }] };
+            if (sql.includes('related_articles')) return relatedQuery(sql, params);
+            if (sql.includes('FROM comments')) return { rows: [] };
+            if (sql.includes('WHERE a.id = $1')) return { rows: params[0] === '1' ? [article] : [] };
+            return { rows: [] };
+        }
+    }
+};
+
+const router = require('../routes/index');
+
+function handler(routePath) {
+    const layer = router.stack.find(l => l.route && l.route.path === routePath && l.route.methods.get);
+    return layer.route.stack[0].handle;
+}
+
+async function get(routePath, params, query = {}) {
+    const res = {
+        statusCode: 200,
+        status(code) { this.statusCode = code; return this; },
+        send(body) { this.body = body; return this; },
+        render(view, locals) { this.view = view; this.locals = locals; return this; }
+    };
+    await handler(routePath)({ params, query }, res);
+    return res;
+}
+
+function renderView(view, locals) {
+    return ejs.renderFile(path.join(__dirname, '..', 'views', `${view}.ejs`), locals);
+}
+
+test('article page renders with related articles', async () => {
+    const res = await get('/articles/:id', { id: '1' });
+    assert.strictEqual(res.statusCode, 200);
+    assert.strictEqual(res.view, 'article');
+    assert.deepStrictEqual(res.locals.related.map(r => r.id), [2]);
+    const html = await renderView(res.view, res.locals);
+    assert.match(html, /Related Articles/);
+    assert.match(html, /href="\/articles\/2"/);
+});
+
+test('article page renders when related_articles does not exist', async () => {
+    relatedQuery = async () => { throw new Error('relation "related_articles" does not exist'); };
+    try {
+        const res = await get('/articles/:id', { id: '1' });
+        assert.strictEqual(res.statusCode, 200);
+        assert.deepStrictEqual(res.locals.related, []);
+        const html = await renderView(res.view, res.locals);
+        assert.doesNotMatch(html, /Related Articles/);
+    } finally {
+        relatedQuery = async () => ({ rows: [] });
+    }
+});
+
+test('missing article returns 404', async () => {
+    const res = await get('/articles/:id', { id: '999' });
+    assert.strictEqual(res.statusCode, 404);
+});
+
+test('home page pages through the listing snapshot with cursors', async () => {
+    queries.length = 0;
+    const first = await get('/', {});
+    assert.strictEqual(first.statusCode, 200);
+    assert.deepStrictEqual(first.locals.articles.map(a => a.id), [5, 4, 3, 2, 1]);
+    assert.strictEqual(first.locals.pagination.total, 5);
+    assert.ok(queries.every(sql => !/OFFSET|COUNT\(/i.test(sql)));
+    const html = await renderView(first.view, { ...first.locals, body: '' });
+    assert.match(html, /5 articles/);
+});
+
+test('cursors move to older and newer pages', async () => {
+    const listings = require('../listings');
+    const db = require('../db');
+    const first = await listings.page(db, { limit: 2 });
+    assert.deepStrictEqual(first.articles.map(a => a.id), [5, 4]);
+    assert.strictEqual(first.prev, null);
+    const second = await listings.page(db, { limit: 2, after: first.next });
+    assert.deepStrictEqual(second.articles.map(a => a.id), [3, 2]);
+    const back = await listings.page(db, { limit: 2, before: second.prev });
+    assert.deepStrictEqual(back.articles.map(a => a.id), [5, 4]);
+    const last = await listings.page(db, { limit: 2, after: second.next });
+    assert.deepStrictEqual(last.articles.map(a => a.id), [1]);
+    assert.strictEqual(last.next, null);
+});
+
+test('cursor format matches listings.py', () => {
+    const listings = require('../listings');
+    // python: listings.encode_cursor(datetime(2024, 1, 2), 7)
+    assert.deepStrictEqual(listings.decodeCursor('MjAyNC0wMS0wMlQwMDowMDowMHw3'), ['2024-01-02T00:00:00', 7]);
+    assert.strictEqual(listings.encodeCursor('2024-01-02 00:00:00', 7), 'MjAyNC0wMS0wMiAwMDowMDowMHw3');
+    assert.throws(() => listings.decodeCursor('bm90IGEgY3Vyc29y'), /Invalid cursor/);
+});
+
+test('invalid cursor returns 400', async () => {
+    const res = await get('/', {}, { after: 'garbage' });
+    assert.strictEqual(res.statusCode, 400);
+});
@@ -0,0 +1,81 @@
+"""作者名的规范化、拆分和迁移 9 的转换"""
+import pytest
+from sqlalchemy import delete, func, select
+
+import authors
+import db_session
+import migrations
+from conftest import article
+from db_models import Author, article_authors
+from db_session import session_scope
+
+
+def test_normalize_name():
+    assert authors.normalize_name("  Jane  Smith, ") == ("Jane Smith", "jane smith")
+    # NFKC：全角字符转为半角
+    assert authors.normalize_name("ＪＡＮＥ Smith") == ("JANE Smith", "jane smith")
+    assert authors.normalize_name(" ,; ") is None
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ("Jane Smith, John Doe and Li Wei", ["Jane Smith", "John Doe", "Li Wei"]),
+    ("Jane Smith; John Doe", ["Jane Smith", "John Doe"]),
+    ("Jane Smith and John Doe", ["Jane Smith", "John Doe"]),
+    # 姓和名缩写之间的逗号不是作者之间的分隔
+    ("Smith, J.", ["Smith, J."]),
+    ("Jane Smith", ["Jane Smith"]),
+])
+def test_split(raw, expected):
+    assert authors._split(raw) == expected
+
+
+def test_author_names_from_json_and_feedparser():
+    stored = '[{"name": "Jane Smith, John Doe"}, {"name": "jane  smith"}, {"name": ""}]'
+    assert authors.author_names(stored) == [("Jane Smith", "jane smith"), ("John Doe", "john doe")]
+    assert authors.author_names([{'name': "Li Wei"}, "Ana Lopez"]) == [("Li Wei", "li wei"), ("Ana Lopez", "ana lopez")]
+    assert authors.author_names("not json") == []
+    assert authors.author_names(None) == []
+
+
+def test_ingest_interns_authors(ingest):
+    first, second = ingest([
+        article('10.1/a', "A", "Summary", authors=[{'name': "Jane Smith, John Doe"}]),
+        article('10.1/b', "B", "Summary", authors=[{'name': "JOHN DOE"}, {'name': "Li Wei"}]),
+    ])
+    with session_scope() as session:
+        assert session.query(Author).count() == 3
+    assert authors.authors_of([first, second]) == {first: ["Jane Smith", "John Doe"], second: ["John Doe", "Li Wei"]}
+    assert [row['id'] for row in authors.articles_by_author("john doe")] == [second, first]
+
+
+def test_rolled_back_authors_are_not_cached(ingest):
+    authors.CACHE.clear()
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            authors.author_ids(session, {'ghost author': "Ghost Author"})
+            raise RuntimeError("rollback")
+    assert authors.CACHE.get('ghost author') is None
+    # 之后入库同名作者时重新插入，不会使用不存在的ID
+    [article_id] = ingest([article('10.1/a', "A", "Summary", authors=[{'name': "Ghost Author"}])])
+    assert authors.authors_of([article_id]) == {article_id: ["Ghost Author"]}
+
+
+def test_migration_9_converts_existing_author_lists(ingest):
+    ids = ingest([
+        article('10.1/a', "A", "Summary", authors=[{'name': "Jane Smith, John Doe"}]),
+        article('10.1/b', "B", "Summary", authors=[{'name': "John Doe"}]),
+    ])
+    expected = authors.authors_of(ids)
+    # 升级之前的库只有 articles.authors
+    with db_session.get_engine().begin() as conn:
+        conn.execute(delete(article_authors))
+        conn.execute(delete(Author))
+    with db_session.get_engine().begin() as conn:
+        migrations.create_authors(conn)
+    assert authors.authors_of(ids) == expected
+
+    # 重复执行不会重复关联
+    with db_session.get_engine().begin() as conn:
+        migrations.create_authors(conn)
+        assert conn.execute(select(func.count()).select_from(article_authors)).scalar() == 3
+        assert conn.execute(select(func.count()).select_from(Author)).scalar() == 2
@@ -0,0 +1,75 @@
+"""backfill：按ID顺序重新解析，进度保存在 backfill_progress 中，中断后继续"""
+import pytest
+
+import backfill
+from conftest import article
+from db_models import Article, ArticleListing, BackfillProgress
+from db_session import session_scope
+
+ARTICLES = 5
+
+
+@pytest.fixture
+def old_titles(ingest):
+    """旧的解析没有去掉“期刊, Vol. X, Pages Y: ”前缀的文章"""
+    entries = []
+    for i in range(ARTICLES):
+        raw = f"Remote Sensing, Vol. 16, Pages {100 + i}: Glacier study {i}"
+        entries.append(article(f"10.1/{i}", raw, "Summary.", raw_title=raw))
+    return ingest(entries)
+
+
+def titles(model=Article, key='id'):
+    with session_scope() as session:
+        return [row.title for row in session.query(model).order_by(getattr(model, key))]
+
+
+def progress():
+    with session_scope() as session:
+        row = session.get(BackfillProgress, 'parse_title')
+        return row.last_id, row.processed, row.changed, row.finished_at
+
+
+def test_resumes_after_an_interruption(old_titles, monkeypatch):
+    write = backfill._write
+    calls = []
+
+    def crash_on_second_batch(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return write(*args)
+    with monkeypatch.context() as patch:
+        patch.setattr(backfill, '_write', crash_on_second_batch)
+        with pytest.raises(KeyboardInterrupt):
+            backfill.run('parse_title', workers=0, batch_size=2)
+
+    last_id, processed, changed, finished_at = progress()
+    assert (last_id, processed, changed, finished_at) == (old_titles[1], 2, 2, None)
+    assert titles()[:3] == ["Glacier study 0", "Glacier study 1", "Remote Sensing, Vol. 16, Pages 102: Glacier study 2"]
+
+    # 只处理上次之后的文章
+    assert backfill.run('parse_title', workers=0, batch_size=2) == (ARTICLES - 2, ARTICLES - 2)
+    expected = [f"Glacier study {i}" for i in range(ARTICLES)]
+    assert titles() == expected
+    # 列表快照同步更新
+    assert titles(ArticleListing, 'article_id') == expected
+    last_id, processed, changed, finished_at = progress()
+    assert (last_id, processed, changed) == (old_titles[-1], ARTICLES, ARTICLES)
+    assert finished_at is not None
+
+    # 完成后不再执行，除非 restart
+    assert backfill.run('parse_title', workers=0) == (0, 0)
+    assert backfill.run('parse_title', workers=0, restart=True) == (ARTICLES, 0)
+
+
+def test_dry_run_does_not_write(old_titles):
+    assert backfill.run('parse_title', workers=0, dry_run=True) == (ARTICLES, ARTICLES)
+    assert titles()[0].startswith("Remote Sensing")
+    with session_scope() as session:
+        assert session.get(BackfillProgress, 'parse_title') is None
+
+
+def test_worker_processes_give_the_same_result(old_titles):
+    assert backfill.run('parse_title', workers=2, batch_size=2) == (ARTICLES, ARTICLES)
+    assert titles() == [f"Glacier study {i}" for i in range(ARTICLES)]
@@ -0,0 +1,92 @@
+"""条件请求（ETag / Last-Modified）和内容哈希：没有变化的源不解析"""
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.synthetic_feeds import generate_feed
+from feed_fetcher import AsyncFeedFetcher
+
+ETAG = '"v1"'
+LAST_MODIFIED = 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+def run_cycles(manager, cycles):
+    """启动本地源，按 cycles 中每一轮的服务器设置各抓取一次（每轮前读取持久化的抓取状态）
+
+    返回 (每轮的结果, 源的期刊ID, 服务器收到的请求头)
+    """
+    requests = []
+    server_state = {}
+
+    async def handler(request):
+        requests.append(dict(request.headers))
+        headers = {}
+        if server_state['conditional']:
+            if request.headers.get('If-None-Match') == ETAG:
+                return web.Response(status=304)
+            headers = {'ETag': ETAG, 'Last-Modified': LAST_MODIFIED}
+        return web.Response(body=server_state['content'], headers=headers, content_type='application/rdf+xml')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/rss/feed', handler)
+        async with TestServer(app) as server, AsyncFeedFetcher() as fetcher:
+            url = str(server.make_url('/rss/feed'))
+            journal_ids = await asyncio.to_thread(manager.resolve_journals, [url])
+            outcomes = []
+            for settings in cycles:
+                server_state.update(settings)
+                states = await asyncio.to_thread(manager.db_manager.get_feed_states, journal_ids.values())
+                result = await manager.update_journals_async([url], journal_ids, states, fetcher)
+                outcomes.append(result[url])
+            return outcomes, journal_ids[url]
+
+    outcomes, journal_id = asyncio.run(main())
+    return outcomes, journal_id, requests
+
+
+def test_not_modified_and_unchanged_feeds_are_not_parsed(database, monkeypatch):
+    from rss_scheduler import RSSManager
+    manager = RSSManager()
+    parsed = []
+    process_content = manager.process_content
+
+    def recording_process_content(url, content, *args):
+        parsed.append(content)
+        return process_content(url, content, *args)
+    monkeypatch.setattr(manager, 'process_content', recording_process_content)
+
+    first = generate_feed(5, 0)
+    second = generate_feed(6, 0)
+    outcomes, journal_id, requests = run_cycles(manager, [
+        {'conditional': True, 'content': first},    # 第一次抓取
+        {'conditional': True, 'content': first},    # 带 If-None-Match，返回 304
+        {'conditional': False, 'content': first},   # 服务器不支持条件请求，内容哈希相同
+        {'conditional': False, 'content': second},  # 内容变化
+    ])
+
+    assert outcomes == [5, 0, 0, 1]
+    assert parsed == [first, second]
+    assert 'If-None-Match' not in requests[0]
+    assert requests[1]['If-None-Match'] == ETAG
+    assert requests[1]['If-Modified-Since'] == LAST_MODIFIED
+    # 没有新的验证器时保留原来的 ETag
+    assert manager.db_manager.get_feed_states([journal_id])[journal_id]['etag'] == ETAG
+
+
+def test_failed_processing_does_not_record_the_content_hash(database, monkeypatch):
+    from rss_scheduler import RSSManager
+    manager = RSSManager()
+    content = generate_feed(5, 0)
+
+    def failing_insert(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+    with monkeypatch.context() as patch:
+        patch.setattr(manager.db_manager, 'add_articles_batch', failing_insert)
+        outcomes, _, _ = run_cycles(manager, [{'conditional': False, 'content': content}])
+    assert outcomes == [None]
+
+    # 上次处理失败，没有记录内容哈希，同样的内容会重新处理
+    outcomes, _, _ = run_cycles(manager, [{'conditional': False, 'content': content}])
+    assert outcomes == [5]
@@ -0,0 +1,69 @@
+"""进程内共享的引擎、会话工厂和事务范围"""
+import threading
+
+import pytest
+
+import db_session
+from conftest import article
+from db_models import Journal
+from db_session import get_engine, get_session_factory, session_scope
+
+
+def journal_names():
+    with session_scope() as session:
+        return [journal.name for journal in session.query(Journal).order_by(Journal.id)]
+
+
+def test_engine_and_session_factory_are_shared(database):
+    from db_operations import DatabaseManager
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(get_engine())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(engine is get_engine() for engine in engines)
+    manager = DatabaseManager()
+    assert manager.engine is get_engine()
+    assert manager.Session is get_session_factory()
+
+
+def test_forked_process_gets_its_own_engine(database, monkeypatch):
+    parent = get_engine()
+    monkeypatch.setattr(db_session.os, 'getpid', lambda: -1)
+    child = get_engine()
+    assert child is not parent
+    assert get_engine() is child
+    assert child.url == parent.url
+
+
+def test_session_scope_commits_or_rolls_back(database):
+    with session_scope() as session:
+        session.add(Journal(name='Committed', rss_url='https://example.com/a'))
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            session.add(Journal(name='Rolled back', rss_url='https://example.com/b'))
+            session.flush()
+            raise RuntimeError("failed")
+    assert journal_names() == ['Committed']
+
+
+def test_nested_scopes_share_the_outer_transaction(ingest):
+    from db_operations import DatabaseManager
+    manager = DatabaseManager()
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            manager.get_or_create_journal('Inner', 'https://example.com/inner', session=session)
+            raise RuntimeError("failed after the inner call")
+    # 内层的操作没有单独提交
+    assert 'Inner' not in journal_names()
+
+
+def test_pool_metrics_count_checkouts(ingest):
+    before = db_session.pool_status()['checkouts']
+    ingest([article('10.1/a', "Title", "Summary")])
+    with session_scope() as session:
+        session.query(Journal).count()
+    status = db_session.pool_status()
+    assert status['checkouts'] > before
+    assert status['checkins'] <= status['checkouts']
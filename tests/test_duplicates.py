@@ -0,0 +1,56 @@
+import pytest
+
+import duplicates
+from conftest import article
+from db_models import Article
+from db_session import session_scope
+
+SUMMARY = (
+    "We map land cover change across the Yangtze River basin from 2000 to 2020 using Landsat time series, "
+    "a random forest classifier and a temporal consistency filter. Cropland decreased while built-up land "
+    "expanded around the major cities, and the accuracy of the maps exceeds ninety percent in every year."
+)
+# 更正版本：改了一个词，DOI 不同
+CORRECTED = SUMMARY.replace("ninety", "eighty")
+OTHER = (
+    "Soil moisture retrieval from Sentinel-1 radar backscatter is improved by a change detection method "
+    "that accounts for vegetation water content, validated against in situ networks in three climate zones."
+)
+
+
+def _row(article_id):
+    with session_scope() as session:
+        row = session.get(Article, article_id)
+        return row.duplicate_of, row.title_zh, row.summary_zh
+
+
+def test_near_duplicate_reuses_translation(ingest):
+    from db_operations import DatabaseManager
+    original, = ingest([article('10.1/original', "Land cover change in the Yangtze River basin", SUMMARY)])
+    DatabaseManager().save_translations({original: ("长江流域土地覆盖变化", "摘要译文")})
+
+    corrected, distinct = ingest([
+        article('10.1/corrected', "Land cover change in the Yangtze River basin", CORRECTED),
+        article('10.1/other', "Soil moisture retrieval with Sentinel-1", OTHER),
+    ])
+    assert _row(corrected) == (original, "长江流域土地覆盖变化", "摘要译文")
+    assert _row(distinct) == (None, None, None)
+    assert [article_id for article_id, _ in duplicates.similar_to(original)] == [corrected]
+
+
+def test_duplicate_in_same_batch_gets_translation_later(ingest):
+    from db_operations import DatabaseManager
+    original, corrected = ingest([
+        article('10.1/original', "Land cover change in the Yangtze River basin", SUMMARY),
+        article('10.1/corrected', "Land cover change in the Yangtze River basin", CORRECTED),
+    ])
+    assert _row(corrected) == (original, None, None)
+    DatabaseManager().save_translations({original: ("长江流域土地覆盖变化", "摘要译文")})
+    assert _row(corrected) == (original, "长江流域土地覆盖变化", "摘要译文")
+
+
+@pytest.mark.skipif(duplicates.np is None, reason="没有安装 NumPy")
+def test_numpy_signatures_match_python():
+    texts = [("Land cover", SUMMARY), ("Corrected", CORRECTED), ("Short title", None), ("Soil", OTHER)]
+    assert duplicates._signatures_numpy(texts) == duplicates._signatures_python(texts)
+    assert duplicates.signatures(texts)[2] is None
@@ -0,0 +1,84 @@
+"""并发抓取：按完成顺序返回，失败的源不影响其他源"""
+import asyncio
+import socket
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.synthetic_feeds import generate_feed
+from feed_fetcher import AsyncFeedFetcher
+
+ENTRIES = 5
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def feed_server(delays=None):
+    """/rss/{name}：broken 返回 500，delays 中的源延迟响应；记录同时处理的最大请求数"""
+    delays = delays or {}
+    state = {'active': 0, 'peak': 0}
+
+    async def handler(request):
+        name = request.match_info['name']
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+        try:
+            await asyncio.sleep(delays.get(name, 0))
+            if name == 'broken':
+                return web.Response(status=500)
+            return web.Response(body=generate_feed(ENTRIES, 0), content_type='application/rdf+xml')
+        finally:
+            state['active'] -= 1
+
+    app = web.Application()
+    app.router.add_get('/rss/{name}', handler)
+    return TestServer(app), state
+
+
+def test_results_arrive_in_completion_order_and_errors_are_recorded():
+    async def main():
+        server, _ = feed_server({'slow': 0.3})
+        async with server, AsyncFeedFetcher() as fetcher:
+            urls = [str(server.make_url(f'/rss/{name}')) for name in ('slow', 'fast', 'broken')]
+            urls.append(f"http://127.0.0.1:{unused_port()}/rss/offline")
+            return [await result for result in fetcher.fetch_all(urls)]
+
+    results = asyncio.run(main())
+    names = [result.url.rsplit('/', 1)[1] for result in results]
+    assert names[-1] == 'slow'
+    by_name = dict(zip(names, results))
+    assert by_name['fast'].ok and by_name['slow'].ok
+    assert by_name['broken'].status == 500 and not by_name['broken'].ok
+    assert by_name['offline'].error and by_name['offline'].status is None
+
+
+def test_requests_per_host_are_limited():
+    async def main():
+        server, state = feed_server({f'feed{i}': 0.05 for i in range(6)})
+        async with server, AsyncFeedFetcher(max_per_host=2) as fetcher:
+            urls = [str(server.make_url(f'/rss/feed{i}')) for i in range(6)]
+            results = [await result for result in fetcher.fetch_all(urls)]
+        return results, state['peak']
+
+    results, peak = asyncio.run(main())
+    assert all(result.ok for result in results)
+    assert peak == 2
+
+
+def test_failed_feed_does_not_stop_the_cycle(database):
+    from rss_scheduler import RSSManager
+    manager = RSSManager()
+
+    async def main():
+        server, _ = feed_server()
+        async with server, AsyncFeedFetcher() as fetcher:
+            urls = [str(server.make_url('/rss/good')), str(server.make_url('/rss/broken'))]
+            journal_ids = await asyncio.to_thread(manager.resolve_journals, urls)
+            return urls, await manager.update_journals_async(urls, journal_ids, {}, fetcher)
+
+    (good, broken), outcomes = asyncio.run(main())
+    assert outcomes == {good: ENTRIES, broken: None}
@@ -0,0 +1,91 @@
+"""发布的订阅源：缓存、ETag / 304 和按文章失效"""
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import feed_publisher
+from conftest import article
+from db_models import Journal
+from db_session import session_scope
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    """记录重新生成的订阅源"""
+    calls = []
+    generate = feed_publisher.generate
+
+    def recording_generate(session, feed, fmt):
+        calls.append((feed, fmt))
+        return generate(session, feed, fmt)
+    monkeypatch.setattr(feed_publisher, 'generate', recording_generate)
+    return calls
+
+
+def journal_feed():
+    with session_scope() as session:
+        return feed_publisher.journal_feed(session.query(Journal.id).scalar())
+
+
+def test_cached_until_an_article_changes(ingest, generated):
+    ingest([article('10.1/a', "Glacier retreat", "Glacier retreat from radar.", published='2024-01-05')])
+    body, etag = feed_publisher.get('all', 'atom')
+    assert feed_publisher.get('all', 'atom') == (body, etag)
+    assert generated == [('all', 'atom')]
+
+    ingest([article('10.1/b', "Urban heat", "Urban heat islands.", published='2024-01-06')])
+    new_body, new_etag = feed_publisher.get('all', 'atom')
+    assert new_etag != etag and "Urban heat" in new_body
+    feed_publisher.get(journal_feed(), 'json')
+    assert generated == [('all', 'atom'), ('all', 'atom'), (journal_feed(), 'json')]
+
+
+def test_translation_invalidates_the_feed(ingest):
+    from db_operations import DatabaseManager
+    [article_id] = ingest([article('10.1/a', "Glacier retreat", "Glacier retreat from radar.")])
+    _, etag = feed_publisher.get('all', 'rss')
+    DatabaseManager().save_translations({article_id: ("冰川退缩", "雷达观测的冰川退缩。")})
+    body, new_etag = feed_publisher.get('all', 'rss')
+    assert new_etag != etag and "冰川退缩" in body
+
+
+def test_articles_older_than_a_full_feed_do_not_invalidate_it(ingest, generated, monkeypatch):
+    monkeypatch.setattr(feed_publisher, 'FEED_SIZE', 2)
+    ingest([article(f'10.1/{day}', f"Article {day}", "Summary.", published=f'2024-01-{day:02d}')
+            for day in (10, 11, 12)])
+    _, etag = feed_publisher.get('all', 'json')
+    ingest([article('10.1/old', "Old article", "Summary.", published='2023-06-01')])
+    assert feed_publisher.get('all', 'json')[1] == etag
+    ingest([article('10.1/new', "New article", "Summary.", published='2024-01-20')])
+    assert feed_publisher.get('all', 'json')[1] != etag
+    assert generated == [('all', 'json'), ('all', 'json')]
+
+
+def test_http_etag_and_not_modified(ingest):
+    ingest([article('10.1/a', "Glacier retreat", "Glacier retreat from radar.")])
+
+    async def main():
+        async with TestClient(TestServer(feed_publisher.create_app())) as client:
+            response = await client.get('/feeds/all.atom')
+            etag = response.headers['ETag']
+            first = (response.status, response.headers['Content-Type'], await response.text())
+            not_modified = await client.get('/feeds/all.atom', headers={'If-None-Match': f'"other", {etag}'})
+            missing = await client.get('/feeds/journal-x.atom')
+            return first, etag, not_modified.status, await not_modified.read(), missing.status
+
+    (status, content_type, body), etag, not_modified, empty, missing = asyncio.run(main())
+    assert status == 200 and content_type.startswith('application/atom+xml')
+    assert "Glacier retreat" in body
+    assert etag.startswith('"') and not_modified == 304 and empty == b''
+    assert missing == 404
+
+
+def test_write_feeds_only_rewrites_changed_files(ingest, tmp_path):
+    ingest([article('10.1/a', "Glacier retreat", "Glacier retreat from radar.")])
+    output = str(tmp_path / 'feeds')
+    # all 和一个期刊，各三种格式
+    assert feed_publisher.write_feeds(output) == 6
+    assert feed_publisher.write_feeds(output) == 0
+    ingest([article('10.1/b', "Urban heat", "Urban heat islands.", published='2024-02-01')])
+    assert feed_publisher.write_feeds(output) == 6
@@ -0,0 +1,92 @@
+"""--stream：边下载边解析入库，解析出错时改用 feedparser"""
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.synthetic_feeds import feed_url, generate_feed
+from db_models import Article
+from db_session import session_scope
+from feed_fetcher import AsyncFeedFetcher, FetchResult
+
+ENTRIES = 40
+
+
+class ChunkedStream:
+    """模拟响应流，每次 read 返回一块并记录读取次数"""
+
+    def __init__(self, content, chunk_size=1024):
+        self.chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        self.reads = 0
+
+    async def read(self, n=-1):
+        self.reads += 1
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+def article_count():
+    with session_scope() as session:
+        return session.query(Article).count()
+
+
+def test_stream_ingests_from_the_response(database):
+    from rss_scheduler import RSSManager
+    content = generate_feed(ENTRIES, 0)
+
+    async def handler(request):
+        return web.Response(body=content, content_type='application/rdf+xml')
+
+    async def main(manager, journal_ids, url):
+        app = web.Application()
+        app.router.add_get('/rss/{slug}', handler)
+        async with TestServer(app) as server, AsyncFeedFetcher() as fetcher:
+            local_url = str(server.make_url('/rss/feed'))
+            journal_ids[local_url] = journal_ids[url]
+            return await manager.update_journals_async([local_url], journal_ids, {}, fetcher), local_url
+
+    manager = RSSManager(streaming=True)
+    url = feed_url(0)
+    journal_ids = manager.resolve_journals([url])
+    outcomes, local_url = asyncio.run(main(manager, journal_ids, url))
+
+    assert outcomes == {local_url: ENTRIES}
+    assert article_count() == ENTRIES
+    # 读完了整个响应，内容哈希与一次性下载时相同
+    state = manager.db_manager.get_feed_states([journal_ids[url]])[journal_ids[url]]
+    assert state['content_hash'] == FetchResult(url, status=200, content=content).content_hash
+
+
+def test_stream_stops_reading_at_known_entries(database):
+    from rss_scheduler import RSSManager
+    manager = RSSManager(streaming=True)
+    url = feed_url(0)
+    journal_id = manager.resolve_journals([url])[url]
+    assert manager.process_content(url, generate_feed(ENTRIES, 0), journal_id) == ENTRIES
+
+    # 最前面多了 3 篇新文章，之后都是已入库的文章
+    stream = ChunkedStream(generate_feed(ENTRIES + 3, 0))
+    result = FetchResult(url, status=200)
+    new_articles = asyncio.run(manager.consume_stream(result, stream, journal_id))
+
+    assert new_articles == 3
+    assert stream.chunks, "已知文章之后的内容不应该再读取"
+    assert result.size < len(generate_feed(ENTRIES + 3, 0))
+    # 没有读完整个内容，不记录内容哈希
+    assert manager.db_manager.get_feed_states([journal_id])[journal_id]['content_hash'] is None
+
+
+def test_parse_error_falls_back_to_feedparser(database, caplog):
+    from rss_scheduler import RSSManager
+    manager = RSSManager(streaming=True)
+    url = feed_url(0)
+    journal_id = manager.resolve_journals([url])[url]
+    # 最后一个条目中有未声明的 HTML 实体，XMLPullParser 会在已产出前面的条目之后报错
+    head, sep, tail = generate_feed(ENTRIES, 0).rpartition(b'</title>')
+    content = head + b'&nbsp;' + sep + tail
+
+    stream = ChunkedStream(content)
+    new_articles = asyncio.run(manager.consume_stream(FetchResult(url, status=200), stream, journal_id))
+
+    assert new_articles == ENTRIES
+    assert article_count() == ENTRIES
+    assert 'falling back to feedparser' in caplog.text
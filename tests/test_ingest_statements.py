@@ -0,0 +1,52 @@
+"""入库一批文章的 SQL 语句数（耗时的上限在 benchmarks/bench_pipeline.py --max-ingest-ms 中检查）"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+import db_session
+from benchmarks.synthetic_feeds import feed_url, generate_feed
+
+ENTRIES = 300
+# 除逐行的文章 INSERT 以外，一批新文章最多的语句数：去重查询、签名、全文检索、列表快照、作者和标签
+# 各一到两条（按 500 个分块的查询会随批量增大，但与文章数无关的部分不应该超过这个数）
+MAX_STATEMENTS_PER_BATCH = 30
+# 全部已入库的源只需要去重查询
+MAX_STATEMENTS_ALL_KNOWN = 3
+
+
+@contextmanager
+def statements():
+    """记录执行的 SQL 语句（executemany 和 insertmanyvalues 的每一批各算一条）"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    engine = db_session.get_engine()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield executed
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_ingest_statements_do_not_grow_with_the_batch(database):
+    from rss_scheduler import RSSManager
+    manager = RSSManager()
+    url = feed_url(0)
+    journal_id = manager.resolve_journals([url])[url]
+    content = generate_feed(ENTRIES, 0)
+
+    with statements() as executed:
+        assert manager.process_content(url, content, journal_id) == ENTRIES
+    article_inserts = [sql for sql in executed if sql.startswith('INSERT INTO articles ')]
+    others = len(executed) - len(article_inserts)
+    assert others <= MAX_STATEMENTS_PER_BATCH, executed
+    if database == 'sqlite':
+        # SQLite 的多行 INSERT ... RETURNING 不保证返回顺序，ORM 只能逐行插入以取得自增ID
+        assert len(article_inserts) == ENTRIES
+    else:
+        assert len(article_inserts) == 1
+
+    with statements() as executed:
+        assert manager.process_content(url, content, journal_id) == 0
+    assert len(executed) <= MAX_STATEMENTS_ALL_KNOWN, executed
@@ -0,0 +1,92 @@
+"""从最初的表结构（没有任何迁移）升级到最新版本"""
+import importlib.util
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, select, text
+
+import db_session
+import migrations
+import search_index
+from db_models import (ArticleListing, ArticleSignature, ArticleVector, ListingCount, SchemaMigration, TagTerm,
+                       VectorCentroid, article_tags)
+
+# 最初版本的 db_models.py / init-db.js 建出的表（SQLite）
+BASELINE_SCHEMA = [
+    """CREATE TABLE journals (
+        id INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, rss_url VARCHAR(500) NOT NULL, description TEXT)""",
+    """CREATE TABLE articles (
+        id INTEGER PRIMARY KEY, title VARCHAR(500) NOT NULL, title_zh VARCHAR(500), volume VARCHAR(200),
+        pages VARCHAR(200), authors TEXT, published_date DATETIME, doi VARCHAR(100), link VARCHAR(500),
+        summary TEXT, summary_zh TEXT, journal_id INTEGER REFERENCES journals(id), image_url VARCHAR(500))""",
+    """CREATE TABLE tags (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE)""",
+    """CREATE TABLE article_tags (
+        article_id INTEGER REFERENCES articles(id), tag_id INTEGER REFERENCES tags(id))""",
+    """CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(100) NOT NULL UNIQUE, email VARCHAR(200))""",
+    """CREATE TABLE comments (
+        id INTEGER PRIMARY KEY, article_id INTEGER REFERENCES articles(id), user_id INTEGER REFERENCES users(id),
+        content TEXT NOT NULL, created_at DATETIME)""",
+]
+
+SUMMARIES = [
+    "We map land cover change across the Yangtze River basin from 2000 to 2020 using Landsat time series "
+    "and a random forest classifier with a temporal consistency filter.",
+    "Soil moisture retrieval from Sentinel-1 radar backscatter is improved by a change detection method "
+    "that accounts for vegetation water content in three climate zones.",
+    "Glacier velocity in the Karakoram is derived from optical feature tracking of Sentinel-2 imagery "
+    "and compared with radar interferometry over five melt seasons.",
+]
+
+
+@pytest.fixture
+def baseline_database(tmp_path):
+    """最初表结构的 SQLite 库，带几篇已入库和已翻译的文章"""
+    url = f"sqlite:///{tmp_path / 'baseline.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text(
+            "INSERT INTO journals (id, name, rss_url) VALUES (1, 'Remote Sensing', 'https://example.com/rss')"))
+        for i, summary in enumerate(SUMMARIES, 1):
+            conn.execute(text(
+                "INSERT INTO articles (id, title, title_zh, authors, published_date, doi, link, summary, journal_id) "
+                "VALUES (:id, :title, :title_zh, :authors, :published, :doi, :link, :summary, 1)"
+            ), {
+                'id': i, 'title': f"Article {i}", 'title_zh': "已翻译" if i == 1 else None,
+                'authors': '[{"name": "Jane Smith, John Doe"}]', 'published': f"2024-01-0{i} 00:00:00.000000",
+                'doi': f"10.1/{i}", 'link': f"https://example.com/{i}", 'summary': summary,
+            })
+        conn.execute(text("INSERT INTO comments (article_id, content) VALUES (1, 'nice')"))
+    engine.dispose()
+
+    original = db_session.DATABASE_URL
+    db_session.set_database_url(url)
+    yield url
+    db_session.set_database_url(original)
+
+
+def test_baseline_database_upgrades_through_every_migration(baseline_database):
+    db_session.ensure_schema()
+    engine = db_session.get_engine()
+    with engine.connect() as conn:
+        versions = conn.execute(select(SchemaMigration.version).order_by(SchemaMigration.version)).scalars().all()
+        assert versions == [number for number, _, _ in migrations.MIGRATIONS]
+
+        indexes = {index['name'] for index in inspect(conn).get_indexes('articles')}
+        assert {'ix_articles_doi', 'ix_articles_duplicate_of', 'ix_articles_untranslated'} <= indexes
+        assert {'duplicate_of', 'raw_title'} <= {column['name'] for column in inspect(conn).get_columns('articles')}
+
+        assert conn.execute(select(ListingCount.total).where(ListingCount.journal_id == 0)).scalar() == 3
+        title_zh = select(ArticleListing.title_zh).where(ArticleListing.article_id == 1)
+        assert conn.execute(title_zh).scalar() == "已翻译"
+        assert conn.execute(text("SELECT COUNT(*) FROM article_authors")).scalar() == 6
+
+    # 派生数据在迁移中重建，不需要再手动运行各模块的 --rebuild
+    assert [row['id'] for row in search_index.search("glacier velocity")] == [3]
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(TagTerm)).scalar() > 0
+        assert conn.execute(select(func.count(func.distinct(article_tags.c.article_id)))).scalar() == 3
+        assert conn.execute(select(func.count()).select_from(ArticleSignature)).scalar() == 3
+        if importlib.util.find_spec('numpy'):
+            assert conn.execute(select(func.count()).select_from(VectorCentroid)).scalar() > 0
+            assert conn.execute(select(func.count()).select_from(ArticleVector)).scalar() == 3
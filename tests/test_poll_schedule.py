@@ -0,0 +1,57 @@
+"""常驻模式的自适应轮询间隔"""
+from datetime import datetime, timedelta
+
+from rss_scheduler import (DEFAULT_POLL_INTERVAL, MAX_POLL_INTERVAL, MIN_POLL_INTERVAL, plan_next_poll)
+
+
+def test_new_articles_halve_the_interval_down_to_the_minimum():
+    assert plan_next_poll(None, 0, 3) == (DEFAULT_POLL_INTERVAL // 2, 0, DEFAULT_POLL_INTERVAL // 2)
+    assert plan_next_poll(MIN_POLL_INTERVAL + 60, 0, 1) == (MIN_POLL_INTERVAL, 0, MIN_POLL_INTERVAL)
+
+
+def test_quiet_feeds_slow_down_up_to_the_maximum():
+    assert plan_next_poll(3600, 0, 0) == (5400, 0, 5400)
+    assert plan_next_poll(MAX_POLL_INTERVAL - 60, 0, 0) == (MAX_POLL_INTERVAL, 0, MAX_POLL_INTERVAL)
+
+
+def test_failures_back_off_without_changing_the_interval():
+    interval, failures, delay = plan_next_poll(3600, 0, None)
+    assert (interval, failures, delay) == (3600, 1, 7200)
+    interval, failures, delay = plan_next_poll(interval, failures, None)
+    assert (interval, failures, delay) == (3600, 2, 14400)
+    assert plan_next_poll(3600, 30, None) == (3600, 31, MAX_POLL_INTERVAL)
+    # 恢复后重新计数
+    assert plan_next_poll(3600, 31, 0)[1] == 0
+
+
+def test_schedule_is_persisted(database):
+    from db_operations import DatabaseManager
+    manager = DatabaseManager()
+    journal_id = manager.get_or_create_journal('Test Journal', 'https://example.com/rss')
+    next_poll_at = datetime.now() + timedelta(hours=1)
+    manager.save_feed_schedule(journal_id, 1800, next_poll_at, 2, found_new=True)
+
+    state = manager.get_feed_states([journal_id])[journal_id]
+    assert (state['poll_interval'], state['next_poll_at'], state['consecutive_failures']) == (1800, next_poll_at, 2)
+    assert state['last_new_at'] is not None
+
+
+def test_restart_keeps_the_persisted_schedule(database, monkeypatch):
+    from rss_scheduler import RSSManager
+    manager = RSSManager()
+    known, new = 'https://example.com/rss/known', 'https://example.com/rss/new'
+    journal_id = manager.resolve_journals([known])[known]
+    next_poll_at = datetime.now() + timedelta(hours=3)
+    manager.db_manager.save_feed_schedule(journal_id, 7200, next_poll_at, 0)
+    monkeypatch.setattr(manager, 'load_rss_urls', lambda filename: [known, new])
+
+    heap, journal_ids = [], {}
+    before = datetime.now()
+    assert manager._schedule_new_urls(heap, journal_ids) == {known, new}
+    scheduled = {url: when for when, url in heap}
+    assert scheduled[known] == next_poll_at
+    # 新的源立即抓取
+    assert before <= scheduled[new] <= datetime.now()
+    # 已调度的源不会重复加入
+    manager._schedule_new_urls(heap, journal_ids)
+    assert len(heap) == 2
@@ -0,0 +1,54 @@
+import pytest
+
+import related
+from benchmarks.synthetic_feeds import make_entries
+from conftest import article
+from db_models import ArticleVector, RelatedArticle, VectorCentroid
+from db_session import session_scope
+
+pytest.importorskip('numpy')
+
+
+def entries(count, start=0):
+    return [article(e['doi'], e['actual_title'], e['summary']) for e in make_entries(count, start=start)]
+
+
+def counts():
+    with session_scope() as session:
+        return (session.query(VectorCentroid).count(),
+                session.query(ArticleVector).count(),
+                session.query(RelatedArticle.article_id).distinct().count())
+
+
+def test_update_pending_trains_centroids_once_enough_articles(ingest, monkeypatch):
+    monkeypatch.setattr(related, 'MIN_TRAIN_ARTICLES', 30)
+    ingest(entries(20))
+    # 文章数不够时不训练，也不计算
+    assert related.update_pending() == 0
+    assert counts() == (0, 0, 0)
+
+    ingest(entries(20, start=20))
+    assert related.update_pending() == 40
+    centroids, vectors, with_related = counts()
+    assert centroids > 0
+    assert vectors == 40
+    assert with_related > 0
+
+
+def test_update_pending_finds_articles_committed_out_of_order(ingest, monkeypatch):
+    monkeypatch.setattr(related, 'MIN_TRAIN_ARTICLES', 1)
+    ids = ingest(entries(30))
+    related.rebuild()
+    # 模拟较小的ID晚于较大的ID提交：它还没有向量，而更大的ID已经处理过
+    late = ids[10]
+    with session_scope() as session:
+        session.query(RelatedArticle).filter_by(article_id=late).delete()
+        session.query(ArticleVector).filter_by(article_id=late).delete()
+    ingest(entries(5, start=30))
+
+    assert related.update_pending() == 6
+    with session_scope() as session:
+        assert session.get(ArticleVector, late) is not None
+    assert counts()[1] == 35
+    # 全部处理过之后不再重复计算
+    assert related.update_pending() == 0
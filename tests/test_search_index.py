@@ -0,0 +1,32 @@
+import search_index
+from conftest import article
+
+
+def test_title_match_ranks_above_summary_match(ingest):
+    body_id, title_id = ingest([
+        article('10.1/body', "Forest canopy mapping",
+                "We study hyperspectral imagery of forests and wetlands over several seasons."),
+        article('10.1/title', "Hyperspectral wetland classification",
+                "A classification study of wetlands using satellite data over several seasons."),
+    ])
+    results = search_index.search("hyperspectral")
+    assert [row['id'] for row in results] == [title_id, body_id]
+    assert all(row['score'] > 0 for row in results)
+    assert results[0]['score'] > results[1]['score']
+
+
+def test_all_terms_must_match(ingest):
+    first, _ = ingest([
+        article('10.1/a', "Soil moisture retrieval", "Soil moisture from radar."),
+        article('10.1/b', "Soil erosion", "Erosion rates in croplands."),
+    ])
+    assert [row['id'] for row in search_index.search("soil moisture")] == [first]
+    assert search_index.search("glacier") == []
+
+
+def test_chinese_bigrams_after_translation(ingest):
+    from db_operations import DatabaseManager
+    article_id, = ingest([article('10.1/zh', "Land cover change", "Land cover change detection.")])
+    DatabaseManager().save_translations({article_id: ("土地覆盖变化", "土地覆盖变化检测。")})
+    assert [row['id'] for row in search_index.search("土地覆盖")] == [article_id]
+    assert search_index.search("覆盖率") == []
@@ -0,0 +1,84 @@
+"""增量导出静态网站：只重写变化的文章、月份页和首页"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import static_export
+from conftest import article
+from db_models import ArticleListing
+from db_session import session_scope
+
+
+@pytest.fixture
+def site(ingest, tmp_path):
+    ids = ingest([
+        article('10.1/a', "Glacier retreat", "Glacier retreat from radar.", published='2024-01-05'),
+        article('10.1/b', "Urban heat", "Urban heat islands.", published='2024-02-10'),
+    ])
+    return ids, str(tmp_path / 'site')
+
+
+def age_listings():
+    """让已有的文章早于下次导出的水位线（导出时回退 WATERMARK_LAG）"""
+    with session_scope() as session:
+        session.query(ArticleListing).update({'updated_at': datetime.utcnow() - timedelta(hours=1)})
+
+
+def read_json(output, relative):
+    with open(os.path.join(output, f"{relative}.json"), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def mtimes(output):
+    result = {}
+    for root, _, files in os.walk(output):
+        for name in files:
+            path = os.path.join(root, name)
+            result[os.path.relpath(path, output)] = os.stat(path).st_mtime_ns
+    return result
+
+
+def test_full_export_then_nothing_to_do(site):
+    (first, second), output = site
+    age_listings()
+    assert static_export.export(output) == {'articles': 2, 'pages': 6, 'full': True}
+    assert read_json(output, 'index')['months'] == ['2024-02', '2024-01']
+    assert [a['article_id'] for a in read_json(output, 'archive/2024-01')['articles']] == [first]
+    journal_id = read_json(output, f'articles/{first}')['journal_id']
+    assert read_json(output, f'journals/{journal_id}/index')['months'] == ['2024-02', '2024-01']
+
+    before = mtimes(output)
+    assert static_export.export(output) == {'articles': 0, 'pages': 0, 'full': False}
+    changed = {path for path, mtime in mtimes(output).items() if before.get(path) != mtime}
+    assert changed == {static_export.MANIFEST}
+
+
+def test_incremental_export_rewrites_only_affected_pages(site, ingest):
+    (first, second), output = site
+    age_listings()
+    static_export.export(output)
+    before = mtimes(output)
+
+    [third] = ingest([article('10.1/c', "Snow cover", "Snow cover from MODIS.", published='2024-03-01')])
+    from db_operations import DatabaseManager
+    DatabaseManager().save_translations({first: ("冰川退缩", "雷达观测的冰川退缩。")})
+    result = static_export.export(output)
+    assert result['articles'] == 2 and not result['full']
+
+    changed = {path for path, mtime in mtimes(output).items() if before.get(path) != mtime}
+    journal_id = read_json(output, f'articles/{first}')['journal_id']
+    assert {f'articles/{first}.html', f'articles/{third}.html', 'archive/2024-03.html', 'archive/2024-01.html',
+            'index.html', f'journals/{journal_id}/index.html'} <= changed
+    # 没有变化的文章和月份不重写
+    assert not {f'articles/{second}.html', 'archive/2024-02.html'} & changed
+    assert read_json(output, f'articles/{first}')['title_zh'] == "冰川退缩"
+    assert read_json(output, 'index')['months'] == ['2024-03', '2024-02', '2024-01']
+
+
+def test_changed_format_falls_back_to_a_full_export(site, monkeypatch):
+    _, output = site
+    static_export.export(output)
+    monkeypatch.setattr(static_export, 'HOME_SIZE', 10)
+    assert static_export.export(output)['full']
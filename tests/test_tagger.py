@@ -0,0 +1,21 @@
+import tagger
+from conftest import article
+from db_session import session_scope
+
+
+def test_statistics_accumulate_across_batches(ingest):
+    ingest([
+        article('10.1/a', "Glacier retreat", "Glacier retreat measured with radar altimetry."),
+        article('10.1/b', "Glacier velocity", "Glacier velocity from optical imagery."),
+    ])
+    ingest([article('10.1/c', "Urban heat islands", "Urban heat islands from thermal imagery.")])
+    with session_scope() as session:
+        counts = tagger.document_counts(session, ['glacier', 'imagery', 'urban', 'missing'])
+    assert counts == {tagger.CORPUS_KEY: 3, 'glacier': 2, 'imagery': 2, 'urban': 1}
+
+
+def test_statistics_upsert_returns_updated_counts(database):
+    with session_scope() as session:
+        assert tagger._add_statistics(session, {'glacier': 2}, 2) == {tagger.CORPUS_KEY: 2, 'glacier': 2}
+        assert tagger._add_statistics(session, {'glacier': 1, 'urban': 1}, 1) == {
+            tagger.CORPUS_KEY: 3, 'glacier': 3, 'urban': 1}
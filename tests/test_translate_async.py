@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+
+from benchmarks.stub_client import StubChatClient
+from conftest import article
+from db_models import Article
+from db_session import session_scope
+
+SUMMARY = "Hyperspectral imagery of wetlands over several seasons."
+
+
+@pytest.fixture
+def translator(ingest):
+    from translate_articles import ArticleTranslator
+    ingest([article(f"10.1/{i}", f"Wetland study {i}", f"{SUMMARY} Site {i}.") for i in range(4)])
+    translator = ArticleTranslator(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, client=StubChatClient())
+    # 记录数据库操作所在的线程
+    threads = []
+    for name in ('save_translations', 'record_translation_failure', 'lookup_cache'):
+        original = getattr(translator, name)
+
+        def wrapped(*args, _original=original, **kwargs):
+            threads.append(threading.get_ident())
+            return _original(*args, **kwargs)
+        setattr(translator, name, wrapped)
+    translator.db_threads = threads
+    return translator
+
+
+def _run(coroutine):
+    """返回 (结果, 事件循环所在的线程)"""
+    async def main():
+        return await coroutine, threading.get_ident()
+    return asyncio.run(main())
+
+
+def _translated():
+    with session_scope() as session:
+        return session.query(Article).filter(Article.title_zh.isnot(None)).count()
+
+
+def test_batched_translation_returns_count_and_keeps_db_off_the_loop(translator):
+    articles = translator.claim_articles()
+    translated, loop_thread = _run(translator.translate_batched(articles))
+    assert translated == 4
+    assert _translated() == 4
+    assert translator.db_threads and loop_thread not in translator.db_threads
+
+    # 第二次全部命中缓存
+    translator.db_threads.clear()
+    translated, loop_thread = _run(translator.translate_batched(articles))
+    assert translated == 4
+    assert translator.translation_cache.stats()['memory_hits'] == 4
+    assert loop_thread not in translator.db_threads
+
+
+def test_single_translation_keeps_db_off_the_loop(translator):
+    articles = translator.claim_articles()
+    _, loop_thread = _run(translator.translate_batch(articles))
+    assert _translated() == 4
+    assert translator.db_threads and loop_thread not in translator.db_threads
@@ -0,0 +1,46 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.stub_client import respond
+from translate_articles import format_batch_prompt, parse_batch_response
+
+
+def _articles():
+    return [
+        SimpleNamespace(id=5012, title="Glacier retreat", summary='Radar "altimetry" of glaciers.'),
+        SimpleNamespace(id=77, title="Urban heat", summary="Thermal imagery of cities."),
+    ]
+
+
+def test_prompt_numbers_articles_without_field_names():
+    prompt = format_batch_prompt(_articles())
+    payload = prompt.split('文章：\n', 1)[1]
+    assert payload == '[[1,"Glacier retreat","Radar \\"altimetry\\" of glaciers."],[2,"Urban heat","Thermal imagery of cities."]]'
+    assert '5012' not in prompt
+
+
+def test_response_numbers_map_back_to_article_ids():
+    articles = _articles()
+    results = parse_batch_response(respond(format_batch_prompt(articles)), [a.id for a in articles])
+    assert results == {
+        5012: ("[zh] Glacier retreat", '[zh] Radar "altimetry" of glaciers.'),
+        77: ("[zh] Urban heat", "[zh] Thermal imagery of cities."),
+    }
+
+
+def test_invalid_items_are_skipped():
+    response = "```json\n" + json.dumps([
+        [2, "城市热岛", "城市的热红外影像。"],
+        [3, "多余的", "编号超出范围"],
+        [0, "多余的", "编号超出范围"],
+        [1, "", "标题为空"],
+        {"id": 1, "title": "旧格式", "abstract": "不接受"},
+    ], ensure_ascii=False) + "\n```"
+    assert parse_batch_response(response, [5012, 77]) == {77: ("城市热岛", "城市的热红外影像。")}
+
+
+def test_response_must_be_an_array():
+    with pytest.raises(ValueError):
+        parse_batch_response('{"1": ["a", "b"]}', [1])
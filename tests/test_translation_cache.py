@@ -0,0 +1,57 @@
+import translation_cache
+from db_session import get_session_factory
+from translation_cache import TranslationCache, cache_key
+
+
+def test_prompt_version_is_part_of_the_key():
+    assert translation_cache.PROMPT_VERSION >= 2
+    assert cache_key("Title", "Summary") != cache_key("Title", "Summary", prompt_version=1)
+    assert cache_key("Title", "Summary") != cache_key("Title", "Summary", model="another-model")
+
+
+def test_entries_from_an_older_prompt_are_not_served(database, monkeypatch):
+    monkeypatch.setattr(translation_cache, 'PROMPT_VERSION', 1)
+    cache = TranslationCache(get_session_factory())
+    cache.put("Title", "Summary", "旧标题", "旧摘要")
+    assert cache.get("Title", "Summary") == ("旧标题", "旧摘要")
+
+    monkeypatch.setattr(translation_cache, 'PROMPT_VERSION', 2)
+    assert TranslationCache(get_session_factory()).get("Title", "Summary") is None
+
+
+def test_memory_tier_then_database_tier(database):
+    cache = TranslationCache(get_session_factory())
+    assert cache.get("Title", "Summary") is None
+    cache.put("Title", "Summary", "标题", "摘要")
+    assert cache.get("Title", "Summary") == ("标题", "摘要")
+    assert (cache.memory_hits, cache.db_hits, cache.misses) == (1, 0, 1)
+
+    # 新的进程只有数据库中的条目，第一次从数据库读取后进入内存
+    restarted = TranslationCache(get_session_factory())
+    assert restarted.get("Title", "Summary") == ("标题", "摘要")
+    assert restarted.get("Title", "Summary") == ("标题", "摘要")
+    assert restarted.stats() == {
+        'memory_hits': 1, 'db_hits': 1, 'misses': 0, 'hit_rate': 1.0, 'memory_size': 1
+    }
+
+
+def test_memory_tier_evicts_least_recently_used(database):
+    cache = TranslationCache(get_session_factory(), capacity=2)
+    cache.put("A", "a", "甲", "甲")
+    cache.put("B", "b", "乙", "乙")
+    cache.get("A", "a")
+    cache.put("C", "c", "丙", "丙")
+    assert cache.stats()['memory_size'] == 2
+
+    # B 最久没有使用，被移出内存，但仍然可以从数据库读取
+    assert cache.get("B", "b") == ("乙", "乙")
+    assert cache.db_hits == 1
+
+
+def test_second_writer_of_a_key_keeps_the_first_entry(database):
+    first = TranslationCache(get_session_factory())
+    second = TranslationCache(get_session_factory())
+    first.put("Title", "Summary", "标题", "摘要")
+    # 另一个进程同时翻译了同一篇文章：保留先写入的条目，不报错
+    second.put("Title", "Summary", "另一个标题", "另一个摘要")
+    assert TranslationCache(get_session_factory()).get("Title", "Summary") == ("标题", "摘要")
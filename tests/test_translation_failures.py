@@ -0,0 +1,82 @@
+"""翻译失败的退避和放弃"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import translate_articles
+from conftest import article
+from db_models import TranslationState
+from db_session import session_scope
+
+
+@pytest.fixture
+def translator(ingest):
+    from translate_articles import ArticleTranslator
+    ids = ingest([article(f"10.1/{i}", f"Wetland study {i}", "Hyperspectral imagery of wetlands.") for i in range(2)])
+    translator = ArticleTranslator()
+    translator.article_ids = ids
+    return translator
+
+
+def state_of(article_id):
+    with session_scope() as session:
+        state = session.get(TranslationState, article_id)
+        session.expunge(state)
+        return state
+
+
+def claimed_ids(translator):
+    return [a.id for a in translator.claim_articles()]
+
+
+def test_failures_back_off_exponentially(translator):
+    poison, other = translator.article_ids
+    assert claimed_ids(translator) == [poison, other]
+
+    delays = []
+    for _ in range(4):
+        before = datetime.utcnow()
+        translator.record_translation_failure(poison, "invalid JSON")
+        state = state_of(poison)
+        delays.append(state.next_attempt_at - before)
+    assert state.status == 'pending'
+    assert state.attempts == 4
+    assert state.last_error == "invalid JSON"
+    # 失败时释放租约
+    assert state.leased_by is None and state.lease_expires_at is None
+    for delay, expected in zip(delays, [1, 2, 4, 8]):
+        assert timedelta(minutes=expected) <= delay < timedelta(minutes=expected, seconds=5)
+
+    # 退避期内不会被领取，其他文章的租约过期后照常领取
+    with session_scope() as session:
+        session.get(TranslationState, other).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    assert claimed_ids(translator) == [other]
+    with session_scope() as session:
+        session.get(TranslationState, poison).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    assert claimed_ids(translator) == [poison]
+
+
+def test_backoff_is_capped(translator, monkeypatch):
+    monkeypatch.setattr(translate_articles, 'MAX_ATTEMPTS', 20)
+    poison = translator.article_ids[0]
+    for _ in range(15):
+        translator.record_translation_failure(poison, "timeout")
+    delay = state_of(poison).next_attempt_at - datetime.utcnow()
+    assert translate_articles.BACKOFF_MAX - timedelta(seconds=5) < delay <= translate_articles.BACKOFF_MAX
+
+
+def test_gives_up_after_max_attempts(translator):
+    poison, other = translator.article_ids
+    for _ in range(translate_articles.MAX_ATTEMPTS):
+        translator.record_translation_failure(poison, "content filter")
+    state = state_of(poison)
+    assert state.status == 'gave_up'
+    assert state.next_attempt_at is None
+
+    # 放弃的文章不再被领取（与退避时间无关）
+    with session_scope() as session:
+        session.query(TranslationState).update({'next_attempt_at': None})
+    assert claimed_ids(translator) == [other]
+    stuck = translator.get_stuck_articles()
+    assert [(row.article_id, row.status, row.attempts) for row in stuck] == [
+        (poison, 'gave_up', translate_articles.MAX_ATTEMPTS)]
@@ -0,0 +1,67 @@
+"""多个 worker 通过 translation_states 的租约领取翻译任务"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import translate_articles
+from conftest import article
+from db_models import Article, TranslationState
+from db_session import session_scope
+
+
+@pytest.fixture
+def workers(ingest):
+    from translate_articles import ArticleTranslator
+    ids = ingest([article(f"10.1/{i}", f"Wetland study {i}", "Hyperspectral imagery of wetlands.") for i in range(6)])
+    workers = []
+    for name in ('node-a:1', 'node-b:2'):
+        worker = ArticleTranslator()
+        worker.worker_id = name
+        workers.append(worker)
+    return ids, workers
+
+
+def claimed_ids(worker, limit=translate_articles.FETCH_SIZE):
+    return [a.id for a in worker.claim_articles(limit)]
+
+
+def leases():
+    with session_scope() as session:
+        return {state.article_id: (state.leased_by, state.lease_expires_at)
+                for state in session.query(TranslationState)}
+
+
+def test_workers_claim_disjoint_articles(workers):
+    ids, (first, second) = workers
+    before = datetime.utcnow()
+    assert claimed_ids(first, 4) == ids[:4]
+    assert claimed_ids(second, 4) == ids[4:]
+    assert claimed_ids(first) == []
+
+    held = leases()
+    assert {held[i][0] for i in ids[:4]} == {'node-a:1'}
+    assert {held[i][0] for i in ids[4:]} == {'node-b:2'}
+    for _, expires_at in held.values():
+        assert before + translate_articles.LEASE_DURATION <= expires_at
+        assert expires_at < datetime.utcnow() + translate_articles.LEASE_DURATION
+
+
+def test_expired_leases_are_reclaimed(workers):
+    ids, (first, second) = workers
+    assert claimed_ids(first) == ids
+    # first 崩溃：租约到期后其他 worker 可以领取
+    with session_scope() as session:
+        session.query(TranslationState).filter(TranslationState.article_id.in_(ids[:2]))\
+            .update({'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+    assert claimed_ids(second) == ids[:2]
+    assert {leases()[i][0] for i in ids[:2]} == {'node-b:2'}
+
+
+def test_released_and_translated_articles(workers):
+    ids, (first, second) = workers
+    assert claimed_ids(first) == ids
+    first.release_leases()
+    with session_scope() as session:
+        session.get(Article, ids[0]).title_zh = "已翻译"
+    # 释放租约后立即可以领取，已翻译的文章不再领取
+    assert claimed_ids(second) == ids[1:]
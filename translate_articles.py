@@ -2,60 +2,388 @@ import logging
 import asyncio
 import json
 import openai
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from db_models import Article
+from sqlalchemy import and_, or_, func, literal, select, update
+from db_models import Article, TranslationState
+from db_session import ensure_schema, get_engine, get_session_factory, log_pool_status, session_scope, insert_ignore
+from translation_cache import TranslationCache, TRANSLATION_MODEL
+from rate_limiter import RateLimiter, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE
+import duplicates
+import listings
+import metrics
+import profiling
+import search_index
+from profiling import span, record
+import argparse
+import multiprocessing
+import os
+import re
+import socket
 import time
+from datetime import datetime, timedelta
+
+# 批量翻译配置
+BATCH_TOKEN_BUDGET = 6000     # 每个请求的输入token预算
+BATCH_MAX_ARTICLES = 20       # 每个请求最多包含的文章数
+BATCH_MAX_OUTPUT_TOKENS = 16000
+# 每轮从数据库取出的文章数
+FETCH_SIZE = 50
+
+# 失败重试配置：第 n 次失败后等待 BACKOFF_BASE * 2^(n-1)，最多 MAX_ATTEMPTS 次
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(days=1)
+
+# 多 worker 领取任务的租约时长，worker 崩溃后租约到期自动释放
+LEASE_DURATION = timedelta(minutes=10)
+
+# 每篇文章是 [编号, 标题, 摘要]：编号是文章在本批中的序号（从 1 开始，比数据库ID短），
+# 不重复字段名，JSON 不加空格，提示词的token基本都是文章正文
+BATCH_PROMPT = """把下面每篇文章的英文标题和摘要翻译成中文。输入是 JSON 数组，每篇文章为 [编号, 标题, 摘要]。
+只返回同样格式的 JSON 数组：[[编号, "中文标题", "中文摘要"], ...]，编号与输入相同。
+
+文章：
+{articles}"""
+# 每篇文章在 JSON 数组中除标题和摘要以外的token（编号、引号、逗号和括号）
+BATCH_ITEM_TOKENS = 4
+
+
+class TranslationError(Exception):
+    """重试后仍然翻译失败"""
+
+
+def estimate_tokens(text):
+    """粗略估算token数（英文约4个字符一个token）"""
+    return len(text or '') // 4 + 1
+
+
+def pack_batches(articles, token_budget=BATCH_TOKEN_BUDGET, max_articles=BATCH_MAX_ARTICLES):
+    """按token预算和文章数上限把文章分组"""
+    batches = []
+    current = []
+    current_tokens = estimate_tokens(BATCH_PROMPT)
+    for article in articles:
+        tokens = estimate_tokens(article.title) + estimate_tokens(article.summary) + BATCH_ITEM_TOKENS
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_articles):
+            batches.append(current)
+            current = []
+            current_tokens = estimate_tokens(BATCH_PROMPT)
+        current.append(article)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def format_batch_prompt(articles):
+    """批量翻译的提示词，文章按顺序编号"""
+    payload = [[number, article.title, article.summary] for number, article in enumerate(articles, 1)]
+    return BATCH_PROMPT.format(articles=json.dumps(payload, ensure_ascii=False, separators=(',', ':')))
+
+
+def parse_batch_response(response, article_ids):
+    """解析批量翻译返回的JSON数组，article_ids 为提示词中按编号排列的文章ID，返回 {id: (title_zh, summary_zh)}"""
+    # 去掉可能存在的 ```json 代码块标记
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', response.strip())
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("返回结果不是JSON数组")
+
+    results = {}
+    for item in items:
+        try:
+            number, title_zh, summary_zh = item
+            number = int(number)
+            title_zh = title_zh.strip()
+            summary_zh = summary_zh.strip()
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if 1 <= number <= len(article_ids) and title_zh and summary_zh:
+            results[article_ids[number - 1]] = (title_zh, summary_zh)
+    return results
+
 
 class ArticleTranslator:
-    def __init__(self):
-        # 数据库配置
-        self.db_url = "你的数据库链接"
-        self.engine = create_engine(self.db_url)
-        self.Session = sessionmaker(bind=self.engine)
-        
-        # OpenAI配置
-        openai.api_key = ""
-        openai.base_url = "https://api.gpt.ge/v1/"
-        
-        # 日志配置
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE, client=None):
+        # 日志配置（要在迁移输出日志之前完成）
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
+        
+        # 数据库配置（进程内共享引擎和连接池，见 db_session）
+        self.engine = get_engine()
+        self.db_url = self.engine.url.render_as_string(hide_password=False)
+        self.Session = get_session_factory()
+        # 创建缺失的表，并对已有的库执行未完成的迁移
+        ensure_schema()
+        self.translation_cache = TranslationCache(self.Session)
+        
+        # OpenAI配置
+        # 可用环境变量指向其他兼容接口（例如本地的模拟服务）
+        openai.api_key = os.environ.get('RSS2WEB_OPENAI_API_KEY', "")
+        openai.base_url = os.environ.get('RSS2WEB_OPENAI_BASE_URL', "https://api.gpt.ge/v1/")
+        # 可传入兼容 AsyncOpenAI 接口的客户端（例如基准测试中的模拟客户端）
+        self.client = client or openai.AsyncOpenAI(api_key=openai.api_key, base_url=openai.base_url)
+        # 按服务商配额限流，替代固定的 sleep
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        # 领取任务时使用的 worker 标识
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
 
     def get_untranslated_articles(self, limit=3):
-        """获取未翻译的文章"""
-        session = self.Session()
+        """获取未翻译的文章（跳过还在退避期或已放弃的文章）"""
+        with session_scope() as session:
+            return session.query(Article)\
+                .outerjoin(TranslationState, TranslationState.article_id == Article.id)\
+                .filter(Article.title_zh.is_(None))\
+                .filter(Article.duplicate_of.is_(None))\
+                .filter(or_(
+                    TranslationState.article_id.is_(None),
+                    and_(
+                        TranslationState.status == 'pending',
+                        or_(
+                            TranslationState.next_attempt_at.is_(None),
+                            TranslationState.next_attempt_at <= datetime.utcnow()
+                        )
+                    )
+                ))\
+                .order_by(Article.id)\
+                .limit(limit)\
+                .all()
+
+    def claim_articles(self, limit=FETCH_SIZE):
+        """领取一批待翻译的文章并加租约，多个 worker 不会领到同一篇
+
+        PostgreSQL 使用 FOR UPDATE SKIP LOCKED，SQLite 的单条 UPDATE ... RETURNING 本身是原子的
+        """
+        dialect = self.engine.dialect.name
+        now = datetime.utcnow()
+        # 领取在一个事务中提交，之后再读取文章内容
+        with session_scope() as session:
+
+            # 为还没有队列记录的未翻译文章补上记录
+            missing = select(Article.id, literal('pending'), literal(0))\
+                .outerjoin(TranslationState, TranslationState.article_id == Article.id)\
+                .where(Article.title_zh.is_(None))\
+                .where(Article.duplicate_of.is_(None))\
+                .where(TranslationState.article_id.is_(None))\
+                .order_by(Article.id)\
+                .limit(limit)
+            session.execute(
+                insert_ignore(dialect, TranslationState)
+                .from_select(['article_id', 'status', 'attempts'], missing)
+            )
+
+            eligible = select(TranslationState.article_id)\
+                .join(Article, Article.id == TranslationState.article_id)\
+                .where(Article.title_zh.is_(None))\
+                .where(Article.duplicate_of.is_(None))\
+                .where(TranslationState.status == 'pending')\
+                .where(or_(
+                    TranslationState.next_attempt_at.is_(None),
+                    TranslationState.next_attempt_at <= now
+                ))\
+                .where(or_(
+                    TranslationState.lease_expires_at.is_(None),
+                    TranslationState.lease_expires_at < now
+                ))\
+                .order_by(TranslationState.article_id)\
+                .limit(limit)\
+                .with_for_update(skip_locked=True, of=TranslationState)
+            claimed = session.execute(
+                update(TranslationState)
+                .where(TranslationState.article_id.in_(eligible.scalar_subquery()))
+                .values(leased_by=self.worker_id, lease_expires_at=now + LEASE_DURATION)
+                .returning(TranslationState.article_id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+
+        if not claimed:
+            return []
+        with session_scope() as session:
+            return session.query(Article)\
+                .filter(Article.id.in_(claimed))\
+                .order_by(Article.id)\
+                .all()
+
+    def count_backlog(self):
+        """待翻译的文章数（使用 ix_articles_untranslated 部分索引，不含等待规范文章翻译的重复文章）"""
+        with session_scope() as session:
+            return session.query(func.count(Article.id))\
+                .filter(Article.title_zh.is_(None))\
+                .filter(Article.duplicate_of.is_(None))\
+                .scalar()
+
+    def release_leases(self):
+        """释放当前 worker 持有的所有租约"""
         try:
-            articles = session.query(Article)\
+            with session_scope() as session:
+                session.query(TranslationState)\
+                    .filter(TranslationState.leased_by == self.worker_id)\
+                    .update({'leased_by': None, 'lease_expires_at': None}, synchronize_session=False)
+        except Exception as e:
+            logging.error(f"释放租约错误：{str(e)}")
+
+    def record_translation_failure(self, article_id: int, error: str):
+        """记录一次翻译失败，并按指数退避计算下次重试时间"""
+        try:
+            with span('record_failure'), session_scope() as session:
+                state = session.get(TranslationState, article_id)
+                if state is None:
+                    state = TranslationState(article_id=article_id, attempts=0)
+                    session.add(state)
+                state.attempts += 1
+                metrics.TRANSLATION_FAILURES.inc()
+                state.last_error = error[:2000]
+                state.updated_at = datetime.utcnow()
+                state.leased_by = None
+                state.lease_expires_at = None
+                if state.attempts >= MAX_ATTEMPTS:
+                    state.status = 'gave_up'
+                    state.next_attempt_at = None
+                    logging.warning(f"文章 ID {article_id} 已失败 {state.attempts} 次，放弃翻译")
+                else:
+                    state.status = 'pending'
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (state.attempts - 1))
+                    state.next_attempt_at = datetime.utcnow() + delay
+        except Exception as e:
+            logging.error(f"记录翻译失败错误：{str(e)}")
+
+    def get_stuck_articles(self, limit=50):
+        """获取失败过的文章，按失败次数倒序"""
+        with session_scope() as session:
+            return session.query(
+                    TranslationState.article_id,
+                    TranslationState.status,
+                    TranslationState.attempts,
+                    TranslationState.next_attempt_at,
+                    TranslationState.last_error,
+                    Article.title
+                )\
+                .join(Article, Article.id == TranslationState.article_id)\
                 .filter(Article.title_zh.is_(None))\
+                .filter(TranslationState.attempts > 0)\
+                .order_by(TranslationState.attempts.desc(), TranslationState.article_id)\
                 .limit(limit)\
                 .all()
-            return articles
-        finally:
-            session.close()
+
+    def report_stuck(self, limit=50):
+        """输出翻译失败的文章报告"""
+        rows = self.get_stuck_articles(limit)
+        if not rows:
+            print("没有翻译失败的文章")
+            return
+        gave_up = sum(1 for row in rows if row.status == 'gave_up')
+        print(f"翻译失败的文章 {len(rows)} 篇（已放弃 {gave_up} 篇）：")
+        for row in rows:
+            next_attempt = row.next_attempt_at.strftime('%Y-%m-%d %H:%M') if row.next_attempt_at else '-'
+            print(f"  ID {row.article_id} [{row.status}] 尝试 {row.attempts} 次，"
+                  f"下次 {next_attempt}：{(row.title or '')[:50]}")
+            print(f"      错误：{(row.last_error or '')[:200]}")
 
     def update_article_translation(self, article_id: int, title_zh: str, summary_zh: str):
         """更新文章的翻译"""
-        session = self.Session()
+        return self.save_translations({article_id: (title_zh, summary_zh)}) > 0
+
+    def save_translations(self, translations):
+        """在一个事务中保存多篇文章的翻译，translations 为 {article_id: (title_zh, summary_zh)}
+
+        返回更新的文章数
+        """
         try:
-            article = session.query(Article).filter_by(id=article_id).first()
-            if article:
-                article.title_zh = title_zh
-                article.summary_zh = summary_zh
-                session.commit()
-                return True
-            return False
+            with span('save_translations', stage=True), session_scope() as session:
+                # 等待这些文章翻译的近似重复文章使用相同的译文
+                translations = {**duplicates.pending_translations(session, translations), **translations}
+                updated = 0
+                for article_id, (title_zh, summary_zh) in translations.items():
+                    updated += session.query(Article)\
+                        .filter_by(id=article_id)\
+                        .update({'title_zh': title_zh, 'summary_zh': summary_zh}, synchronize_session=False)
+                # 翻译成功后清除队列记录
+                session.query(TranslationState)\
+                    .filter(TranslationState.article_id.in_(list(translations)))\
+                    .delete(synchronize_session=False)
+                # 译文加入全文检索索引和列表快照
+                search_index.reindex_ids(session, translations)
+                listings.update_translations(session, translations)
+            metrics.TRANSLATED_ARTICLES.inc(updated)
+            return updated
         except Exception as e:
-            session.rollback()
             logging.error(f"更新翻译错误：{str(e)}")
-            return False
-        finally:
-            session.close()
+            return 0
+
+    async def chat_completion(self, prompt: str, max_tokens: int, mode: str = 'single'):
+        """经过限流器调用异步接口，返回回复内容（mode 用于区分逐篇和批量请求的指标）"""
+        estimated = estimate_tokens(prompt) + max_tokens
+        waiting = time.monotonic()
+        async with self.rate_limiter.limit(estimated):
+            begin = time.monotonic()
+            # 并发请求之间交错执行，直接记录等待配额和请求的耗时
+            record('rate_limit_wait', begin - waiting)
+            outcome = 'error'
+            try:
+                completion = await self.client.chat.completions.create(
+                    model=TRANSLATION_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.3,
+                    max_tokens=max_tokens
+                )
+                outcome = 'ok'
+            except openai.RateLimitError as e:
+                outcome = 'rate_limited'
+                metrics.TRANSLATION_RATE_LIMITED.inc()
+                retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = 10.0
+                self.rate_limiter.pause(delay)
+                raise
+            finally:
+                elapsed = time.monotonic() - begin
+                record('api_request', elapsed)
+                metrics.TRANSLATION_REQUEST_SECONDS.observe(elapsed, mode=mode, outcome=outcome)
+
+        # 按实际用量修正token桶
+        if getattr(completion, 'usage', None):
+            self.rate_limiter.tokens.adjust(completion.usage.total_tokens - estimated)
+            metrics.TRANSLATION_TOKENS.inc(completion.usage.prompt_tokens, mode=mode, kind='prompt')
+            metrics.TRANSLATION_TOKENS.inc(completion.usage.completion_tokens, mode=mode, kind='completion')
+        return completion.choices[0].message.content
+
+    # 以下同步的数据库操作在协程中通过 asyncio.to_thread 调用，不阻塞事件循环里的其他请求
+
+    def lookup_cache(self, title: str, summary: str):
+        with span('cache_lookup'):
+            return self.translation_cache.get(title, summary)
+
+    def split_cached(self, articles):
+        """按翻译缓存把文章分成 (未缓存的文章列表, {article_id: 缓存的译文})"""
+        pending = []
+        cached_translations = {}
+        for article in articles:
+            cached = self.lookup_cache(article.title, article.summary)
+            if cached:
+                cached_translations[article.id] = cached
+            else:
+                pending.append(article)
+        return pending, cached_translations
+
+    def cache_and_save(self, articles, translations):
+        """译文写入翻译缓存，并在一个事务中保存，返回更新的文章数"""
+        for article in articles:
+            if article.id in translations:
+                self.translation_cache.put(article.title, article.summary, *translations[article.id])
+        return self.save_translations(translations) if translations else 0
 
     async def translate_text(self, title: str, summary: str, max_retries: int = 3):
-        """翻译文本"""
+        """翻译文本，重试后仍失败时抛出 TranslationError"""
+        # 相同原文已经翻译过时直接使用缓存，不再调用API
+        cached = await asyncio.to_thread(self.lookup_cache, title, summary)
+        if cached:
+            logging.info("使用缓存的翻译")
+            return cached
+            
+        last_error = None
         for attempt in range(max_retries):
             try:
                 prompt = f"""请将以下英文标题和摘要翻译成中文：
@@ -69,30 +397,28 @@ class ArticleTranslator:
                     "abstract": "中文摘要"
                 }}"""
                 
-                # 使用同步方法替代异步方法
-                completion = openai.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3,
-                    max_tokens=2000
-                )
-                
-                response = completion.choices[0].message.content
-                translation = json.loads(response)
+                response = await self.chat_completion(prompt, max_tokens=2000)
+                with span('parse_response'):
+                    translation = json.loads(response)
                 
                 if translation['title'].strip() and translation['abstract'].strip():
                     logging.info(f"翻译成功 (尝试 {attempt + 1}/{max_retries})")
+                    await asyncio.to_thread(
+                        self.translation_cache.put, title, summary, translation['title'], translation['abstract'])
                     return translation['title'], translation['abstract']
                 else:
                     raise ValueError("翻译结果为空")
                     
             except Exception as e:
+                last_error = f"{type(e).__name__}: {str(e)}"
                 logging.error(f"翻译失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
                 if attempt < max_retries - 1:
-                    await asyncio.sleep(5)  # 增加等待时间到5秒
+                    metrics.TRANSLATION_RETRIES.inc(reason='single')
+                    # 指数退避，限流时的暂停由限流器处理
+                    await asyncio.sleep(2 ** attempt)
                     continue
                     
-        return None, None
+        raise TranslationError(last_error)
 
     async def translate_single_article(self, article):
         """翻译单篇文章"""
@@ -106,21 +432,83 @@ class ArticleTranslator:
             )
             
             # 更新翻译结果
-            if title_zh and summary_zh:
-                self.update_article_translation(
-                    article.id,
-                    title_zh,
-                    summary_zh
-                )
-                logging.info(f"文章 ID {article.id} 翻译成功")
-            else:
-                logging.warning(f"文章 ID {article.id} 翻译失败")
-                
-            # 每篇文章翻译后等待10秒
-            await asyncio.sleep(10)
+            await asyncio.to_thread(self.update_article_translation, article.id, title_zh, summary_zh)
+            logging.info(f"文章 ID {article.id} 翻译成功")
                 
         except Exception as e:
             logging.error(f"处理文章 {article.id} 时出错: {str(e)}")
+            await asyncio.to_thread(self.record_translation_failure, article.id, str(e))
+
+    async def request_batch_translation(self, articles):
+        """一次请求翻译多篇文章，返回 {id: (title_zh, summary_zh)}"""
+        prompt = format_batch_prompt(articles)
+        max_tokens = min(
+            BATCH_MAX_OUTPUT_TOKENS,
+            sum(estimate_tokens(a.title) + estimate_tokens(a.summary) for a in articles) * 2 + 200
+        )
+        
+        response = await self.chat_completion(prompt, max_tokens, mode='batch')
+        with span('parse_response'):
+            return parse_batch_response(response, [article.id for article in articles])
+
+    async def translate_articles_batched(self, articles):
+        """批量翻译一组文章，部分失败或返回格式错误时对半拆分重试
+
+        返回成功翻译的文章数
+        """
+        if not articles:
+            return 0
+        if len(articles) == 1:
+            # 单篇文章退回到逐篇翻译（包含重试）
+            article = articles[0]
+            try:
+                title_zh, summary_zh = await self.translate_text(article.title, article.summary)
+            except Exception as e:
+                logging.warning(f"文章 ID {article.id} 翻译失败: {str(e)}")
+                await asyncio.to_thread(self.record_translation_failure, article.id, str(e))
+                return 0
+            return int(await asyncio.to_thread(self.update_article_translation, article.id, title_zh, summary_zh))
+
+        try:
+            results = await self.request_batch_translation(articles)
+        except Exception as e:
+            logging.error(f"批量翻译失败 ({len(articles)} 篇): {str(e)}")
+            results = {}
+
+        found = {article.id: results[article.id] for article in articles if article.id in results}
+        missing = [article for article in articles if article.id not in results]
+        # 一批的翻译结果在同一个事务中保存
+        translated = await asyncio.to_thread(self.cache_and_save, articles, found)
+
+        if missing:
+            logging.warning(f"批量翻译缺少 {len(missing)}/{len(articles)} 篇，拆分重试")
+            metrics.TRANSLATION_RETRIES.inc(reason='batch_split')
+            if len(missing) < len(articles):
+                # 部分成功：只重试缺失的文章
+                translated += await self.translate_articles_batched(missing)
+            else:
+                # 整批失败：对半拆分，避免一篇坏数据拖垮整批
+                middle = len(missing) // 2
+                halves = await asyncio.gather(
+                    self.translate_articles_batched(missing[:middle]),
+                    self.translate_articles_batched(missing[middle:])
+                )
+                translated += sum(halves)
+        return translated
+
+    async def translate_batched(self, articles, token_budget=BATCH_TOKEN_BUDGET):
+        """先查缓存，再把剩余文章按token预算打包批量翻译，返回翻译（含缓存命中）的文章数"""
+        pending, cached_translations = await asyncio.to_thread(self.split_cached, articles)
+        if cached_translations:
+            await asyncio.to_thread(self.save_translations, cached_translations)
+
+        batches = pack_batches(pending, token_budget)
+        logging.info(f"批量翻译 {len(pending)} 篇文章，共 {len(batches)} 个请求")
+        # 各批并发发送，由限流器控制实际速率
+        results = await asyncio.gather(*(self.translate_articles_batched(batch) for batch in batches))
+        translated = len(articles) - len(pending) + sum(results)
+        logging.info(f"本批共翻译 {translated}/{len(articles)} 篇文章")
+        return translated
 
     async def translate_batch(self, articles):
         """并行翻译一批文章"""
@@ -131,28 +519,125 @@ class ArticleTranslator:
         
         await asyncio.gather(*tasks)
 
-    async def run(self):
-        """运行翻译程序"""
+    async def run(self, batched=False, token_budget=BATCH_TOKEN_BUDGET, metrics_textfile=None):
+        """运行翻译程序，指定 metrics_textfile 时每轮翻译后更新指标文件"""
         logging.info("开始翻译未翻译的文章...")
         
-        while True:
-            # 获取一批未翻译的文章
-            articles = self.get_untranslated_articles(limit=10)
-            if not articles:
-                logging.info("没有找到未翻译的文章")
-                break
-            
-            # 并行翻译这一批文章
-            await self.translate_batch(articles)
-            
-            # 每批文章之间等待30秒
-            await asyncio.sleep(30)
+        try:
+            while True:
+                with span('backlog'):
+                    metrics.TRANSLATION_BACKLOG.set(self.count_backlog())
+                if metrics_textfile:
+                    metrics.write_textfile(metrics_textfile)
+                # 领取一批未翻译的文章（其他 worker 已领取的会被跳过）
+                with span('claim', stage=True):
+                    articles = self.claim_articles(limit=FETCH_SIZE)
+                if not articles:
+                    # 退避中和已放弃的文章不会被取出，失败的文章不会让循环空转
+                    logging.info("没有找到待翻译的文章")
+                    break
+                
+                # 同一时间只有一轮在执行，各协程中的同步 span 都挂在这一轮下
+                with span('round', stage=True):
+                    if batched:
+                        # 多篇文章合并到一个请求中翻译
+                        await self.translate_batched(articles, token_budget)
+                    else:
+                        # 并行翻译这一批文章（实际并发和速率由限流器控制）
+                        await self.translate_batch(articles)
+        finally:
+            # 正常退出或被中断时归还未完成的租约
+            self.release_leases()
             
         logging.info("所有文章翻译完成")
+        stuck = self.get_stuck_articles()
+        if stuck:
+            logging.warning(f"{len(stuck)} 篇文章翻译失败，等待重试或已放弃（--report-stuck 查看）")
+        logging.info(f"翻译缓存统计: {self.translation_cache.stats()}")
+        log_pool_status()
+        metrics.log_summary("Translation metrics")
+        if metrics_textfile:
+            metrics.write_textfile(metrics_textfile)
+
+def run_worker(batched, token_budget, requests_per_minute, tokens_per_minute,
+               worker_index=None, metrics_port=None, metrics_textfile=None, profile_args=None):
+    """在独立进程中运行一个翻译 worker
+
+    多个 worker 时每个进程的指标带 worker 标签，端口依次加 1，文件名加上编号，
+    性能报告写到各自的子目录
+    """
+    translator = ArticleTranslator(requests_per_minute, tokens_per_minute)
+    if worker_index is not None:
+        metrics.REGISTRY.const_labels['worker'] = str(worker_index)
+        if metrics_port:
+            metrics_port += worker_index
+        if metrics_textfile:
+            root, ext = os.path.splitext(metrics_textfile)
+            metrics_textfile = f"{root}-{worker_index}{ext}"
+        if profile_args is not None:
+            profile_args.profile_dir = os.path.join(profile_args.profile_dir, f"worker-{worker_index}")
+    if metrics_port:
+        metrics.start_http_server(metrics_port)
+    if profile_args is not None:
+        profiling.start_from_args(profile_args)
+    try:
+        asyncio.run(translator.run(batched=batched, token_budget=token_budget, metrics_textfile=metrics_textfile))
+    finally:
+        if profile_args is not None:
+            profiling.finish_from_args(profile_args)
+
+
+def run_workers(workers, batched, token_budget, requests_per_minute, tokens_per_minute,
+                metrics_port=None, metrics_textfile=None, profile_args=None):
+    """启动多个 worker 进程，配额在各进程间平分"""
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(batched, token_budget,
+                  max(1, requests_per_minute // workers),
+                  max(1, tokens_per_minute // workers),
+                  i, metrics_port, metrics_textfile, profile_args),
+            name=f"translator-{i}"
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
 
 async def main():
-    translator = ArticleTranslator()
-    await translator.run()
+    parser = argparse.ArgumentParser(description="翻译未翻译的文章")
+    parser.add_argument('--batch', action='store_true', help="多篇文章合并到一个请求中翻译")
+    parser.add_argument('--token-budget', type=int, default=BATCH_TOKEN_BUDGET,
+                        help="批量模式下每个请求的输入token预算")
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE, help="每分钟请求数上限")
+    parser.add_argument('--tpm', type=int, default=TOKENS_PER_MINUTE, help="每分钟token数上限")
+    parser.add_argument('--report-stuck', action='store_true', help="只输出翻译失败的文章报告")
+    parser.add_argument('--workers', type=int, default=1, help="本机启动的 worker 进程数")
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.workers > 1 and not args.report_stuck:
+        run_workers(args.workers, args.batch, args.token_budget, args.rpm, args.tpm,
+                    args.metrics_port, args.metrics_textfile, args if args.profile else None)
+        return
+
+    translator = ArticleTranslator(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    if args.report_stuck:
+        translator.report_stuck()
+        return
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+    profiling.start_from_args(args)
+    try:
+        await translator.run(batched=args.batch, token_budget=args.token_budget,
+                             metrics_textfile=args.metrics_textfile)
+    finally:
+        profiling.finish_from_args(args)
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from db_models import TranslationCacheEntry
+import metrics
+
+# 翻译使用的模型
+TRANSLATION_MODEL = "gpt-4o-mini"
+# 提示词版本：修改翻译提示词后需要加 1，旧的缓存自动失效
+# 2：批量翻译改为 [编号, 标题, 摘要] 的格式
+PROMPT_VERSION = 2
+# 内存缓存最多保留的条目数
+MEMORY_CAPACITY = 10000
+
+
+def cache_key(title: str, summary: str, model: str = TRANSLATION_MODEL,
+              prompt_version: Optional[int] = None) -> str:
+    """计算 (模型, 提示词版本, 原文) 的 SHA-256，默认使用当前的 PROMPT_VERSION"""
+    if prompt_version is None:
+        prompt_version = PROMPT_VERSION
+    digest = hashlib.sha256()
+    for part in (model, str(prompt_version), title or '', summary or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class TranslationCache:
+    """两级翻译缓存：进程内 LRU + 数据库持久层"""
+
+    def __init__(self, Session, capacity=MEMORY_CAPACITY, model=TRANSLATION_MODEL):
+        self.Session = Session
+        self.capacity = capacity
+        self.model = model
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+
+    def get(self, title: str, summary: str) -> Optional[Tuple[str, str]]:
+        """查找缓存的翻译，返回 (title_zh, summary_zh) 或 None"""
+        key = cache_key(title, summary, self.model)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                metrics.TRANSLATION_CACHE_LOOKUPS.inc(result='memory')
+                return value
+
+        session = self.Session()
+        try:
+            entry = session.get(TranslationCacheEntry, key)
+            value = (entry.title_zh, entry.summary_zh) if entry else None
+        except Exception as e:
+            logging.error(f"读取翻译缓存错误：{str(e)}")
+            value = None
+        finally:
+            session.close()
+
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            metrics.TRANSLATION_CACHE_LOOKUPS.inc(result='miss')
+            return None
+
+        with self._lock:
+            self.db_hits += 1
+        metrics.TRANSLATION_CACHE_LOOKUPS.inc(result='db')
+        self._remember(key, value)
+        return value
+
+    def put(self, title: str, summary: str, title_zh: str, summary_zh: str):
+        """保存翻译结果到两级缓存"""
+        key = cache_key(title, summary, self.model)
+        value = (title_zh, summary_zh)
+        self._remember(key, value)
+
+        session = self.Session()
+        try:
+            if session.get(TranslationCacheEntry, key) is None:
+                session.add(TranslationCacheEntry(
+                    key=key,
+                    model=self.model,
+                    title_zh=title_zh,
+                    summary_zh=summary_zh
+                ))
+                session.commit()
+        except IntegrityError:
+            # 其他进程已写入相同的键
+            session.rollback()
+        except Exception as e:
+            session.rollback()
+            logging.error(f"写入翻译缓存错误：{str(e)}")
+        finally:
+            session.close()
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            total = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0,
+                'memory_size': len(self._memory)
+            }